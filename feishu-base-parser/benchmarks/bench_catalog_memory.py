@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字段目录内存基准 (Field Catalog Memory Benchmark)
+================================================
+功能：对比 NameRegistry（元组键 dict + 保留原始表结构）与 FieldCatalog（列式数组 +
+      字符串驻留）的内存占用、构建耗时和查询耗时，并校验两者查询结果一致。
+特性：
+- 每种方式在独立子进程中用 tracemalloc 统计，互不干扰
+- 索引内存：构建过程中新分配的内存（两者都引用快照中已有的字符串）
+- 常驻内存：释放快照后仍被保留的内存（NameRegistry 的 all_tables 会让原始表结构一直存活，
+  FieldCatalog 以 keep_tables=False 构建，只保留名称）
+
+用法：
+    python3 benchmarks/bench_catalog_memory.py [--base xxx.base] [--tables 300 --fields 80]
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'scripts'))
+
+from base_loader import BaseDocument  # noqa: E402
+from field_catalog import FieldCatalog  # noqa: E402
+from name_registry import NameRegistry  # noqa: E402
+
+
+def mb(n):
+    return round(n / 1024 / 1024, 1)
+
+
+def run_child(mode, path):
+    """子进程：构建名称结构并统计内存 / 耗时，输出 JSON 结果"""
+    tracemalloc.start()
+    doc = BaseDocument.load(path)
+    snapshot = doc.snapshot
+    loaded = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    if mode == 'registry':
+        names = NameRegistry.from_snapshot(snapshot)
+    else:
+        names = FieldCatalog.from_snapshot(snapshot, keep_tables=False)
+    build_seconds = time.perf_counter() - start
+    index_bytes = tracemalloc.get_traced_memory()[0] - loaded
+
+    del doc, snapshot
+    gc.collect()
+    retained_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # 查询：全部 (表, 字段) 精确查找 + 按字段 ID 兜底查找
+    field_map = names.field_map
+    keys = list(field_map)
+    start = time.perf_counter()
+    exact = [field_map.get(key) for key in keys]
+    fallback = [field_map.lookup('tblNotExist', fid) for _, fid in keys]
+    lookup_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': mode,
+        'fields': len(keys),
+        'build_seconds': round(build_seconds, 3),
+        'index_mb': mb(index_bytes),
+        'retained_mb': mb(retained_bytes),
+        'lookup_ms': round(lookup_seconds * 1000, 1),
+        'checksum': hash((tuple(exact), tuple(fallback), tuple(names.table_map.items()),
+                          tuple(names.option_map.items()))),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字段目录内存基准")
+    parser.add_argument("--base", help="已有 .base 文件；不指定则生成合成文件")
+    parser.add_argument("--tables", type=int, default=300)
+    parser.add_argument("--fields", type=int, default=80)
+    parser.add_argument("--child", choices=['registry', 'catalog'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.base)
+        return
+
+    tmp_dir = None
+    path = args.base
+    if not path:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, 'synthetic.base')
+        print(f"生成合成 .base: {args.tables} 张表 × {args.fields} 个字段 ...")
+        subprocess.run([sys.executable, os.path.join(HERE, 'synthetic_base.py'), path,
+                        '--tables', str(args.tables), '--fields', str(args.fields), '--workflows', '0'],
+                       check=True, capture_output=True)
+
+    results = []
+    for mode in ('registry', 'catalog'):
+        # 固定哈希种子，保证两个子进程的 checksum 可比
+        env = dict(os.environ, PYTHONHASHSEED='0')
+        out = subprocess.run([sys.executable, __file__, '--child', mode, '--base', path],
+                             check=True, capture_output=True, text=True, env=env).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"字段数: {results[0]['fields']}\n")
+    print(f"{'方式':<10} {'构建(s)':>8} {'索引内存(MB)':>14} {'常驻内存(MB)':>14} {'查询(ms)':>10}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['build_seconds']:>8} {r['index_mb']:>14} {r['retained_mb']:>14} {r['lookup_ms']:>10}")
+    same = results[0]['checksum'] == results[1]['checksum']
+    print(f"\n查询结果{'一致' if same else '不一致 ❌'}")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
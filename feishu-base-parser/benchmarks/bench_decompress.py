@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解压峰值内存基准 (Decompress Peak RSS Benchmark)
+================================================
+功能：对比旧的整块解压（b64decode → gz.read → decode → json.loads）与
+      BaseDocument 流式解压在 gzipSnapshot 上的峰值内存 (RSS) 和耗时。
+特性：
+- 每种方式在独立子进程中运行，峰值 RSS 互不干扰
+- 不指定 --base 时自动生成大号合成 .base
+
+用法：
+    python3 benchmarks/bench_decompress.py [--base xxx.base] [--tables 300 --fields 80 --desc-len 300]
+"""
+
+import argparse
+import base64
+import gzip
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'scripts'))
+
+from base_loader import BaseDocument  # noqa: E402
+
+
+def peak_rss_mb():
+    """
+    当前进程的峰值 RSS (MB)。
+    Linux 优先读 /proc/self/status 的 VmHWM（ru_maxrss 会继承 exec 前父进程的峰值）；
+    ru_maxrss 在 Linux 上单位为 KB，macOS 为字节。
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def legacy_decompress(compressed_content):
+    """旧实现：整块 base64 解码 + 整块解压 + 整块 decode"""
+    compressed_bytes = base64.b64decode(compressed_content)
+    with gzip.GzipFile(fileobj=io.BytesIO(compressed_bytes)) as gz:
+        return json.loads(gz.read().decode('utf-8'))
+
+
+def run_child(mode, path):
+    """子进程：加载文件并解压快照，输出 JSON 结果"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    loaded_peak = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'legacy':
+        snapshot = legacy_decompress(data.get('gzipSnapshot'))
+    else:
+        doc = BaseDocument(data, path)
+        del data
+        snapshot = doc.snapshot
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': mode,
+        'items': len(snapshot),
+        'seconds': round(elapsed, 3),
+        'loaded_peak_mb': round(loaded_peak, 1),
+        'peak_mb': round(peak_rss_mb(), 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解压峰值内存基准")
+    parser.add_argument("--base", help="已有 .base 文件；不指定则生成合成文件")
+    parser.add_argument("--tables", type=int, default=300)
+    parser.add_argument("--fields", type=int, default=80)
+    parser.add_argument("--desc-len", type=int, default=300, help="合成字段的随机说明长度")
+    parser.add_argument("--child", choices=['legacy', 'streaming'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.base)
+        return
+
+    tmp_dir = None
+    path = args.base
+    if not path:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, 'synthetic.base')
+        print(f"生成合成 .base: {args.tables} 张表 × {args.fields} 个字段 ...")
+        # 在子进程中生成，避免本进程的内存占用影响测量
+        subprocess.run([sys.executable, os.path.join(HERE, 'synthetic_base.py'), path,
+                        '--tables', str(args.tables), '--fields', str(args.fields),
+                        '--workflows', '0', '--desc-len', str(args.desc_len)],
+                       check=True, capture_output=True)
+
+    print(f"文件大小: {os.path.getsize(path) / 1024 / 1024:.1f} MB\n")
+    print(f"{'方式':<10} {'耗时(s)':>8} {'加载后峰值(MB)':>16} {'解压峰值(MB)':>14} {'解压增量(MB)':>14}")
+    for mode in ('legacy', 'streaming'):
+        out = subprocess.run([sys.executable, __file__, '--child', mode, '--base', path],
+                             check=True, capture_output=True, text=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:<10} {r['seconds']:>8} {r['loaded_peak_mb']:>16} {r['peak_mb']:>14} "
+              f"{r['peak_mb'] - r['loaded_peak_mb']:>14.1f}")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成器基准 (Generator Benchmark Suite)
+======================================
+功能：按规模档位生成合成 .base，逐个计时各生成脚本（加载 → 字段表 → 关联关系 → 自动化 → 校验），
+      结果保存为 JSON，可与之前保存的结果对比，发现性能回退。
+特性：
+- 每个档位在独立子进程中运行，峰值内存互不干扰
+- 每个脚本都使用新加载的 BaseDocument，解压耗时计入真正用到该数据块的脚本
+- 每个档位重复 --repeat 次，取最小值（最不受机器噪声影响）
+- --formula-ratio / --lookup-ratio / --depth 透传给合成生成器，作用于全部档位
+- --compare 与基线对比，任一项变慢超过 --threshold 时以非零状态码退出，可用于 CI
+
+用法：
+    python3 benchmarks/bench_generators.py [--tiers small,medium] [--repeat 3] [--save 基线名]
+    python3 benchmarks/bench_generators.py --compare 基线名 [--threshold 0.15]
+
+输出：benchmarks/results/<名称>.json（--save 时）
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'scripts'))
+
+from bench_decompress import peak_rss_mb  # noqa: E402
+
+# ========== 配置 ==========
+RESULTS_DIR = os.path.join(HERE, 'results')
+# 档位: (表数, 每表字段数, 工作流数)
+TIERS = {
+    'small': (20, 30, 50),
+    'medium': (100, 60, 300),
+    'large': (300, 80, 1000),
+    'xlarge': (1000, 100, 3000),
+}
+DEFAULT_TIERS = "small,medium"
+REPEAT = 3
+THRESHOLD = 0.15  # 相对基线变慢超过 15% 视为回退
+MIN_SECONDS = 0.05  # 基线耗时低于此值的项不判定回退（计时噪声占主导）
+
+
+def run_child(path, repeat):
+    """子进程：重复 repeat 次，逐个脚本计时，输出 JSON 结果"""
+    from base_loader import BaseDocument
+    import run_all
+
+    best = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            BaseDocument.load(path)
+            elapsed = {'加载': time.perf_counter() - start}
+            for name, module, _ in run_all.STAGES:
+                # 每个脚本单独加载，避免前一个脚本的解压缓存算到后一个头上
+                doc = BaseDocument.load(path)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    ok = module.run(doc, output_path=os.path.join(out_dir, module.OUTPUT_PATH))
+                elapsed[name] = time.perf_counter() - start
+                if not ok:
+                    raise RuntimeError(f"{name} 运行失败")
+            for name, seconds in elapsed.items():
+                best[name] = min(seconds, best.get(name, seconds))
+
+    print(json.dumps({
+        'seconds': {name: round(seconds, 4) for name, seconds in best.items()},
+        'peak_mb': round(peak_rss_mb(), 1),
+    }, ensure_ascii=False))
+
+
+def run_tier(tier, args, tmp_dir):
+    """生成档位对应的合成文件并在子进程中计时"""
+    tables, fields, workflows = TIERS[tier]
+    path = os.path.join(tmp_dir, f'{tier}.base')
+    cmd = [sys.executable, os.path.join(HERE, 'synthetic_base.py'), path, '--tables', str(tables),
+           '--fields', str(fields), '--workflows', str(workflows), '--depth', str(args.depth)]
+    if args.formula_ratio is not None:
+        cmd += ['--formula-ratio', str(args.formula_ratio)]
+    if args.lookup_ratio is not None:
+        cmd += ['--lookup-ratio', str(args.lookup_ratio)]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+    out = subprocess.run([sys.executable, __file__, '--child', path, '--repeat', str(args.repeat)],
+                         check=True, capture_output=True, text=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result.update({
+        'tables': tables, 'fields': fields, 'workflows': workflows,
+        'file_mb': round(os.path.getsize(path) / 1024 / 1024, 2),
+    })
+    os.remove(path)
+    return result
+
+
+def results_path(name):
+    """--save / --compare 的参数可以是名称（存放在 results/ 下）或 JSON 路径"""
+    if name.endswith('.json') or os.sep in name:
+        return name
+    return os.path.join(RESULTS_DIR, f'{name}.json')
+
+
+def print_results(results, baseline=None, threshold=THRESHOLD):
+    """打印各档位耗时；有基线时附上变化比例，返回回退项列表"""
+    regressions = []
+    for tier, result in results['tiers'].items():
+        base_tier = (baseline or {}).get('tiers', {}).get(tier)
+        print(f"\n[{tier}] {result['tables']} 张表 × {result['fields']} 个字段，{result['workflows']} 个工作流，"
+              f"文件 {result['file_mb']} MB，峰值内存 {result['peak_mb']} MB")
+        for name, seconds in result['seconds'].items():
+            line = f"    {name:<8} {seconds:>9.3f}s"
+            old = (base_tier or {}).get('seconds', {}).get(name)
+            if old:
+                change = (seconds - old) / old
+                line += f"  基线 {old:>8.3f}s  {change:>+7.1%}"
+                if change > threshold and old >= MIN_SECONDS:
+                    line += "  ⚠️ 回退"
+                    regressions.append((tier, name, old, seconds))
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成器基准")
+    parser.add_argument("--tiers", default=DEFAULT_TIERS, help=f"逗号分隔的档位（可选 {', '.join(TIERS)}）")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="每个档位重复次数，取最小值")
+    parser.add_argument("--formula-ratio", type=float, help="合成文件的公式字段占比")
+    parser.add_argument("--lookup-ratio", type=float, help="合成文件的查找引用 + 关联字段占比")
+    parser.add_argument("--depth", type=int, default=1, help="合成工作流的循环嵌套层数")
+    parser.add_argument("--save", metavar="名称", help="把结果保存为 results/<名称>.json（或指定 .json 路径）")
+    parser.add_argument("--compare", metavar="名称", help="与之前保存的结果对比")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="判定回退的变慢比例（默认 0.15）")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.repeat)
+        return
+
+    tiers = [t.strip() for t in args.tiers.split(',') if t.strip()]
+    unknown = [t for t in tiers if t not in TIERS]
+    if unknown:
+        parser.error(f"未知档位: {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(results_path(args.compare), 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = {
+        'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': args.repeat,
+        'synthetic': {'formula_ratio': args.formula_ratio, 'lookup_ratio': args.lookup_ratio, 'depth': args.depth},
+        'tiers': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for tier in tiers:
+            print(f"运行档位 {tier} ...")
+            results['tiers'][tier] = run_tier(tier, args, tmp_dir)
+
+    if baseline and baseline.get('synthetic') != results['synthetic']:
+        print("⚠️ 基线的合成参数与本次不同，对比结果仅供参考")
+    regressions = print_results(results, baseline, args.threshold)
+
+    if args.save:
+        path = results_path(args.save)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {path}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} 项相对基线变慢超过 {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
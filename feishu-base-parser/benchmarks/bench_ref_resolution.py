@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+引用解析微基准 (Workflow Ref Resolution Benchmark)
+=================================================
+功能：在合成的 1000 个工作流上，对比旧的逐次解析（每个引用都 re.search +
+      遍历 TableMap）与编译后的 WorkflowRefs 解析表的耗时，并校验结果一致。
+特性：
+- 引用取自各工作流 Draft 中所有 fieldId / fieldIds，与生成文档时的调用一致
+- 新方式的耗时包含每个工作流编译 WorkflowRefs 的开销
+
+用法：
+    python3 benchmarks/bench_ref_resolution.py [--workflows 1000 --tables 50 --fields 40 --repeat 5]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'scripts'))
+
+from base_loader import BaseDocument  # noqa: E402
+from generate_自动化地图 import resolve_field_id  # noqa: E402
+from name_registry import WorkflowRefs  # noqa: E402
+from synthetic_base import build_base  # noqa: E402
+
+
+def legacy_resolve_field_id(ref_fid, wf_table_map, field_map):
+    """旧实现：每次调用都做正则匹配并遍历 TableMap"""
+    if not ref_fid:
+        return "未知字段"
+    if isinstance(ref_fid, str):
+        ref_fid = ref_fid.strip('"')
+    if isinstance(ref_fid, str) and (ref_fid.startswith('ref_ref_tbl') or ref_fid.startswith('ref_tbl')):
+        match = re.search(r'(tbl[^_]+)_(fld.+)', ref_fid)
+        if match:
+            real_tid = match.group(1)
+            real_fid = match.group(2)
+            ref_key = f"ref_{real_tid}"
+            if wf_table_map and ref_key in wf_table_map:
+                mapped_tid = wf_table_map[ref_key].get('TableID', '').strip('"')
+                fname = field_map.get((mapped_tid, real_fid))
+                if fname:
+                    return fname
+            fname = field_map.lookup(real_tid, real_fid)
+            if fname:
+                return fname
+    for ref_tid, info in (wf_table_map or {}).items():
+        field_mapping = info.get('FieldMap', {})
+        if ref_fid in field_mapping:
+            real_fid = field_mapping[ref_fid]
+            real_tid = info.get('TableID', '').strip('"')
+            fname = field_map.get((real_tid, real_fid))
+            if fname:
+                return fname
+    fname = field_map.find(ref_fid)
+    if fname:
+        return fname
+    return f"[已删除的字段:{ref_fid}]"
+
+
+def collect_refs(node, refs):
+    """递归收集 Draft 中的 fieldId / fieldIds 引用"""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == 'fieldId' and isinstance(value, str):
+                refs.append(value)
+            elif key == 'fieldIds' and isinstance(value, list):
+                refs.extend(v for v in value if isinstance(v, str))
+            else:
+                collect_refs(value, refs)
+    elif isinstance(node, list):
+        for item in node:
+            collect_refs(item, refs)
+    return refs
+
+
+def load_workload(args):
+    """生成合成 .base，返回 (field_map, [(TableMap, [引用ID, ...]), ...])"""
+    doc = BaseDocument(build_base(tables=args.tables, fields=args.fields, workflows=args.workflows,
+                                  seed=args.seed), None)
+    workload = []
+    for wf in doc.automation:
+        extra = wf.get('WorkflowExtra', {})
+        draft = json.loads(extra.get('Draft', '{}'))
+        workload.append((extra.get('Extra', {}).get('TableMap', {}), collect_refs(draft.get('steps', []), [])))
+    return doc.registry.field_map, workload
+
+
+def run_legacy(field_map, workload):
+    return [[legacy_resolve_field_id(ref, table_map, field_map) for ref in refs] for table_map, refs in workload]
+
+
+def run_compiled(field_map, workload):
+    results = []
+    for table_map, refs in workload:
+        wf_refs = WorkflowRefs(table_map, field_map)
+        results.append([resolve_field_id(ref, wf_refs, field_map) for ref in refs])
+    return results
+
+
+def best_of(fn, repeat, *args):
+    """运行 repeat 次，返回 (最短耗时, 最后一次结果)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工作流引用解析微基准")
+    parser.add_argument("--workflows", type=int, default=1000)
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--fields", type=int, default=40, help="每张表字段数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    field_map, workload = load_workload(args)
+    total_refs = sum(len(refs) for _, refs in workload)
+    print(f"工作流 {len(workload)} 个，字段 {len(field_map)} 个，引用 {total_refs} 次\n")
+
+    legacy_time, legacy_result = best_of(run_legacy, args.repeat, field_map, workload)
+    compiled_time, compiled_result = best_of(run_compiled, args.repeat, field_map, workload)
+    if legacy_result != compiled_result:
+        print("❌ 新旧解析结果不一致")
+        sys.exit(1)
+
+    print(f"{'方式':<10} {'耗时(ms)':>10} {'每次引用(µs)':>14}")
+    for name, elapsed in (('legacy', legacy_time), ('compiled', compiled_time)):
+        print(f"{name:<10} {elapsed * 1000:>10.2f} {elapsed / max(total_refs, 1) * 1e6:>14.3f}")
+    print(f"\n加速比: {legacy_time / compiled_time:.2f}x（结果一致）")
+
+
+if __name__ == "__main__":
+    main()
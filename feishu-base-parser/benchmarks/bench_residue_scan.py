@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+残留扫描基准 (ID Residue Scan Benchmark)
+========================================
+功能：在大号生成文档上，对比旧的逐模式扫描（每个匹配都从文档开头数行号、重新查找全部二级标题）
+      与 completeness_checker.scan_residue 单遍扫描的耗时，并校验两者结果一致。
+特性：
+- 不指定 --doc 时用合成 .base 生成全量字段表，并按 --residue 比例把部分字段名替换为残留标记，
+  使匹配数随文档规模增长
+- 旧实现是平方级，文档较大时可用 --skip-legacy 只测新实现
+
+用法：
+    python3 benchmarks/bench_residue_scan.py [--doc 全量字段表.md] [--tables 300 --fields 80 --residue 0.05]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'scripts'))
+
+from base_loader import BaseDocument  # noqa: E402
+from completeness_checker import ID_PATTERNS, scan_residue  # noqa: E402
+import generate_全量字段表  # noqa: E402
+from synthetic_base import write_base  # noqa: E402
+
+# 注入到合成文档中的残留标记（覆盖全部模式）
+RESIDUE_SAMPLES = [
+    "[未知字段:fldMissing01]", "[已删除的表:tblGone0001]", "[步骤3的字段]",
+    "[步骤2的循环当前记录]", 'default_url": "{引用}"', "isNotEmpty",
+]
+
+
+def legacy_scan(content):
+    """旧实现：逐个模式 finditer，每个匹配都切片计数行号、重新扫描之前的全部标题"""
+    hits = []
+    for i, (pattern, _, _) in enumerate(ID_PATTERNS):
+        for match in re.finditer(pattern, content):
+            match_text = match.group(0)
+            match_id = match.group(1) if match.lastindex and match.lastindex >= 1 else match_text
+            match_start = match.start()
+            line_num = content[:match_start].count('\n') + 1
+            line_start = content.rfind('\n', 0, match_start) + 1
+            line_end = content.find('\n', match_start)
+            if line_end == -1:
+                line_end = len(content)
+            header_match = None
+            for m in re.finditer(r'^##\s+(.*?)$', content[:match_start], re.MULTILINE):
+                header_match = m
+            hits.append({
+                'pattern': i,
+                'text': match_text,
+                'id': match_id,
+                'line': line_num,
+                'line_content': content[line_start:line_end],
+                'table_name': header_match.group(1).strip() if header_match else "未知表",
+            })
+    return hits
+
+
+def build_doc(tables, fields, residue, seed):
+    """用合成 .base 生成全量字段表，并把部分行的字段名替换为残留标记"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'synthetic.base')
+        write_base(path, tables=tables, fields=fields, workflows=0)
+        out_path = os.path.join(tmp_dir, generate_全量字段表.OUTPUT_PATH)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_全量字段表.run(BaseDocument.load(path), output_path=out_path)
+        with open(out_path, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+    rnd = random.Random(seed)
+    for i, line in enumerate(lines):
+        if line.startswith('| ') and rnd.random() < residue:
+            lines[i] = f"| {rnd.choice(RESIDUE_SAMPLES)} " + line[2:]
+    return '\n'.join(lines)
+
+
+def timed(func, content):
+    start = time.perf_counter()
+    result = func(content)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="残留扫描基准")
+    parser.add_argument("--doc", help="已有的生成文档；不指定则生成合成文档")
+    parser.add_argument("--tables", type=int, default=300)
+    parser.add_argument("--fields", type=int, default=80)
+    parser.add_argument("--residue", type=float, default=0.05, help="注入残留标记的表格行比例")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-legacy", action="store_true", help="不运行旧实现（大文档时很慢）")
+    args = parser.parse_args()
+
+    if args.doc:
+        with open(args.doc, 'r', encoding='utf-8') as f:
+            content = f.read()
+    else:
+        print(f"生成合成文档: {args.tables} 张表 × {args.fields} 个字段，残留比例 {args.residue} ...")
+        content = build_doc(args.tables, args.fields, args.residue, args.seed)
+
+    print(f"文档大小: {len(content.encode('utf-8')) / 1024 / 1024:.1f} MB，{content.count(chr(10)) + 1} 行\n")
+    hits, seconds = timed(scan_residue, content)
+    print(f"{'方式':<10} {'匹配数':>8} {'耗时(s)':>10}")
+    print(f"{'单遍扫描':<10} {len(hits):>8} {seconds:>10.3f}")
+    if args.skip_legacy:
+        return
+
+    legacy_hits, legacy_seconds = timed(legacy_scan, content)
+    print(f"{'逐模式扫描':<10} {len(legacy_hits):>8} {legacy_seconds:>10.3f}")
+    same = hits == legacy_hits
+    print(f"\n加速 {legacy_seconds / max(seconds, 1e-9):.1f} 倍，结果{'一致' if same else '不一致 ❌'}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成 .base 生成器 (Synthetic Base Generator)
+============================================
+功能：生成结构与飞书导出一致的 .base 文件，用于性能测试，无需真实客户数据。
+特性：
+- gzipSnapshot / gzipAutomation / gzipExtraInfo 均按 gzip + base64 打包
+- 字段覆盖文本、数字、单选、公式、查找引用、关联、选项同步、AI 字段
+- 默认按固定顺序轮换字段类型；指定 --formula-ratio / --lookup-ratio 时按比例随机分配
+  公式字段和查找引用 / 关联字段，其余类型继续轮换
+- 工作流覆盖触发器、查找、循环、修改、条件分支等常见步骤，--depth 控制循环嵌套层数
+
+用法：
+    python3 benchmarks/synthetic_base.py out.base --tables 50 --fields 40 --workflows 100
+    python3 benchmarks/synthetic_base.py out.base --formula-ratio 0.3 --lookup-ratio 0.2 --depth 3
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import random
+
+
+def pack(obj):
+    """按 .base 的格式打包: JSON → gzip → base64"""
+    raw = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+    return base64.b64encode(gzip.compress(raw)).decode('ascii')
+
+
+def _table_id(i):
+    return f"tbl{i:08d}syn"
+
+
+def _field_id(ti, j):
+    return f"fld{ti:05d}{j:05d}"
+
+
+# 按比例分配时，公式 / 查找引用 / 关联以外的字段类型仍按 j 轮换
+OTHER_KINDS = (0, 2, 5, 6, 7)
+
+
+def pick_kind(rnd, j, formula_ratio, lookup_ratio):
+    """
+    字段类型编号（与 build_field 中的 kind 对应）。
+    两个比例都为 None 时按 j % 8 轮换；否则公式占 formula_ratio，
+    查找引用和关联各占 lookup_ratio 的一半。第 0 个字段固定为文本（其他字段引用它作主键）。
+    """
+    if formula_ratio is None and lookup_ratio is None:
+        return j % 8
+    if j == 0:
+        return 0
+    r = rnd.random()
+    formula_ratio = formula_ratio or 0.0
+    lookup_ratio = lookup_ratio or 0.0
+    if r < formula_ratio:
+        return 1
+    if r < formula_ratio + lookup_ratio:
+        return 3 if r < formula_ratio + lookup_ratio / 2 else 4
+    return OTHER_KINDS[j % len(OTHER_KINDS)]
+
+
+def module_range(ti, tables, modules):
+    """第 ti 张表所在模块的表下标范围；modules 个模块之间互不引用"""
+    size = -(-tables // max(modules, 1))
+    lo = ti // size * size
+    return lo, min(lo + size, tables)
+
+
+def build_field(rnd, ti, j, tids, n_fields, counters, formula_ratio=None, lookup_ratio=None, modules=1):
+    """生成一个字段定义，字段类型见 pick_kind；跨表引用只指向同一模块内的表"""
+    tid = tids[ti]
+    if modules > 1:
+        lo, hi = module_range(ti, len(tids), modules)
+        other_i = lo + rnd.randrange(hi - lo)
+    else:
+        other_i = rnd.randrange(len(tids))
+    other = tids[other_i]
+    kind = pick_kind(rnd, j, formula_ratio, lookup_ratio)
+    if kind == 1:
+        return {"name": f"公式{ti}_{j}", "type": 20, "property": {"formula": (
+            f"bitable::$table[{other}].FILTER("
+            f"CurrentValue.$column[{_field_id(other_i, 0)}]=bitable::$table[{tid}].$field[{_field_id(ti, 0)}]"
+            f"&&CurrentValue.$column[{_field_id(other_i, 2)}]!=\"已取消\")"
+            f".$column[{_field_id(other_i, 7)}].SUM() + $field[{_field_id(ti, 7)}]")}}
+    if kind == 2:
+        options = []
+        for _ in range(4):
+            options.append({"id": f"opt{counters['opt']:08d}", "name": f"选项{counters['opt']}"})
+            counters['opt'] += 1
+        return {"name": f"状态{ti}_{j}", "type": 3, "property": {"options": options}}
+    if kind == 3:
+        return {"name": f"查找{ti}_{j}", "type": 19, "property": {
+            "filterInfo": {"targetTable": other}, "targetField": _field_id(other_i, 7),
+            "formula": (f"bitable::$table[{other}].FILTER(CurrentValue.$column[{_field_id(other_i, 0)}]"
+                        f"=$column[{_field_id(ti, 0)}]).$column[{_field_id(other_i, 7)}]")}}
+    if kind == 4:
+        return {"name": f"关联{ti}_{j}", "type": rnd.choice([18, 21]), "property": {"tableId": other}}
+    if kind == 5:
+        return {"name": f"同步{ti}_{j}", "type": 4, "property": {
+            "options": [], "optionsRule": {"targetTable": other, "targetField": _field_id(other_i, 0)}}}
+    if kind == 6:
+        return {"name": f"AI摘要{ti}_{j}", "type": 1, "property": {}, "ext": {"ai": {"prompt": [
+            {"type": "text", "value": "请总结以下内容："},
+            {"type": "variable", "value": {"valueType": "field", "value": {"id": _field_id(ti, 0)}}}]}}}
+    if kind == 7:
+        return {"name": f"金额{ti}_{j}", "type": 2, "property": {"formatter": "0.00"}}
+    return {"name": f"文本{ti}_{j}", "type": 1, "property": {},
+            "description": {"text": f"第 {ti} 张表的第 {j} 个字段"}}
+
+
+def add_description(rnd, field_def, desc_len):
+    """追加随机说明文本，使压缩率接近真实导出文件"""
+    if desc_len > 0:
+        noise = format(rnd.getrandbits(desc_len * 4), f'0{desc_len}x')
+        text = field_def.get('description', {}).get('text', '')
+        field_def['description'] = {"text": f"{text} {noise}".strip()}
+    return field_def
+
+
+def build_workflow(rnd, w, tids, n_fields, depth=1):
+    """
+    生成一个工作流（Draft 为 JSON 字符串，与真实导出一致）。
+    depth 为循环嵌套层数：每多一层，在上一层循环体内追加「按当前项查找 → 遍历查找结果」，
+    修改记录步骤位于最内层循环。
+    """
+    ti = rnd.randrange(len(tids))
+    tid = tids[ti]
+    ref = f"ref_{tid}"
+    f_key, f_status, f_amount = _field_id(ti, 0), _field_id(ti, 2), _field_id(ti, min(7, n_fields - 1))
+    steps = [
+        {"id": "s1", "type": rnd.choice(["ChangeRecordTrigger", "SetRecordTrigger", "AddRecordTrigger"]),
+         "data": {"tableId": ref, "fields": [{"fieldId": f"ref_{tid}_{f_status}", "operator": "is", "value": []}],
+                  "triggerControlList": ["pasteUpdate", "automationBatchUpdate"]},
+         "next": [{"condition": {"conjunction": "and", "conditions": [
+             {"fieldId": f_key, "operator": "isNotEmpty", "value": []}]}}]},
+        {"id": "s2", "type": "FindRecordAction", "data": {"tableId": ref, "fieldIds": [f_key, f_amount],
+         "recordInfo": {"conditions": [{"fieldId": f_key, "operator": "is", "value": {
+             "type": "ref", "tagType": "step", "stepNum": 1, "fields": [{"fieldId": f_key}]}}]}}},
+    ]
+    find_num = 2
+    for level in range(max(depth, 1)):
+        loop_num = len(steps) + 1
+        steps.append({"id": f"s{loop_num}", "type": "Loop", "data": {
+            "loopType": "forEach", "loopData": {"type": "ref", "stepNum": find_num},
+            "maxLoopTimes": 500, "startChildStepId": f"s{loop_num + 1}"}})
+        if level == max(depth, 1) - 1:
+            break
+        find_num = loop_num + 1
+        steps.append({"id": f"s{find_num}", "type": "FindRecordAction", "data": {
+            "tableId": ref, "fieldIds": [f_key, f_amount],
+            "recordInfo": {"conditions": [{"fieldId": f_key, "operator": "is", "value": {
+                "type": "ref", "tagType": "loop", "stepNum": loop_num, "fields": [{"fieldId": f_key}]}}]}}})
+    n = len(steps)
+    steps += [
+        {"id": f"s{n + 1}", "type": "UpdateRecordAction", "data": {"tableId": ref, "recordType": "stepRecord",
+         "recordInfo": {"type": "ref", "stepNum": find_num}, "values": [
+             {"fieldId": f_amount, "value": [{"type": "ref", "tagType": "loop", "stepNum": n,
+                                              "fields": [{"fieldId": f_key}]}]}]}},
+        {"id": f"s{n + 2}", "type": "IfElseBranch", "data": {"condition": {"conjunction": "And", "conditions": [
+            {"leftValue": {"type": "ref", "tagType": "RecordAttribute", "stepNum": 2, "attribute": "recordNum",
+                           "stepType": "FindRecordAction"}, "operator": "isGreater", "rightValue": [{"text": "0"}]}]},
+            "meetConditionStepId": f"s{n + 3}"}},
+        {"id": f"s{n + 3}", "type": "AddRecordAction", "data": {"tableId": ref, "values": [
+            {"fieldId": f_key, "value": "自动生成"}]}},
+    ]
+    draft = {"title": f"工作流{w}", "steps": steps}
+    return {"id": f"wf{w:06d}", "base_id": "bascnSynthetic", "status": rnd.choice([0, 1]),
+            "WorkflowExtra": {"Draft": json.dumps(draft, ensure_ascii=False),
+                              "Extra": {"TableMap": {ref: {"TableID": tid, "FieldMap": {}}}}}}
+
+
+def build_base(tables=20, fields=30, workflows=50, seed=0, desc_len=0,
+               formula_ratio=None, lookup_ratio=None, depth=1, modules=1):
+    """
+    生成 .base 顶层字典。
+    desc_len > 0 时为每个字段附加该长度的随机说明，用于模拟大文件。
+    formula_ratio / lookup_ratio / depth 见 pick_kind 与 build_workflow；
+    modules > 1 时表按顺序均分为互不引用的模块（用于测试 --tables 限定范围）。
+    均保持默认值时生成的内容与未指定时一致。
+    """
+    rnd = random.Random(seed)
+    tids = [_table_id(i) for i in range(tables)]
+    counters = {'opt': 0}
+    table_defs = []
+    for ti, tid in enumerate(tids):
+        field_map = {_field_id(ti, j): add_description(
+                         rnd, build_field(rnd, ti, j, tids, fields, counters, formula_ratio, lookup_ratio, modules), desc_len)
+                     for j in range(fields)}
+        table_defs.append({"meta": {"id": tid, "name": f"数据表{ti}"}, "fieldMap": field_map})
+
+    snapshot = [{"schema": {
+        "tableMap": {tid: {"name": f"数据表{ti}"} for ti, tid in enumerate(tids)},
+        "data": {"tables": table_defs},
+        "base": {"blockInfos": {}},
+    }}]
+    wf_list = [build_workflow(rnd, w, tids, fields, depth) for w in range(workflows)]
+    extra = {"tables": [{"tableId": tid, "fields": [{"fieldId": _field_id(ti, j)} for j in range(fields)]}
+                        for ti, tid in enumerate(tids)]}
+    sign = f"synthetic-{tables}-{fields}-{workflows}-{seed}"
+    if formula_ratio is not None or lookup_ratio is not None or depth != 1:
+        sign += f"-f{formula_ratio}-l{lookup_ratio}-d{depth}"
+    if modules > 1:
+        sign += f"-m{modules}"
+    return {
+        "gzipSnapshot": pack(snapshot),
+        "gzipAutomation": pack(wf_list),
+        "gzipExtraInfo": pack(extra),
+        "sign": sign,
+    }
+
+
+def write_base(path, **kwargs):
+    """生成并写出 .base 文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(build_base(**kwargs), f, ensure_ascii=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成 .base 文件")
+    parser.add_argument("output", help="输出路径")
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--fields", type=int, default=30, help="每张表字段数")
+    parser.add_argument("--workflows", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--desc-len", type=int, default=0, help="每个字段附加的随机说明长度")
+    parser.add_argument("--formula-ratio", type=float, help="公式字段占比（0~1，默认按固定顺序轮换类型）")
+    parser.add_argument("--lookup-ratio", type=float, help="查找引用 + 关联字段占比（0~1，两者各占一半）")
+    parser.add_argument("--depth", type=int, default=1, help="工作流循环嵌套层数")
+    parser.add_argument("--modules", type=int, default=1, help="把表均分为互不引用的模块数")
+    args = parser.parse_args()
+    if (args.formula_ratio or 0) + (args.lookup_ratio or 0) > 1:
+        parser.error("--formula-ratio 与 --lookup-ratio 之和不能超过 1")
+    write_base(args.output, tables=args.tables, fields=args.fields, workflows=args.workflows,
+               seed=args.seed, desc_len=args.desc_len, formula_ratio=args.formula_ratio,
+               lookup_ratio=args.lookup_ratio, depth=args.depth, modules=args.modules)
+    print(f"✅ 已生成: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
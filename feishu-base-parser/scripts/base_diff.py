@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结构差异比对 (Semantic Base Diff)
+================================
+功能：按稳定 ID 比对两个 .base 文件（例如每周导出的两个版本），报告数据表、字段、
+      公式、选项和自动化工作流的变化，而不必比对生成的 Markdown。
+特性：
+- 按 ID 对齐：改名报告为「重命名」，而不是一删一增
+- 逐层比较内容哈希：两个文件的快照 / 自动化数据块完全相同时不解压；
+  表、字段、工作流、步骤的哈希相同即整体跳过，大 base 中只深入真正改动的部分
+- 公式变化同时给出翻译后的新旧公式；选项按选项 ID 报告新增 / 删除 / 重命名
+- 工作流变化细化到步骤，步骤描述与自动化地图使用同一套解析逻辑，以 diff 形式展示
+
+用法：
+    python3 scripts/base_diff.py 旧版本.base 新版本.base [-o 结构差异报告.md] [--json]
+
+输出：结构差异报告.md（--json 时输出 JSON 变更列表）
+"""
+
+import argparse
+import datetime
+import difflib
+import json
+import sys
+import time
+
+from base_loader import BaseDocument
+from fragment_cache import digest
+from formula import FormulaTranslator
+from generate_全量字段表 import extract_field_config, get_field_type_name
+from generate_自动化地图 import (ACTION_TYPES, TRIGGER_TYPES, build_block_map, iter_step_lines,
+                              load_draft, workflow_title)
+from name_registry import WorkflowRefs
+
+# ========== 配置 ==========
+OUTPUT_PATH = "结构差异报告.md"
+
+ACTION_LABELS = {'added': '新增', 'removed': '删除', 'renamed': '重命名', 'modified': '修改'}
+ACTION_ICONS = {'added': '➕', 'removed': '➖', 'renamed': '✏️', 'modified': '🔧'}
+KIND_LABELS = {'table': '数据表', 'field': '字段', 'option': '选项', 'workflow': '工作流', 'step': '工作流步骤'}
+
+
+class DiffSide:
+    """比对的一侧：名称映射、公式翻译器（两侧各自缓存），按 ID 索引的表和工作流"""
+
+    def __init__(self, doc):
+        self.doc = doc
+        registry = doc.registry
+        self.table_map = registry.table_map
+        self.field_map = registry.field_map
+        self.option_map = registry.option_map
+        self.translator = FormulaTranslator(self.table_map, self.field_map)
+        self.tables = {}
+        for table in registry.all_tables:
+            table_id = table.get('meta', {}).get('id')
+            if table_id:
+                self.tables[table_id] = table
+        self._block_map = None
+        workflows = doc.automation if isinstance(doc.automation, list) else []
+        self.workflows = {wf.get('id'): wf for wf in workflows if isinstance(wf, dict)}
+
+    @property
+    def block_map(self):
+        if self._block_map is None:
+            self._block_map = build_block_map(self.doc.snapshot or [])
+        return self._block_map
+
+    def table_name(self, table_id):
+        return self.table_map.get(table_id, table_id)
+
+    def describe_workflow(self, wf_item):
+        """(标题, 启用状态, [(步骤键, 步骤, 描述行), ...])"""
+        draft = load_draft(wf_item)
+        if not isinstance(draft, dict):
+            draft = {}
+        refs = WorkflowRefs(wf_item.get('WorkflowExtra', {}).get('Extra', {}).get('TableMap', {}), self.field_map)
+        wf_id = wf_item.get('id', '未知')
+        steps = []
+        for i, (step, lines) in enumerate(iter_step_lines(draft.get('steps', []), refs, self.table_map,
+                                                          self.field_map, self.option_map)):
+            steps.append((step.get('id') or f"#{i + 1}", step, [line.rstrip() for line in lines if line.strip()]))
+        title = workflow_title(wf_id, draft, refs, self.table_map, self.block_map)
+        return title, wf_item.get('status', 0) == 1, steps
+
+
+class DiffStats:
+    """比较 / 跳过计数，用于说明哈希剪枝的效果"""
+
+    def __init__(self):
+        self.tables_compared = 0
+        self.tables_skipped = 0
+        self.workflows_compared = 0
+        self.workflows_skipped = 0
+        self.blocks_skipped = []
+
+
+# ========== 数据表与字段 ==========
+
+def _type_label(field_type):
+    return f"{get_field_type_name(field_type)} ({field_type})"
+
+
+def _options(field_def):
+    """{选项ID: 选项名}（保持顺序）"""
+    return {opt.get('id'): opt.get('name') for opt in (field_def.get('property') or {}).get('options') or []
+            if opt.get('id')}
+
+
+def diff_options(table_id, field_id, old_def, new_def):
+    """按选项 ID 比较单选 / 多选字段的选项"""
+    old_opts, new_opts = _options(old_def), _options(new_def)
+    base = {'kind': 'option', 'table_id': table_id, 'field_id': field_id,
+            'field_name': new_def.get('name', field_id)}
+    for opt_id, name in new_opts.items():
+        if opt_id not in old_opts:
+            yield dict(base, action='added', id=opt_id, name=name)
+        elif old_opts[opt_id] != name:
+            yield dict(base, action='renamed', id=opt_id, name=name, old_name=old_opts[opt_id])
+    for opt_id, name in old_opts.items():
+        if opt_id not in new_opts:
+            yield dict(base, action='removed', id=opt_id, name=name)
+
+
+def field_changes(table_id, old_def, new_def, old, new):
+    """字段属性的变化列表 [{'attr', 'old', 'new'}]（不含改名和选项）"""
+    changes = []
+    old_type, new_type = old_def.get('type'), new_def.get('type')
+    if old_type != new_type:
+        changes.append({'attr': '类型', 'old': _type_label(old_type), 'new': _type_label(new_type)})
+
+    old_prop, new_prop = old_def.get('property') or {}, new_def.get('property') or {}
+    if old_prop.get('formula') != new_prop.get('formula'):
+        changes.append({
+            'attr': '公式',
+            'old': old.translator.translate(old_prop['formula'], table_id) if old_prop.get('formula') else None,
+            'new': new.translator.translate(new_prop['formula'], table_id) if new_prop.get('formula') else None,
+        })
+
+    old_desc = (old_def.get('description') or {}).get('text', '')
+    new_desc = (new_def.get('description') or {}).get('text', '')
+    if old_desc != new_desc:
+        changes.append({'attr': '说明', 'old': old_desc, 'new': new_desc})
+
+    old_config, _, old_ai = extract_field_config(old_def, table_id, old.table_map, old.field_map, old.translator)
+    new_config, _, new_ai = extract_field_config(new_def, table_id, new.table_map, new.field_map, new.translator)
+    if old_ai != new_ai:
+        changes.append({'attr': 'AI 提示词', 'old': old_ai, 'new': new_ai})
+    # 公式 / 选项已单独报告；其余配置（查找引用、关联、编号规则等）按配置说明比较
+    if old_config != new_config and not any(c['attr'] == '公式' for c in changes) \
+            and _options(old_def) == _options(new_def):
+        changes.append({'attr': '配置', 'old': old_config, 'new': new_config})
+
+    if not changes and old_prop != new_prop and _options(old_def) == _options(new_def):
+        changes.append({'attr': '其他属性', 'old': None, 'new': None})
+    return changes
+
+
+def diff_fields(table_id, old_table, new_table, old, new):
+    """逐字段比较同一张表；字段定义哈希相同的直接跳过"""
+    old_fields = old_table.get('fieldMap', {})
+    new_fields = new_table.get('fieldMap', {})
+    table_name = new.table_name(table_id)
+
+    for field_id, new_def in new_fields.items():
+        base = {'kind': 'field', 'table_id': table_id, 'table_name': table_name, 'id': field_id,
+                'name': new_def.get('name', field_id)}
+        old_def = old_fields.get(field_id)
+        if old_def is None:
+            yield dict(base, action='added', type=_type_label(new_def.get('type')))
+            continue
+        if digest(old_def) == digest(new_def):
+            continue
+
+        old_name = old_def.get('name', field_id)
+        if old_name != base['name']:
+            yield dict(base, action='renamed', old_name=old_name)
+        changes = field_changes(table_id, old_def, new_def, old, new)
+        if changes:
+            yield dict(base, action='modified', changes=changes)
+        yield from diff_options(table_id, field_id, old_def, new_def)
+
+    for field_id, old_def in old_fields.items():
+        if field_id not in new_fields:
+            yield {'kind': 'field', 'action': 'removed', 'table_id': table_id, 'table_name': table_name,
+                   'id': field_id, 'name': old_def.get('name', field_id), 'type': _type_label(old_def.get('type'))}
+
+
+def diff_tables(old, new, stats):
+    """按表 ID 比较全部数据表；表结构哈希相同且表名未变的整表跳过"""
+    for table_id, new_table in new.tables.items():
+        old_table = old.tables.get(table_id)
+        name = new.table_name(table_id)
+        if old_table is None:
+            yield {'kind': 'table', 'action': 'added', 'id': table_id, 'name': name,
+                   'field_count': len(new_table.get('fieldMap', {}))}
+            continue
+
+        old_name = old.table_name(table_id)
+        if old_name != name:
+            yield {'kind': 'table', 'action': 'renamed', 'id': table_id, 'name': name, 'old_name': old_name}
+        if digest(old_table) == digest(new_table):
+            stats.tables_skipped += 1
+            continue
+        stats.tables_compared += 1
+        yield from diff_fields(table_id, old_table, new_table, old, new)
+
+    for table_id, old_table in old.tables.items():
+        if table_id not in new.tables:
+            yield {'kind': 'table', 'action': 'removed', 'id': table_id, 'name': old.table_name(table_id),
+                   'field_count': len(old_table.get('fieldMap', {}))}
+
+
+# ========== 自动化 ==========
+
+def _step_type(step):
+    step_type = step.get('type')
+    return TRIGGER_TYPES.get(step_type) or ACTION_TYPES.get(step_type, step_type)
+
+
+def diff_steps(wf_id, old_steps, new_steps):
+    """
+    按步骤 ID 比较；原始定义哈希相同的步骤视为未改动
+    （引用的表 / 字段 / 选项改名已作为字段变更单独报告，不在每个步骤里重复）。
+    """
+    old_by_key = {key: (step, lines) for key, step, lines in old_steps}
+    new_keys = set()
+    for index, (key, step, lines) in enumerate(new_steps, 1):
+        new_keys.add(key)
+        base = {'kind': 'step', 'workflow_id': wf_id, 'id': key, 'index': index, 'type': _step_type(step)}
+        if key not in old_by_key:
+            yield dict(base, action='added', new_lines=lines)
+            continue
+        old_step, old_lines = old_by_key[key]
+        if digest(old_step) != digest(step):
+            yield dict(base, action='modified', old_lines=old_lines, new_lines=lines)
+    for index, (key, step, lines) in enumerate(old_steps, 1):
+        if key not in new_keys:
+            yield {'kind': 'step', 'workflow_id': wf_id, 'id': key, 'index': index, 'type': _step_type(step),
+                   'action': 'removed', 'old_lines': lines}
+
+
+def diff_workflows(old, new, stats):
+    """
+    按工作流 ID 比较。工作流定义哈希相同、侧边栏名称也未变的整体跳过
+    （侧边栏名称存放在快照中，可能在工作流定义不变时改变标题）。
+    """
+    for wf_id, new_wf in new.workflows.items():
+        old_wf = old.workflows.get(wf_id)
+        if old_wf is None:
+            title, enabled, steps = new.describe_workflow(new_wf)
+            yield {'kind': 'workflow', 'action': 'added', 'id': wf_id, 'title': title, 'enabled': enabled,
+                   'step_count': len(steps)}
+            continue
+        if digest(old_wf) == digest(new_wf) and old.block_map.get(str(wf_id)) == new.block_map.get(str(wf_id)):
+            stats.workflows_skipped += 1
+            continue
+
+        stats.workflows_compared += 1
+        old_title, old_enabled, old_steps = old.describe_workflow(old_wf)
+        title, enabled, steps = new.describe_workflow(new_wf)
+        step_records = list(diff_steps(wf_id, old_steps, steps))
+        changes = []
+        if old_title != title:
+            changes.append({'attr': '标题', 'old': old_title, 'new': title})
+        if old_enabled != enabled:
+            changes.append({'attr': '状态', 'old': '已启用' if old_enabled else '已禁用',
+                            'new': '已启用' if enabled else '已禁用'})
+        if changes or step_records:
+            yield {'kind': 'workflow', 'action': 'modified', 'id': wf_id, 'title': title, 'changes': changes}
+            yield from step_records
+
+    for wf_id, old_wf in old.workflows.items():
+        if wf_id not in new.workflows:
+            title, enabled, steps = old.describe_workflow(old_wf)
+            yield {'kind': 'workflow', 'action': 'removed', 'id': wf_id, 'title': title, 'enabled': enabled,
+                   'step_count': len(steps)}
+
+
+def _same_block(old_doc, new_doc, key):
+    """
+    两个文件的原始（压缩）数据块是否完全相同：相同则无需解压比较。
+    BaseDocument 解压后会释放原文，已解压的块一律视为不同，走逐项比较。
+    """
+    raw = old_doc.get(key)
+    return raw is not None and raw == new_doc.get(key)
+
+
+def diff_documents(old_doc, new_doc, stats=None):
+    """
+    比较两个 BaseDocument，返回变更记录列表。
+    应在访问 snapshot / automation 之前调用，以便对原始数据块做快速相等判断。
+    快照解压失败时抛出 ValueError。
+    """
+    stats = stats if stats is not None else DiffStats()
+    same_snapshot = _same_block(old_doc, new_doc, 'gzipSnapshot')
+    same_automation = _same_block(old_doc, new_doc, 'gzipAutomation')
+    if same_snapshot and same_automation:
+        stats.blocks_skipped = ['gzipSnapshot', 'gzipAutomation']
+        return []
+
+    for doc in (old_doc, new_doc):
+        if not doc.snapshot:
+            raise ValueError(f"快照解压失败: {doc.path}")
+    old, new = DiffSide(old_doc), DiffSide(new_doc)
+    records = []
+    if same_snapshot:
+        stats.blocks_skipped.append('gzipSnapshot')
+    else:
+        records.extend(diff_tables(old, new, stats))
+    records.extend(diff_workflows(old, new, stats))
+    return records
+
+
+# ========== 报告 ==========
+
+def summarize(records):
+    """{类别: {动作: 数量}}"""
+    counts = {kind: dict.fromkeys(ACTION_LABELS, 0) for kind in KIND_LABELS}
+    for record in records:
+        counts[record['kind']][record['action']] += 1
+    return counts
+
+
+def _value(text):
+    return f"`{text}`" if text not in (None, '') else "（空）"
+
+
+def _render_changes(out, changes, indent="  "):
+    for change in changes:
+        if change['old'] is None and change['new'] is None:
+            out.append(f"{indent}- {change['attr']}有变化")
+        else:
+            out.append(f"{indent}- {change['attr']}: {_value(change['old'])} → {_value(change['new'])}")
+
+
+def _render_step_diff(out, record):
+    """步骤描述的差异，以 diff 代码块展示"""
+    old_lines = [line.strip() for line in record.get('old_lines', [])]
+    new_lines = [line.strip() for line in record.get('new_lines', [])]
+    diff = [line for line in difflib.unified_diff(old_lines, new_lines, lineterm='', n=1)
+            if not line.startswith(('---', '+++', '@@'))]
+    if not diff:
+        diff = ["  （描述未变，原始定义有变化）"]
+    out.append("  ```diff")
+    out.extend(f"  {line}" for line in diff)
+    out.append("  ```")
+
+
+def render_markdown(records, old_path, new_path, stats):
+    """变更记录 → Markdown 行列表"""
+    out = [
+        "# 结构差异报告\n",
+        f"> 旧版本: `{old_path}`",
+        f"> 新版本: `{new_path}`",
+        f"> 生成时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}\n",
+        "## 📊 变更概览\n",
+        "| 类别 | 新增 | 删除 | 重命名 | 修改 |",
+        "|------|------|------|--------|------|",
+    ]
+    for kind, counts in summarize(records).items():
+        out.append(f"| {KIND_LABELS[kind]} | " + " | ".join(str(counts[a]) for a in ACTION_LABELS) + " |")
+    out.append("")
+    out.append(f"> 内容哈希相同而跳过：数据表 {stats.tables_skipped} 张，工作流 {stats.workflows_skipped} 个"
+               + (f"；未改动的数据块：{', '.join(stats.blocks_skipped)}" if stats.blocks_skipped else "") + "\n")
+
+    if not records:
+        out.append("两个版本的结构完全相同。\n")
+        return out
+
+    # 数据表与字段：按表分组
+    table_records = [r for r in records if r['kind'] in ('table', 'field', 'option')]
+    if table_records:
+        out.append("## 🗂️ 数据表与字段\n")
+        groups = {}
+        for record in table_records:
+            table_id = record['id'] if record['kind'] == 'table' else record['table_id']
+            groups.setdefault(table_id, []).append(record)
+        for table_id, group in groups.items():
+            table_record = next((r for r in group if r['kind'] == 'table'), None)
+            name = table_record['name'] if table_record else group[0].get('table_name', table_id)
+            out.append(f"### {name}")
+            out.append(f"- **表 ID**: `{table_id}`")
+            for record in group:
+                icon, label = ACTION_ICONS[record['action']], ACTION_LABELS[record['action']]
+                if record['kind'] == 'table':
+                    if record['action'] == 'renamed':
+                        out.append(f"- {icon} 表重命名: 「{record['old_name']}」 → 「{record['name']}」")
+                    else:
+                        out.append(f"- {icon} {label}数据表（{record['field_count']} 个字段）")
+                elif record['kind'] == 'field':
+                    if record['action'] == 'renamed':
+                        out.append(f"- {icon} 字段重命名: 「{record['old_name']}」 → 「{record['name']}」 (`{record['id']}`)")
+                    elif record['action'] == 'modified':
+                        out.append(f"- {icon} 修改字段「{record['name']}」 (`{record['id']}`)")
+                        _render_changes(out, record['changes'])
+                    else:
+                        out.append(f"- {icon} {label}字段「{record['name']}」 (`{record['id']}`, {record['type']})")
+                else:
+                    field_name = record['field_name']
+                    if record['action'] == 'renamed':
+                        out.append(f"- {icon} 字段「{field_name}」的选项重命名: "
+                                   f"「{record['old_name']}」 → 「{record['name']}」")
+                    else:
+                        out.append(f"- {icon} 字段「{field_name}」{label}选项「{record['name']}」")
+            out.append("")
+
+    # 自动化：按工作流分组
+    wf_records = [r for r in records if r['kind'] in ('workflow', 'step')]
+    if wf_records:
+        out.append("## ⚡ 自动化工作流\n")
+        for record in wf_records:
+            icon, label = ACTION_ICONS[record['action']], ACTION_LABELS[record['action']]
+            if record['kind'] == 'workflow':
+                out.append(f"### {icon} {record['title']}")
+                out.append(f"- **工作流 ID**: `{record['id']}`")
+                if record['action'] == 'modified':
+                    _render_changes(out, record['changes'], indent="")
+                else:
+                    status = '已启用' if record['enabled'] else '已禁用'
+                    out.append(f"- {label}工作流（{status}，{record['step_count']} 个步骤）")
+            else:
+                out.append(f"- {icon} {label}步骤 {record['index']} · {record['type']} (`{record['id']}`)")
+                _render_step_diff(out, record)
+        out.append("")
+    return out
+
+
+def run(old_doc, new_doc, output_path=OUTPUT_PATH, as_json=False):
+    """比较两个已加载的 BaseDocument 并写出报告，成功返回 True"""
+    start = time.perf_counter()
+    stats = DiffStats()
+    try:
+        records = diff_documents(old_doc, new_doc, stats)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    elapsed = time.perf_counter() - start
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        if as_json:
+            json.dump({'old': old_doc.path, 'new': new_doc.path, 'summary': summarize(records),
+                       'changes': records}, f, ensure_ascii=False, indent=2)
+        else:
+            f.write("\n".join(render_markdown(records, old_doc.path, new_doc.path, stats)))
+
+    print(f"比较了 {stats.tables_compared} 张表、{stats.workflows_compared} 个工作流，"
+          f"哈希相同跳过 {stats.tables_skipped} 张表、{stats.workflows_skipped} 个工作流 ({elapsed:.2f}s)")
+    print(f"\n✅ 共 {len(records)} 项变更，已生成: {output_path}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按 ID 比对两个 .base 文件的结构差异")
+    parser.add_argument("old", help="旧版本 .base 文件")
+    parser.add_argument("new", help="新版本 .base 文件")
+    parser.add_argument("-o", "--output", help=f"输出路径（默认 {OUTPUT_PATH}，--json 时为 结构差异.json）")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 变更列表而不是 Markdown")
+    args = parser.parse_args()
+
+    docs = []
+    for path in (args.old, args.new):
+        print(f"读取文件: {path}")
+        try:
+            docs.append(BaseDocument.load(path))
+        except Exception as e:
+            print(f"❌ 文件读取失败: {e}")
+            sys.exit(1)
+
+    output = args.output or ("结构差异.json" if args.json else OUTPUT_PATH)
+    if not run(docs[0], docs[1], output, as_json=args.json):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+.base 文件加载器 (Base Document Loader)
+=======================================
+功能：一次读取 .base 文件，供所有生成器脚本共享。
+特性：
+- 整个 JSON 只解析一次
+- gzip* 数据块在首次访问时才解压，解压结果缓存复用
+- 流式解压（base64 分块解码 → zlib），并在解析 JSON 前释放 base64 原文，降低峰值内存
+- 名称注册表同样只构建一次；select_tables() 可只为指定的表及其引用涉及的表构建
+- 指定 cache_dir 时，解压后的数据块和名称注册表缓存到磁盘（见 model_cache），
+  .base 未变化时再次加载不读取原文件、不解压
+- 解压 / 解析失败的诊断信息写到标准错误，不混入 export_ndjson、query_server 等脚本的标准输出数据流
+
+用法：
+    doc = BaseDocument.load("xxx.base")
+    doc = BaseDocument.load("xxx.base", cache_dir=".feishu_cache")  # 使用解码模型缓存
+    snapshot = doc.snapshot      # gzipSnapshot
+    workflows = doc.automation   # gzipAutomation
+    registry = doc.registry      # NameRegistry
+    names = doc.names(compact=True)  # 只查名称时可用的紧凑 FieldCatalog（接口与 registry 相同）
+    doc.select_tables(["订单"])  # 之后 registry 只含指定的表（及其传递引用的表的字段）
+"""
+
+import json
+import base64
+import os
+import sys
+import zlib
+
+import profiling
+from field_catalog import FieldCatalog
+from model_cache import REGISTRY, ModelCache
+from name_registry import NameRegistry
+
+
+# 流式解压时每次解码的 base64 字符数（必须是 4 的倍数）
+CHUNK_SIZE = 4 * 256 * 1024
+
+
+def _iter_compressed_bytes(compressed_content, chunk_size=CHUNK_SIZE):
+    """逐块产出 gzip 压缩数据 (支持 int列表 或 Base64字符串)"""
+    # 情况1: List of integers
+    if isinstance(compressed_content, list):
+        yield bytes(compressed_content)
+        return
+    
+    # 情况2: Base64 String —— 含换行等非 base64 字符时无法按 4 字符对齐切块，整体解码
+    if any(c in compressed_content for c in ('\n', '\r', ' ')):
+        yield base64.b64decode(compressed_content)
+        return
+    for start in range(0, len(compressed_content), chunk_size):
+        yield base64.b64decode(compressed_content[start:start + chunk_size])
+
+
+def iter_decompressed(compressed_content, chunk_size=CHUNK_SIZE):
+    """
+    流式解压：base64 分块解码后直接送入 zlib，逐块产出解压后的 bytes。
+    不会同时持有完整的 base64 解码结果和完整的解压结果。
+    """
+    decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)  # 16+: gzip 头
+    for chunk in _iter_compressed_bytes(compressed_content, chunk_size):
+        while chunk:
+            out = decomp.decompress(chunk)
+            if out:
+                yield out
+            chunk = b''
+            # 多段 gzip (multi-member)：上一段结束后剩余数据属于下一段
+            if decomp.eof and decomp.unused_data:
+                chunk = decomp.unused_data
+                decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    tail = decomp.flush()
+    if tail:
+        yield tail
+    if not decomp.eof:
+        raise EOFError("gzip 数据不完整")
+
+
+def decompress_text(compressed_content):
+    """解压为 JSON 文本；失败返回 None"""
+    if not compressed_content or not isinstance(compressed_content, (str, list)):
+        return None
+    try:
+        buf = bytearray()
+        for out in iter_decompressed(compressed_content):
+            buf += out
+        return buf.decode('utf-8')
+    except Exception as e:
+        print(f"解压失败: {e}", file=sys.stderr)
+        return None
+
+
+def parse_json_text(text):
+    """解析 decompress_text 的结果；失败返回 None"""
+    if text is None:
+        return None
+    try:
+        return json.loads(text)
+    except Exception as e:
+        print(f"JSON 解析失败: {e}", file=sys.stderr)
+        return None
+
+
+def decompress_content(compressed_content):
+    """解压 gzip 压缩的数据 (支持 int列表 或 Base64字符串)"""
+    return parse_json_text(decompress_text(compressed_content))
+
+
+def read_base_json(path):
+    """读取 .base 文件的顶层 JSON（只做 JSON 解析，不解压）"""
+    with profiling.stage("读取文件"):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def parse_table_list(text):
+    """--tables 参数：逗号分隔的表名或表 ID"""
+    return [name.strip() for name in text.split(',') if name.strip()]
+
+
+def resolve_jobs(jobs):
+    """--jobs 参数：0 表示使用全部 CPU 核数"""
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+
+class BaseDocument:
+    """
+    已加载的 .base 文件。
+    - keys: 顶层数据块名称集合（如 gzipSnapshot、gzipAutomation、sign）
+    - block(key): 按需解压指定的 gzip* 数据块，结果只计算一次
+    """
+
+    def __init__(self, data, path=None, cache=None):
+        if not isinstance(data, dict):
+            raise ValueError(".base 文件顶层结构不是 JSON 对象")
+        self.path = path
+        self.keys = set(data.keys())
+        self._raw = data
+        self._blocks = {}
+        self._registry = None
+        self._catalog = None
+        self._cache = cache
+        self._file_read = True  # False: 从缓存加载，尚未读取原文件
+
+    @classmethod
+    def load(cls, path, cache_dir=None):
+        """
+        读取并解析 .base 文件（只做 JSON 解析，不解压）。
+        cache_dir: 解码模型缓存目录；缓存与文件一致时不读取文件，数据块和注册表从缓存载入。
+        """
+        cache = ModelCache(cache_dir, path) if cache_dir else None
+        if cache is not None and cache.fresh():
+            doc = cls(cache.top_level, path, cache)
+            doc.keys = set(cache.keys)
+            doc._file_read = False
+            return doc
+        data = read_base_json(path)
+        if cache is not None and isinstance(data, dict):
+            cache.adopt(data)
+        return cls(data, path, cache)
+
+    def get(self, key, default=None):
+        """获取未压缩的顶层字段（如 sign）"""
+        return self._raw.get(key, default)
+
+    def block(self, key):
+        """获取解压后的数据块；首次访问时解压，之后直接返回缓存"""
+        if key not in self._blocks:
+            if self._cache is not None and self._cache.has(key):
+                with profiling.stage(f"载入缓存 {key}"):
+                    cached = self._cache.load(key)
+                if cached is not None:
+                    self._raw.pop(key, None)
+                    self._blocks[key] = cached
+                    return cached
+            if not self._file_read and key in self.keys:
+                # 从缓存加载的文档中该块尚未缓存过，读取原文件
+                self._raw.update(read_base_json(self.path))
+                self._file_read = True
+            raw = self._raw.pop(key, None)
+            # 少数导出文件中该块未压缩，直接使用
+            if isinstance(raw, dict):
+                self._blocks[key] = raw
+            else:
+                # 先流式解压为文本并释放 base64 原文，再解析 JSON：
+                # 解析时内存中只剩一份 JSON 文本
+                with profiling.stage(f"解压 {key}"):
+                    text = decompress_text(raw)
+                    del raw
+                    self._blocks[key] = parse_json_text(text)
+            if self._cache is not None and self._blocks[key] is not None:
+                self._cache.save(key, self._blocks[key])
+        return self._blocks[key]
+
+    @property
+    def snapshot(self):
+        """表结构快照 (gzipSnapshot)"""
+        return self.block('gzipSnapshot')
+
+    @property
+    def automation(self):
+        """自动化工作流列表 (gzipAutomation)"""
+        return self.block('gzipAutomation')
+
+    @property
+    def extra_info(self):
+        """表/字段 ID 清单 (gzipExtraInfo)"""
+        return self.block('gzipExtraInfo')
+
+    @property
+    def registry(self):
+        """基于快照构建的名称注册表（首次访问时构建）"""
+        if self._registry is None:
+            snapshot = self.snapshot
+            cached = None
+            if self._cache is not None and self._cache.has(REGISTRY):
+                with profiling.stage("载入缓存 名称映射"):
+                    cached = self._cache.load(REGISTRY)
+                    if cached is not None:
+                        self._registry = NameRegistry.restore(cached, snapshot)
+            if cached is None:
+                with profiling.stage("构建名称映射"):
+                    self._registry = NameRegistry.from_snapshot(snapshot)
+                if self._cache is not None:
+                    self._cache.save(REGISTRY, self._registry.dump())
+        return self._registry
+
+    @property
+    def catalog(self):
+        """基于快照构建的紧凑字段目录 FieldCatalog（首次访问时构建），只保存名称和类型、不保留表结构"""
+        if self._catalog is None:
+            snapshot = self.snapshot
+            with profiling.stage("构建字段目录"):
+                self._catalog = FieldCatalog.from_snapshot(snapshot, keep_tables=False)
+        return self._catalog
+
+    def names(self, compact=False):
+        """
+        名称查询后端（table_map / field_map / option_map）：compact 为真时为 catalog，否则为 registry。
+        catalog 的 all_tables 为空，需要表结构时从快照读取（name_registry.snapshot_tables）。
+        """
+        return self.catalog if compact else self.registry
+
+    @property
+    def selected_tables(self):
+        """select_tables() 限定的表 ID 集合；未限定范围时为 None（不会因此构建注册表）"""
+        return self._registry.selected if self._registry is not None else None
+
+    def select_tables(self, tables):
+        """
+        限定文档范围：按表名或表 ID 重新构建名称注册表，all_tables 只含这些表，
+        字段和选项只注册这些表及其公式 / 查找引用 / 关联传递涉及的表。
+        有找不到的表时抛出 ValueError。返回新的 NameRegistry。
+        """
+        snapshot = self.snapshot
+        with profiling.stage("构建名称映射"):
+            self._registry = NameRegistry.from_snapshot(snapshot, tables=tables)
+        return self._registry
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量生成 (Batch Run)
+====================
+功能：一次调用为多个 .base 文件生成全部文档，每个文件输出到独立的子目录。
+特性：
+- 参数可以是 .base 文件、目录（处理其中所有 .base）或通配符（如 "exports/*.base"）
+- 进程池并行处理多个文件，进程数有上限，每个文件在单个进程内串行生成
+- 每个文件的运行日志写入其输出目录的 生成日志.log，终端只显示进度和汇总
+- 结束时打印总吞吐量（个/秒、MB/秒），任一文件失败时退出码为 1
+
+用法：
+    python3 scripts/batch_run.py exports/ [--output-dir 文档输出] [--workers 4] [--cache-dir DIR]
+
+输出：<output-dir>/<文件名>/ 下的全量字段表.md、字段关联关系图.md、自动化工作流.md、完整性校验报告.md
+"""
+
+import argparse
+import contextlib
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from base_loader import BaseDocument
+import run_all
+
+# ========== 配置 ==========
+OUTPUT_DIR = "文档输出"
+LOG_NAME = "生成日志.log"
+MAX_WORKERS = 4  # 默认并行进程数上限（大文件解压后内存占用较高）
+
+
+def find_base_files(patterns):
+    """展开文件 / 目录 / 通配符参数，返回去重后的 .base 文件列表（保持参数顺序）"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "*.base")))
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+        files.extend(m for m in matches if m.endswith(".base") and os.path.isfile(m))
+    return list(dict.fromkeys(os.path.normpath(f) for f in files))
+
+
+def assign_output_dirs(files, output_dir):
+    """每个文件一个输出子目录（以文件名命名，重名时追加序号）"""
+    used = set()
+    dirs = []
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, n = stem, 2
+        while name in used:
+            name = f"{stem}_{n}"
+            n += 1
+        used.add(name)
+        dirs.append(os.path.join(output_dir, name))
+    return dirs
+
+
+def process_base(path, out_dir, cache_dir=None):
+    """
+    子进程：为单个 .base 生成全部文档，返回 (文件路径, 是否成功, 字节数, 耗时秒数, 错误信息)。
+    各阶段的打印输出写入 out_dir/生成日志.log。
+    """
+    start = time.perf_counter()
+    size = os.path.getsize(path)
+    os.makedirs(out_dir, exist_ok=True)
+    options = {'jobs': 1}
+    if cache_dir:
+        # 每个文件使用独立的缓存子目录，避免相互清理对方的片段
+        options['cache_dir'] = os.path.join(cache_dir, os.path.basename(out_dir))
+
+    error = None
+    with open(os.path.join(out_dir, LOG_NAME), 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        print(f"读取文件: {path}")
+        try:
+            doc = BaseDocument.load(path, cache_dir=options.get('cache_dir'))
+            if not run_all.run_stages(doc, out_dir, **options):
+                error = f"生成失败，详见 {LOG_NAME}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"❌ {error}")
+    return path, error is None, size, time.perf_counter() - start, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量生成飞书多维表格解析文档")
+    parser.add_argument("paths", nargs="+", help=".base 文件、目录或通配符")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help=f"输出根目录（默认 {OUTPUT_DIR}）")
+    parser.add_argument("--workers", type=int, default=0,
+                        help=f"并行进程数（0 = min(CPU 核数, {MAX_WORKERS})）")
+    parser.add_argument("--cache-dir", help="片段缓存与解码模型缓存的根目录，每个文件使用其中的独立子目录")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("飞书多维表格解析器 - 批量生成")
+    print("=" * 50)
+
+    files = find_base_files(args.paths)
+    if not files:
+        print("❌ 没有找到 .base 文件")
+        sys.exit(1)
+    out_dirs = assign_output_dirs(files, args.output_dir)
+    workers = args.workers if args.workers > 0 else min(os.cpu_count() or 1, MAX_WORKERS)
+    workers = min(workers, len(files))
+    print(f"\n发现 {len(files)} 个 .base 文件，使用 {workers} 个进程\n")
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_base, path, out_dir, args.cache_dir)
+                   for path, out_dir in zip(files, out_dirs)]
+        for done, future in enumerate(as_completed(futures), 1):
+            path, ok, size, seconds, error = future.result()
+            results.append((ok, size))
+            status = "✅" if ok else f"❌ {error}"
+            print(f"[{done}/{len(files)}] {os.path.basename(path)} "
+                  f"({size / 1024 / 1024:.1f} MB, {seconds:.2f}s) {status}")
+    elapsed = time.perf_counter() - start
+
+    succeeded = sum(1 for ok, _ in results if ok)
+    total_mb = sum(size for _, size in results) / 1024 / 1024
+    print("\n" + "=" * 50)
+    print(f"成功 {succeeded} 个，失败 {len(files) - succeeded} 个，输出目录: {args.output_dir}")
+    print(f"总耗时 {elapsed:.2f}s，共 {total_mb:.1f} MB")
+    if elapsed > 0:
+        print(f"吞吐量: {len(files) / elapsed:.2f} 个/秒，{total_mb / elapsed:.2f} MB/秒")
+    print("=" * 50)
+    if succeeded < len(files):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+完整性记录 (Completeness Sink)
+==============================
+功能：生成文档的同时，记录解析器输出的每个未解析 / 兜底引用（[已删除的字段:ID]、
+      [步骤N的结果]、未翻译的操作符等），附带所在文档、行号以及表 / 字段 / 工作流 / 步骤上下文，
+      供完整性校验直接生成报告，无需再扫描 Markdown。
+特性：
+- 名称解析函数调用 record() 登记，返回原样的兜底文本，调用处写法不变
+- 每张表 / 每个工作流在 capture() 中渲染，记录随片段一起返回（并行时由子进程带回，
+  增量生成时随片段缓存），写出片段时由 add() 换算成文档中的行号
+- 未开启 session() 时 add() 不做任何事，单独运行生成脚本的开销只有登记本身
+
+用法：
+    with completeness_sink.session() as sink:
+        ... 运行各生成脚本 ...
+    completeness_checker.run(doc, records=sink.records)
+"""
+
+import os
+from contextlib import contextmanager
+
+# 当前生效的 Sink；为 None 时 add() 不做任何事
+_active = None
+# 正在渲染的单元（表 / 工作流 / 公式翻译）的记录列表，内层在后
+_captures = []
+# 当前位置上下文：table / field / workflow / step
+_where = {}
+
+
+def record(issue_type, ref_id, text, anchor=None):
+    """
+    登记一个未解析 / 兜底引用，返回 text。
+    issue_type: 与 completeness_checker.ID_PATTERNS 中的类型名称一致（如 '已删除引用'）
+    anchor: 在片段中定位行号时查找的文本，默认即 text
+    """
+    if _captures:
+        entry = {'type': issue_type, 'id': ref_id, 'text': text}
+        if anchor is not None:
+            entry['anchor'] = anchor
+        entry.update(_where)
+        _captures[-1].append(entry)
+    return text
+
+
+def locate(**where):
+    """更新当前位置（如 field=字段名、step=步骤序号），之后的记录都带上它"""
+    _where.update(where)
+
+
+@contextmanager
+def capture(**where):
+    """
+    收集块内的全部记录：with capture(table=表名) as records: ...
+    指定 where 时以它作为新的位置上下文，块结束后恢复；不指定时沿用当前位置。
+    """
+    saved = dict(_where)
+    if where:
+        _where.clear()
+        _where.update(where)
+    records = []
+    _captures.append(records)
+    try:
+        yield records
+    finally:
+        _captures.pop()
+        _where.clear()
+        _where.update(saved)
+
+
+def replay(records):
+    """把缓存的记录按当前位置重新登记（用于带缓存的公式翻译）"""
+    for entry in records:
+        record(entry['type'], entry['id'], entry['text'], entry.get('anchor'))
+
+
+class LineCounter:
+    """包装文本输出，统计已写出的行数"""
+
+    def __init__(self, out, doc):
+        self._out = out
+        self.doc = doc
+        self.lines = 0
+
+    def write(self, text):
+        self.lines += text.count('\n')
+        return self._out.write(text)
+
+
+class Sink:
+    """一次生成过程中全部文档的记录；records 按写出顺序排列"""
+
+    def __init__(self):
+        self.records = []
+        self.writer = None
+
+    def add(self, records, fragment):
+        """
+        登记即将写出的片段中的记录：按 anchor 在片段内依次查找，换算为文档行号。
+        片段中找不到的记录（兜底文本最终没有写进文档）不计入。
+        """
+        writer = self.writer
+        cursor = {}
+        for entry in records:
+            anchor = entry.get('anchor', entry['text'])
+            pos = fragment.find(anchor, cursor.get(anchor, 0))
+            if pos == -1:
+                continue
+            cursor[anchor] = pos + len(anchor)
+            placed = {k: v for k, v in entry.items() if k != 'anchor'}
+            placed['doc'] = writer.doc if writer else None
+            placed['line'] = (writer.lines if writer else 0) + fragment.count('\n', 0, pos) + 1
+            self.records.append(placed)
+
+
+def tracking_writer(out, output_path):
+    """开启记录时返回统计行数的包装（并设为当前文档），否则原样返回 out"""
+    if _active is None:
+        return out
+    _active.writer = LineCounter(out, os.path.basename(output_path))
+    return _active.writer
+
+
+def add(records, fragment):
+    """登记即将写入当前文档的片段中的记录；未开启记录时不做任何事"""
+    if _active is not None and records:
+        _active.add(records, fragment)
+
+
+@contextmanager
+def session():
+    """开启记录：期间生成的文档中的未解析引用都收集到 Sink.records"""
+    global _active
+    sink = _active = Sink()
+    try:
+        yield sink
+    finally:
+        _active = None
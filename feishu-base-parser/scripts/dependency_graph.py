@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+依赖关系图 (Dependency Graph)
+=============================
+功能：把表、字段、自动化工作流构建为内存中的依赖图，回答「删除某个字段 / 表会影响什么」。
+特性：
+- 节点：表、字段、工作流；边：公式引用、查找引用、记录关联、选项同步、AI 提示词引用、
+  字段所属表，以及工作流的触发 / 读取 / 写入
+- 同时维护正向（依赖谁）和反向（被谁依赖）邻接索引，传递影响分析为一次广度优先遍历
+- 查询可用字段 ID、表 ID、工作流 ID、表名、「表名.字段名」
+- 可导出为 JSON（nodes + edges）
+- 重算扇出排行：每个字段被修改时，传递依赖它的公式 / 查找引用字段个数（含跨表）
+
+用法：
+    python3 scripts/dependency_graph.py [xxx.base] --impact "订单表.金额" [--depth N]
+    python3 scripts/dependency_graph.py [xxx.base] --depends-on fldXXXX
+    python3 scripts/dependency_graph.py [xxx.base] --fan-out [N]
+    python3 scripts/dependency_graph.py [xxx.base] --export 依赖关系图.json
+    python3 scripts/dependency_graph.py [xxx.base] --fan-out --compact-names  # 超大 .base 省内存
+"""
+
+import argparse
+import json
+import time
+from collections import deque
+
+from base_loader import BaseDocument
+from formula import analyze_formula
+from name_registry import WorkflowRefs, snapshot_tables
+from generate_自动化地图 import build_block_map
+
+# ========== 配置 ==========
+FILE_PATH = "【演示】成品布管理系统.base"
+
+# 边类型 → 中文说明（边 A → B 表示 A 依赖 B）
+EDGE_KINDS = {
+    'belongs': '所属表',
+    'formula': '公式引用',
+    'lookup': '查找引用',
+    'link': '记录关联',
+    'option_sync': '选项同步',
+    'ai': 'AI 提示词引用',
+    'trigger': '触发条件',
+    'reads': '读取',
+    'writes': '写入',
+}
+
+# 会写入记录的步骤类型：其 values[].fieldId 计为写入，其余字段引用计为读取
+WRITE_STEP_TYPES = {'AddRecordAction', 'AddRecord', 'SetRecordAction', 'UpdateRecordAction',
+                    'UpdateRecord', 'DeleteRecordAction'}
+FIELD_REF_KEYS = ('fieldId', 'watchedFieldId')
+# 字段修改后需要重新计算的依赖：公式和查找引用
+RECALC_EDGE_KINDS = ('formula', 'lookup')
+FAN_OUT_COUNT = 20  # --fan-out 默认列出的字段个数
+
+
+def table_node(table_id):
+    return f"table:{table_id}"
+
+
+def field_node(table_id, field_id):
+    return f"field:{table_id}:{field_id}"
+
+
+def workflow_node(wf_id):
+    return f"workflow:{wf_id}"
+
+
+def strongly_connected_components(nodes, adjacency):
+    """
+    强连通分量（Tarjan，迭代实现，不受递归深度限制）。
+    adjacency: {节点: 可迭代的后继节点}。返回分量列表，按逆拓扑序排列：
+    分量的后继分量总是排在它前面。
+    """
+    index_of, low, on_stack = {}, {}, set()
+    stack, result = [], []
+    for root in nodes:
+        if root in index_of:
+            continue
+        index_of[root] = low[root] = len(index_of)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(adjacency.get(root, ())))]
+        while work:
+            node, successors = work[-1]
+            for nxt in successors:
+                if nxt not in index_of:
+                    index_of[nxt] = low[nxt] = len(index_of)
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(adjacency.get(nxt, ()))))
+                    break
+                if nxt in on_stack:
+                    low[node] = min(low[node], index_of[nxt])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    result.append(component)
+    return result
+
+
+def _popcount(bits):
+    return bin(bits).count('1')
+
+
+class DependencyGraph:
+    """
+    依赖图。
+    - nodes: {节点ID: {'kind': 'table'|'field'|'workflow', 'name': 名称, 'table': 所属表ID（仅字段）}}
+    - depends_on: {节点ID: {被依赖节点ID: {边类型, ...}}}（正向邻接）
+    - dependents: {节点ID: {依赖它的节点ID: {边类型, ...}}}（反向邻接）
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.depends_on = {}
+        self.dependents = {}
+
+    # ---------- 构建 ----------
+
+    @classmethod
+    def from_document(cls, doc, compact=False):
+        """从已加载的 BaseDocument 构建依赖图；compact 为真时名称取自紧凑字段目录（见 BaseDocument.names）"""
+        graph = cls()
+        registry = doc.names(compact)
+        for tid, name in registry.table_map.items():
+            graph.add_node(table_node(tid), 'table', name)
+        for table in snapshot_tables(doc.snapshot):
+            graph._add_table(table, registry.table_map, registry.field_map)
+
+        workflows = doc.automation
+        if isinstance(workflows, list):
+            block_map = build_block_map(doc.snapshot or [])
+            for wf in workflows:
+                if isinstance(wf, dict):
+                    graph._add_workflow(wf, registry.table_map, registry.field_map, block_map)
+        return graph
+
+    def add_node(self, node_id, kind, name, table_id=None):
+        node = {'kind': kind, 'name': name}
+        if table_id is not None:
+            node['table'] = table_id
+        self.nodes[node_id] = node
+
+    def add_edge(self, source, target, kind):
+        """source 依赖 target；自环忽略"""
+        if source == target:
+            return
+        self.depends_on.setdefault(source, {}).setdefault(target, set()).add(kind)
+        self.dependents.setdefault(target, {}).setdefault(source, set()).add(kind)
+
+    def _field_target(self, table_id, field_id, field_map):
+        """字段引用 → 字段节点；表 ID 不匹配时按字段 ID 兜底，找不到返回 None"""
+        if not field_id:
+            return None
+        if (table_id, field_id) in field_map:
+            return field_node(table_id, field_id)
+        entry = field_map.by_id.get(field_id)
+        return field_node(entry[0], field_id) if entry else None
+
+    def _add_table(self, table, table_map, field_map):
+        table_id = table.get('meta', {}).get('id')
+        if not table_id:
+            return
+        self.add_node(table_node(table_id), 'table', table_map.get(table_id, table_id))
+
+        for field_id, field_def in table.get('fieldMap', {}).items():
+            source = field_node(table_id, field_id)
+            self.add_node(source, 'field', field_def.get('name') or field_id, table_id)
+            self.add_edge(source, table_node(table_id), 'belongs')
+
+            field_type = field_def.get('type')
+            prop = field_def.get('property') or {}
+
+            formula = prop.get('formula')
+            if formula and field_type in (19, 20):
+                self._add_formula_edges(source, table_id, formula, field_map,
+                                        'lookup' if field_type == 19 else 'formula')
+
+            if field_type == 19:
+                target_tid = (prop.get('filterInfo') or {}).get('targetTable')
+                self._add_target(source, target_tid, prop.get('targetField'), field_map, 'lookup')
+            elif field_type in (18, 21):
+                self._add_target(source, prop.get('tableId'), None, field_map, 'link')
+            elif field_type in (3, 4):
+                rule = prop.get('optionsRule') or {}
+                self._add_target(source, rule.get('targetTable'), rule.get('targetField'), field_map, 'option_sync')
+
+            ai = (field_def.get('ext') or {}).get('ai') or {}
+            for part in ai.get('prompt') or []:
+                if not isinstance(part, dict) or part.get('type') != 'variable':
+                    continue
+                value = part.get('value')
+                if isinstance(value, dict) and value.get('valueType') == 'field':
+                    target = self._field_target(table_id, (value.get('value') or {}).get('id'), field_map)
+                    if target:
+                        self.add_edge(source, target, 'ai')
+
+    def _add_target(self, source, target_tid, target_fid, field_map, kind):
+        if not target_tid:
+            return
+        self.add_edge(source, table_node(target_tid), kind)
+        target = self._field_target(target_tid, target_fid, field_map)
+        if target:
+            self.add_edge(source, target, kind)
+
+    def _add_formula_edges(self, source, table_id, formula, field_map, kind):
+        info = analyze_formula(formula)
+        for tid in info.table_refs:
+            self.add_edge(source, table_node(tid), kind)
+        # 字段所属表：优先当前表，其次公式中引用的表，最后按字段 ID 兜底
+        candidates = [table_id] + list(dict.fromkeys(info.table_refs))
+        for fid in info.field_refs:
+            owner = next((tid for tid in candidates if (tid, fid) in field_map), None)
+            target = field_node(owner, fid) if owner else self._field_target(None, fid, field_map)
+            if target:
+                self.add_edge(source, target, kind)
+
+    def _add_workflow(self, wf, table_map, field_map, block_map):
+        extra = wf.get('WorkflowExtra') or {}
+        draft = extra.get('Draft', '{}')
+        try:
+            draft = json.loads(draft) if isinstance(draft, str) else draft
+        except ValueError:
+            draft = {}
+        if not isinstance(draft, dict):
+            draft = {}
+
+        wf_id = wf.get('id', '未知')
+        source = workflow_node(wf_id)
+        title = draft.get('title') or block_map.get(str(wf_id)) or str(wf_id)
+        self.add_node(source, 'workflow', title)
+        refs = WorkflowRefs((extra.get('Extra') or {}).get('TableMap', {}), field_map)
+
+        for index, step in enumerate(draft.get('steps') or []):
+            if not isinstance(step, dict):
+                continue
+            step_type = step.get('type', '')
+            data = step.get('data') or {}
+            is_trigger = index == 0 or step_type.endswith('Trigger')
+            kind = 'trigger' if is_trigger else 'reads'
+
+            ref_tid = data.get('tableId') or data.get('watchedCustomTableId')
+            if ref_tid and isinstance(ref_tid, str):
+                ref_tid = ref_tid.strip('"')
+                real_tid = refs.table_id(ref_tid) or ref_tid
+                if real_tid in table_map:
+                    self.add_edge(source, table_node(real_tid),
+                                  'writes' if step_type in WRITE_STEP_TYPES else kind)
+
+            if step_type in WRITE_STEP_TYPES:
+                for value in data.get('values') or []:
+                    if isinstance(value, dict):
+                        self._add_workflow_field(source, refs, value.get('fieldId'), field_map, 'writes')
+                        self._walk_step(source, refs, value.get('value'), field_map, 'reads')
+                data = {k: v for k, v in data.items() if k != 'values'}
+            self._walk_step(source, refs, data, field_map, kind)
+            self._walk_step(source, refs, step.get('next'), field_map, 'reads')
+
+    def _add_workflow_field(self, source, refs, ref_fid, field_map, kind):
+        if not ref_fid or not isinstance(ref_fid, str):
+            return
+        real_tid, real_fid, name = refs.resolve(ref_fid.strip('"'))
+        if name:
+            self.add_edge(source, field_node(real_tid, real_fid), kind)
+
+    def _walk_step(self, source, refs, node, field_map, kind):
+        """递归收集步骤配置中的字段引用（fieldId / watchedFieldId / fieldIds）"""
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in FIELD_REF_KEYS:
+                    self._add_workflow_field(source, refs, value, field_map, kind)
+                elif key == 'fieldIds' and isinstance(value, list):
+                    for ref_fid in value:
+                        self._add_workflow_field(source, refs, ref_fid, field_map, kind)
+                else:
+                    self._walk_step(source, refs, value, field_map, kind)
+        elif isinstance(node, list):
+            for item in node:
+                self._walk_step(source, refs, item, field_map, kind)
+
+    # ---------- 查询 ----------
+
+    def label(self, node_id):
+        """节点的可读名称，如「订单表」.「金额」"""
+        node = self.nodes.get(node_id)
+        if node is None:
+            return node_id
+        if node['kind'] == 'field':
+            table_name = self.nodes.get(table_node(node['table']), {}).get('name', node['table'])
+            return f"「{table_name}」.「{node['name']}」"
+        if node['kind'] == 'workflow':
+            return f"工作流「{node['name']}」"
+        return f"「{node['name']}」"
+
+    def find(self, query):
+        """
+        按字段 ID、表 ID、工作流 ID、节点 ID、表名或「表名.字段名」查找节点，返回节点 ID 列表。
+        """
+        query = query.strip()
+        if query in self.nodes:
+            return [query]
+        matches = []
+        for node_id, node in self.nodes.items():
+            kind = node['kind']
+            if kind == 'field':
+                table_name = self.nodes.get(table_node(node['table']), {}).get('name')
+                if query in (node_id.rsplit(':', 1)[1], f"{table_name}.{node['name']}"):
+                    matches.append(node_id)
+            elif query in (node_id.split(':', 1)[1], node['name']):
+                matches.append(node_id)
+        return matches
+
+    def _traverse(self, start, adjacency, max_depth=None):
+        """
+        从 start 出发沿 adjacency 广度优先遍历（不含 start 本身）。
+        返回 [(节点ID, 深度, 上一跳节点ID, 边类型集合), ...]，按发现顺序排列。
+        """
+        seen = {start}
+        result = []
+        queue = deque([(start, 0)])
+        while queue:
+            node_id, depth = queue.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for neighbor, kinds in adjacency.get(node_id, {}).items():
+                if neighbor in seen:
+                    continue
+                seen.add(neighbor)
+                result.append((neighbor, depth + 1, node_id, kinds))
+                queue.append((neighbor, depth + 1))
+        return result
+
+    def impact(self, node_id, max_depth=None):
+        """删除 node_id 会传递影响到的全部节点（反向依赖闭包）"""
+        return self._traverse(node_id, self.dependents, max_depth)
+
+    def upstream(self, node_id, max_depth=None):
+        """node_id 直接或间接依赖的全部节点（正向依赖闭包）"""
+        return self._traverse(node_id, self.depends_on, max_depth)
+
+    def recalc_fanout(self):
+        """
+        重算扇出：修改每个字段后，直接或间接依赖它、需要重新计算的公式 / 查找引用字段。
+        只沿字段之间的公式、查找引用边传播；依赖成环的字段互相计入。
+        返回 [{'field', 'direct', 'total', 'cross_table', 'tables'}, ...]，按传递依赖数降序：
+        直接依赖数、传递依赖数、其中位于其他表的个数、涉及的表数。
+        具体是哪些字段可用 impact() 查询。
+        """
+        # 字段 → 依赖它的计算字段（反向边）
+        adjacency = {}
+        for target, sources in self.dependents.items():
+            if not target.startswith('field:'):
+                continue
+            recalc = [source for source, kinds in sources.items()
+                      if source.startswith('field:') and not kinds.isdisjoint(RECALC_EDGE_KINDS)]
+            if recalc:
+                adjacency[target] = recalc
+        if not adjacency:
+            return []
+
+        # 在分量收缩后的图上按逆拓扑序合并可达集合，每个计算字段占一个二进制位
+        fields = set(adjacency)
+        for recalc in adjacency.values():
+            fields.update(recalc)
+        components = strongly_connected_components(sorted(fields), adjacency)
+        computed = sorted({source for recalc in adjacency.values() for source in recalc})
+        bit_of = {node_id: 1 << i for i, node_id in enumerate(computed)}
+        owner = {node_id: i for i, component in enumerate(components) for node_id in component}
+        reach = [0] * len(components)
+        for i, component in enumerate(components):
+            bits = 0
+            cyclic = len(component) > 1
+            for node_id in component:
+                for source in adjacency.get(node_id, ()):
+                    j = owner[source]
+                    if j == i:
+                        cyclic = True
+                    else:
+                        bits |= bit_of[source] | reach[j]
+            if cyclic:
+                for node_id in component:
+                    bits |= bit_of.get(node_id, 0)
+            reach[i] = bits
+
+        # 各表计算字段的位掩码，用于统计跨表依赖
+        table_masks = {}
+        for node_id, bit in bit_of.items():
+            table_id = self.nodes.get(node_id, {}).get('table')
+            table_masks[table_id] = table_masks.get(table_id, 0) | bit
+
+        result = []
+        for node_id in adjacency:
+            bits = reach[owner[node_id]] & ~bit_of.get(node_id, 0)
+            own_table = self.nodes.get(node_id, {}).get('table')
+            result.append({
+                'field': node_id,
+                'direct': len(adjacency[node_id]),
+                'total': _popcount(bits),
+                'cross_table': _popcount(bits & ~table_masks.get(own_table, 0)),
+                'tables': sum(1 for mask in table_masks.values() if bits & mask),
+            })
+        result.sort(key=lambda r: (-r['total'], -r['direct'], r['field']))
+        return result
+
+    # ---------- 导出 ----------
+
+    def edge_count(self):
+        return sum(len(kinds) for targets in self.depends_on.values() for kinds in targets.values())
+
+    def to_json(self):
+        """导出为可 JSON 序列化的 dict：nodes + edges（source 依赖 target）"""
+        nodes = [dict(id=node_id, **node) for node_id, node in self.nodes.items()]
+        edges = [{'source': source, 'target': target, 'kind': kind}
+                 for source, targets in self.depends_on.items()
+                 for target, kinds in targets.items()
+                 for kind in sorted(kinds)]
+        return {'nodes': nodes, 'edges': edges}
+
+
+def print_traversal(graph, title, start, result):
+    """按深度缩进打印遍历结果"""
+    print(f"\n{title}: {graph.label(start)}（共 {len(result)} 个）")
+    for node_id, depth, via, kinds in result:
+        kind_names = "、".join(EDGE_KINDS.get(k, k) for k in sorted(kinds))
+        print(f"{'  ' * depth}- {graph.label(node_id)}  [{kind_names}，经 {graph.label(via)}]")
+
+
+def print_fanout(graph, rows, limit=FAN_OUT_COUNT):
+    """打印重算扇出排行"""
+    print(f"\n重算扇出排行（修改后需要重新计算的公式 / 查找引用字段，共 {len(rows)} 个源字段，列出前 {limit} 个）")
+    print(f"{'排名':>4}  {'传递':>6}  {'直接':>6}  {'跨表':>6}  {'涉及表':>6}  字段")
+    for rank, row in enumerate(rows[:limit], 1):
+        print(f"{rank:>4}  {row['total']:>6}  {row['direct']:>6}  {row['cross_table']:>6}  {row['tables']:>6}  "
+              f"{graph.label(row['field'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字段 / 表 / 自动化依赖关系图")
+    parser.add_argument("file", nargs="?", default=FILE_PATH, help=".base 文件路径")
+    parser.add_argument("--impact", metavar="节点", help="删除该字段 / 表会影响哪些字段和工作流")
+    parser.add_argument("--depends-on", metavar="节点", help="该字段 / 工作流直接或间接依赖哪些字段和表")
+    parser.add_argument("--depth", type=int, help="最大遍历深度（默认不限）")
+    parser.add_argument("--export", metavar="JSON路径", help="导出整张依赖图为 JSON")
+    parser.add_argument("--fan-out", type=int, nargs="?", const=FAN_OUT_COUNT, metavar="N",
+                        help=f"列出修改后引发重新计算最多的 N 个字段（默认 {FAN_OUT_COUNT}）")
+    parser.add_argument("--compact-names", action="store_true", help="用紧凑字段目录 (FieldCatalog) 保存名称：常驻内存更小，构建和查找稍慢，适合超大 .base")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("依赖关系图")
+    print("=" * 50)
+
+    print(f"\n[1/2] 读取文件: {args.file}")
+    try:
+        doc = BaseDocument.load(args.file)
+    except Exception as e:
+        print(f"❌ 文件读取失败: {e}")
+        return
+
+    print("[2/2] 构建依赖图...")
+    start = time.perf_counter()
+    graph = DependencyGraph.from_document(doc, compact=args.compact_names)
+    print(f"    - 节点 {len(graph.nodes)} 个，边 {graph.edge_count()} 条，"
+          f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    if args.export:
+        with open(args.export, 'w', encoding='utf-8') as f:
+            json.dump(graph.to_json(), f, ensure_ascii=False, indent=1)
+        print(f"\n✅ 已导出: {args.export}")
+
+    if args.fan_out:
+        start = time.perf_counter()
+        rows = graph.recalc_fanout()
+        elapsed = (time.perf_counter() - start) * 1000
+        print_fanout(graph, rows, args.fan_out)
+        print(f"    计算耗时 {elapsed:.0f}ms")
+
+    for query, title, method in ((args.impact, "影响范围", graph.impact),
+                                 (args.depends_on, "依赖项", graph.upstream)):
+        if not query:
+            continue
+        matches = graph.find(query)
+        if not matches:
+            print(f"\n❌ 未找到: {query}")
+            continue
+        for node_id in matches:
+            start = time.perf_counter()
+            result = method(node_id, args.depth)
+            elapsed = (time.perf_counter() - start) * 1000
+            print_traversal(graph, title, node_id, result)
+            print(f"    查询耗时 {elapsed:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结构化导出 (NDJSON Export)
+==========================
+功能：把解析后的表、字段（含翻译后的公式）、选项和工作流导出为 NDJSON，
+      每行一条 JSON 记录，供搜索索引、差异比对等下游工具直接加载。
+特性：
+- 边解析边写出，不在内存中组装完整模型；下游也可以逐行流式读取
+- 每条记录带 "record" 字段区分类型：base / table / field / option / workflow
+- 同时保留原始 ID 和解析后的名称；无法解析的名称为 null
+- 字段配置说明、公式翻译、工作流步骤描述与 Markdown 文档使用同一套解析逻辑
+
+用法：
+    python3 scripts/export_ndjson.py [xxx.base] [-o 解析模型.ndjson]   # -o - 输出到标准输出
+
+输出：解析模型.ndjson
+"""
+
+import argparse
+import json
+import sys
+
+from base_loader import BaseDocument
+from generate_全量字段表 import extract_field_config, get_field_type_name, translate_formula
+from generate_自动化地图 import (ACTION_TYPES, TRIGGER_TYPES, build_block_map, iter_step_lines,
+                              load_draft, resolve_table_id, workflow_title)
+from name_registry import WorkflowRefs
+
+# ========== 配置 ==========
+FILE_PATH = "【演示】成品布管理系统.base"
+OUTPUT_PATH = "解析模型.ndjson"
+
+
+def _target(table_id, field_id, table_map, field_map):
+    """关联目标（表 + 可选字段），名称无法解析时为 None"""
+    target = {'table_id': table_id, 'table_name': table_map.get(table_id)}
+    if field_id:
+        target['field_id'] = field_id
+        target['field_name'] = field_map.lookup(table_id, field_id)
+    return target
+
+
+def field_record(table_id, field_id, field_def, table_map, field_map):
+    """单个字段的导出记录"""
+    field_type = field_def.get('type')
+    prop = field_def.get('property') or {}
+    config, is_ai, ai_desc = extract_field_config(field_def, table_id, table_map, field_map)
+
+    record = {
+        'record': 'field',
+        'table_id': table_id,
+        'table_name': table_map.get(table_id, table_id),
+        'id': field_id,
+        'name': field_def.get('name', field_id),
+        'type': field_type,
+        'type_name': get_field_type_name(field_type),
+        'description': (field_def.get('description') or {}).get('text', ''),
+        'is_ai': is_ai,
+        'ai_prompt': ai_desc or None,
+        'config': config,
+    }
+
+    formula = prop.get('formula')
+    if formula and field_type in (19, 20):
+        record['formula'] = formula
+        record['formula_translated'] = translate_formula(formula, table_id, table_map, field_map)
+
+    if field_type == 19 and (prop.get('filterInfo') or {}).get('targetTable'):
+        record['lookup'] = _target(prop['filterInfo']['targetTable'], prop.get('targetField'), table_map, field_map)
+    elif field_type in (18, 21) and prop.get('tableId'):
+        record['link'] = _target(prop['tableId'], None, table_map, field_map)
+    elif field_type in (3, 4) and (prop.get('optionsRule') or {}).get('targetTable'):
+        rule = prop['optionsRule']
+        record['option_sync'] = _target(rule['targetTable'], rule.get('targetField'), table_map, field_map)
+    return record
+
+
+def iter_table_records(table, table_map, field_map):
+    """单张表的记录：table，随后每个字段的 field 及其 option"""
+    table_id = table.get('meta', {}).get('id')
+    field_map_data = table.get('fieldMap', {})
+    yield {
+        'record': 'table',
+        'id': table_id,
+        'name': table_map.get(table_id, table_id),
+        'field_count': len(field_map_data),
+    }
+    for field_id, field_def in field_map_data.items():
+        yield field_record(table_id, field_id, field_def, table_map, field_map)
+        for opt in (field_def.get('property') or {}).get('options') or []:
+            yield {
+                'record': 'option',
+                'table_id': table_id,
+                'field_id': field_id,
+                'id': opt.get('id'),
+                'name': opt.get('name'),
+                'color': opt.get('color'),
+            }
+
+
+def workflow_record(wf_item, table_map, field_map, option_map, block_map):
+    """单个工作流的导出记录；步骤描述与自动化地图中的文字一致"""
+    draft = load_draft(wf_item)
+    if not isinstance(draft, dict):
+        draft = {}
+    extra = wf_item.get('WorkflowExtra', {})
+    wf_table_map = WorkflowRefs(extra.get('Extra', {}).get('TableMap', {}), field_map)
+    wf_id = wf_item.get('id', '未知')
+    status = wf_item.get('status', 0)
+
+    steps = []
+    for step, lines in iter_step_lines(draft.get('steps', []), wf_table_map, table_map, field_map, option_map):
+        step_type = step.get('type')
+        data = step.get('data') or {}
+        ref_tid = data.get('tableId') or data.get('watchedCustomTableId')
+        real_tid = wf_table_map.table_id(ref_tid.strip('"')) if isinstance(ref_tid, str) else None
+        steps.append({
+            'id': step.get('id'),
+            'type': step_type,
+            'type_name': TRIGGER_TYPES.get(step_type) or ACTION_TYPES.get(step_type, step_type),
+            'title': step.get('stepTitle'),
+            'table_id': real_tid or ref_tid,
+            'table_name': resolve_table_id(ref_tid, wf_table_map, table_map) if ref_tid else None,
+            'description': [line.rstrip() for line in lines if line.strip()],
+        })
+
+    return {
+        'record': 'workflow',
+        'id': wf_id,
+        'title': workflow_title(wf_id, draft, wf_table_map, table_map, block_map),
+        'status': status,
+        # 飞书中 status=1 表示启用
+        'enabled': status == 1,
+        'steps': steps,
+    }
+
+
+def iter_records(doc):
+    """按顺序产出整个 .base 的全部记录（生成器，逐条解析）"""
+    registry = doc.registry
+    table_map, field_map, option_map = registry.table_map, registry.field_map, registry.option_map
+    workflows = doc.automation
+    if not isinstance(workflows, list):
+        workflows = []
+
+    yield {
+        'record': 'base',
+        'file': doc.path,
+        'sign': doc.get('sign'),
+        'tables': len(registry.all_tables),
+        'fields': len(field_map),
+        'workflows': len(workflows),
+    }
+
+    # 按表名排序，与全量字段表一致
+    for table in sorted(registry.all_tables, key=lambda t: table_map.get(t.get('meta', {}).get('id'), '')):
+        yield from iter_table_records(table, table_map, field_map)
+
+    block_map = build_block_map(doc.snapshot or [])
+    for wf in workflows:
+        if isinstance(wf, dict):
+            yield workflow_record(wf, table_map, field_map, option_map, block_map)
+
+
+def write_ndjson(out, records):
+    """逐条写出 NDJSON，返回按类型统计的记录数"""
+    counts = {}
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+        counts[record['record']] = counts.get(record['record'], 0) + 1
+    return counts
+
+
+def run(doc, output_path=OUTPUT_PATH):
+    """基于已加载的 BaseDocument 导出 NDJSON，成功返回 True；output_path 为 "-" 时写到标准输出"""
+    if not doc.snapshot:
+        print("❌ 快照解压失败", file=sys.stderr)
+        return False
+
+    if output_path == "-":
+        counts = write_ndjson(sys.stdout, iter_records(doc))
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            counts = write_ndjson(f, iter_records(doc))
+
+    summary = "，".join(f"{kind} {n} 条" for kind, n in counts.items())
+    print(f"\n✅ 已导出 {summary}: {output_path}", file=sys.stderr)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出解析结果为 NDJSON")
+    parser.add_argument("file", nargs="?", default=FILE_PATH, help=".base 文件路径")
+    parser.add_argument("-o", "--output", default=OUTPUT_PATH, help=f"输出路径（默认 {OUTPUT_PATH}，- 为标准输出）")
+    args = parser.parse_args()
+
+    # 进度信息写到 stderr，保证 -o - 时标准输出只有 NDJSON
+    print(f"读取文件: {args.file}", file=sys.stderr)
+    try:
+        doc = BaseDocument.load(args.file)
+    except Exception as e:
+        print(f"❌ 文件读取失败: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if not run(doc, args.output):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑字段目录 (Compact Field Catalog)
+====================================
+功能：按列存储表、字段、选项的 ID / 名称 / 类型，替代 NameRegistry 中
+      以元组为键的 dict，用于数百张表、数万字段的超大 .base。
+特性：
+- 所有字符串驻留在一张字符串表中，表 / 字段 / 选项各列只保存整数下标（array('i')）
+- 常驻的字符串索引只包含 ID；名称只在构建期去重，构建完成后丢弃名称索引
+- 按字段 ID、表 ID、选项 ID 查找通过与字符串表等长的整数数组完成，无需逐字段建 dict
+- 只有跨表重复的字段 ID 才额外记录在一个小 dict 中
+- table_map / field_map / option_map 为只读映射视图，接口与 NameRegistry 一致
+  （field_map 同样支持 find / lookup / by_id）
+
+注意：目录只保存名称和类型；渲染字段配置仍需要 all_tables 中的原始表结构，因此文档生成器
+继续使用 NameRegistry。只查名称的 query_server、dependency_graph、trigger_cascade 可用
+--compact-names 改用目录（BaseDocument.names(compact=True)，以 keep_tables=False 构建）：
+常驻内存更小，但构建和查找都比 NameRegistry 慢（见 benchmarks/bench_catalog_memory.py）。
+"""
+
+from array import array
+from collections.abc import Mapping
+
+
+class FieldCatalog:
+    """
+    列式字段目录。
+    - 表：_table_ids / _table_names（字符串下标）
+    - 字段：_field_tables（表行号）/ _field_ids / _field_names / _field_types
+    - 选项：_option_ids / _option_names / _option_fields（字段行号）
+    """
+
+    __slots__ = ('_strings', '_string_index', '_name_index',
+                 '_table_ids', '_table_names', '_table_by_string',
+                 '_field_tables', '_field_ids', '_field_names', '_field_types', '_field_by_string', '_field_dupes',
+                 '_option_ids', '_option_names', '_option_fields', '_option_by_string',
+                 'all_tables', 'table_map', 'field_map', 'option_map')
+
+    def __init__(self):
+        self._strings = []
+        self._string_index = {}  # ID -> 字符串下标
+        self._name_index = {}  # 名称 -> 字符串下标，仅构建期使用
+        self._table_ids = array('i')
+        self._table_names = array('i')
+        self._field_tables = array('i')
+        self._field_ids = array('i')
+        self._field_names = array('i')
+        self._field_types = array('i')
+        self._field_dupes = {}  # (表行号, 字段ID下标) -> 字段行号，仅用于跨表重复的字段 ID
+        self._option_ids = array('i')
+        self._option_names = array('i')
+        self._option_fields = array('i')
+        # 与字符串表等长：字符串下标 -> 行号 + 1（0 表示没有）
+        self._table_by_string = array('i')
+        self._field_by_string = array('i')
+        self._option_by_string = array('i')
+        self.all_tables = []
+        self.table_map = TableMapView(self)
+        self.field_map = FieldMapView(self)
+        self.option_map = OptionMapView(self)
+
+    # ---------- 构建 ----------
+
+    @classmethod
+    def from_snapshot(cls, snapshot, keep_tables=True):
+        """
+        从快照构建目录，规则与 NameRegistry.from_snapshot 相同。
+        keep_tables=False 时不保留原始表结构（all_tables 为空），只用于查名称的场景。
+        """
+        catalog = cls()
+        for item in snapshot or []:
+            if 'schema' in item:
+                catalog._add_schema(item['schema'], keep_tables)
+        catalog._name_index = None
+        return catalog
+
+    def _append_string(self, text):
+        self._strings.append(text)
+        self._table_by_string.append(0)
+        self._field_by_string.append(0)
+        self._option_by_string.append(0)
+        return len(self._strings) - 1
+
+    def intern(self, text):
+        """ID → 字符串下标（首次出现时加入字符串表）"""
+        index = self._string_index.get(text)
+        if index is None:
+            index = self._string_index[text] = self._append_string(text)
+        return index
+
+    def _intern_name(self, text):
+        """名称 → 字符串下标；相同名称只存一份"""
+        index = self._name_index.get(text)
+        if index is None:
+            index = self._name_index[text] = self._append_string(text)
+        return index
+
+    def _set_table(self, table_id, name):
+        tid = self.intern(table_id)
+        row = self._table_by_string[tid] - 1
+        if row < 0:
+            self._table_ids.append(tid)
+            self._table_names.append(self._intern_name(name))
+            self._table_by_string[tid] = len(self._table_ids)
+        else:
+            self._table_names[row] = self._intern_name(name)
+
+    def _add_schema(self, schema, keep_tables):
+        # 首先从 tableMap 获取表名（这里通常有完整的表名）
+        for tid, tinfo in schema.get('tableMap', {}).items():
+            if isinstance(tinfo, dict) and tinfo.get('name'):
+                self._set_table(tid, tinfo['name'])
+
+        if 'data' not in schema:
+            return
+        data = schema['data']
+        tables = list(data.get('tables', []))
+        if 'table' in data:
+            tables.append(data['table'])
+        for table in tables:
+            if isinstance(table, dict):
+                self._add_table(table, keep_tables)
+
+    def _add_table(self, table, keep_tables):
+        if keep_tables:
+            self.all_tables.append(table)
+        table_id = table.get('meta', {}).get('id')
+        if not table_id:
+            return
+        # 只有当 tableMap 中没有这个表时才使用 meta.name
+        if self.table_row(table_id) < 0:
+            self._set_table(table_id, table.get('meta', {}).get('name') or table_id)
+        table_row = self.table_row(table_id)
+
+        for field_id, field_def in table.get('fieldMap', {}).items():
+            field_row = self._set_field(table_row, field_id, field_def.get('name') or field_id,
+                                        field_def.get('type'))
+            for opt in (field_def.get('property') or {}).get('options') or []:
+                opt_id = opt.get('id')
+                if opt_id:
+                    self._add_option(opt_id, opt.get('name'), field_row)
+
+    def _set_field(self, table_row, field_id, name, field_type):
+        fid = self.intern(field_id)
+        row = self._field_row(table_row, fid)
+        name_index = self._intern_name(name)
+        type_value = field_type if isinstance(field_type, int) else -1
+        if row >= 0:
+            self._field_names[row] = name_index
+            self._field_types[row] = type_value
+            return row
+
+        row = len(self._field_ids)
+        self._field_tables.append(table_row)
+        self._field_ids.append(fid)
+        self._field_names.append(name_index)
+        self._field_types.append(type_value)
+        if self._field_by_string[fid] == 0:
+            self._field_by_string[fid] = row + 1
+        else:
+            self._field_dupes[(table_row, fid)] = row
+        return row
+
+    def _add_option(self, option_id, name, field_row):
+        oid = self.intern(option_id)
+        self._option_ids.append(oid)
+        # 选项名可能为 None（与 NameRegistry 一致，原样保留）
+        self._option_names.append(-1 if name is None else self._intern_name(name))
+        self._option_fields.append(field_row)
+        # 选项 ID 重复时后出现的覆盖前面的（与 dict 赋值一致）
+        self._option_by_string[oid] = len(self._option_ids)
+
+    # ---------- 查询 ----------
+
+    def _string(self, index):
+        return None if index < 0 else self._strings[index]
+
+    def table_row(self, table_id):
+        """表 ID → 表行号；不存在返回 -1"""
+        index = self._string_index.get(table_id)
+        return -1 if index is None else self._table_by_string[index] - 1
+
+    def _field_row(self, table_row, fid):
+        first = self._field_by_string[fid] - 1
+        if first < 0 or self._field_tables[first] == table_row:
+            return first
+        return self._field_dupes.get((table_row, fid), -1)
+
+    def field_row(self, table_id, field_id):
+        """(表ID, 字段ID) → 字段行号；不存在返回 -1"""
+        table_row = self.table_row(table_id)
+        fid = self._string_index.get(field_id)
+        if table_row < 0 or fid is None:
+            return -1
+        return self._field_row(table_row, fid)
+
+    def first_field_row(self, field_id):
+        """忽略表 ID，字段 ID 最先注册的字段行号；不存在返回 -1"""
+        fid = self._string_index.get(field_id)
+        return -1 if fid is None else self._field_by_string[fid] - 1
+
+    def table_name(self, table_id):
+        row = self.table_row(table_id)
+        return None if row < 0 else self._strings[self._table_names[row]]
+
+    def field_name(self, table_id, field_id):
+        """精确匹配 (表ID, 字段ID) 的字段名；找不到返回 None"""
+        row = self.field_row(table_id, field_id)
+        return None if row < 0 else self._strings[self._field_names[row]]
+
+    def field_type(self, table_id, field_id):
+        """字段类型编号；找不到或未知返回 None"""
+        row = self.field_row(table_id, field_id)
+        if row < 0 or self._field_types[row] < 0:
+            return None
+        return self._field_types[row]
+
+    def fields_of(self, table_id):
+        """按注册顺序产出某张表的 (字段ID, 字段名, 类型编号)"""
+        table_row = self.table_row(table_id)
+        for row, owner in enumerate(self._field_tables):
+            if owner == table_row:
+                field_type = self._field_types[row]
+                yield (self._strings[self._field_ids[row]], self._strings[self._field_names[row]],
+                       None if field_type < 0 else field_type)
+
+    def option_name(self, option_id):
+        index = self._string_index.get(option_id)
+        row = -1 if index is None else self._option_by_string[index] - 1
+        return None if row < 0 else self._string(self._option_names[row])
+
+    def stats(self):
+        """各列的行数"""
+        return {'strings': len(self._strings), 'tables': len(self._table_ids),
+                'fields': len(self._field_ids), 'options': len(self._option_ids)}
+
+
+class TableMapView(Mapping):
+    """{table_id: table_name} 只读视图"""
+
+    __slots__ = ('_catalog',)
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __getitem__(self, table_id):
+        name = self._catalog.table_name(table_id) if isinstance(table_id, str) else None
+        if name is None:
+            raise KeyError(table_id)
+        return name
+
+    def __iter__(self):
+        strings = self._catalog._strings
+        return (strings[tid] for tid in self._catalog._table_ids)
+
+    def __len__(self):
+        return len(self._catalog._table_ids)
+
+
+class FieldMapView(Mapping):
+    """
+    {(table_id, field_id): field_name} 只读视图，接口与 name_registry.FieldMap 一致。
+    """
+
+    __slots__ = ('_catalog', 'by_id')
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+        self.by_id = FieldIdView(catalog)
+
+    def __getitem__(self, key):
+        try:
+            table_id, field_id = key
+        except (TypeError, ValueError):
+            raise KeyError(key)
+        name = self._catalog.field_name(table_id, field_id) if isinstance(field_id, str) else None
+        if name is None:
+            raise KeyError(key)
+        return name
+
+    def __iter__(self):
+        c = self._catalog
+        strings = c._strings
+        for table_row, fid in zip(c._field_tables, c._field_ids):
+            yield (strings[c._table_ids[table_row]], strings[fid])
+
+    def __len__(self):
+        return len(self._catalog._field_ids)
+
+    def find(self, field_id):
+        """忽略表 ID，仅按字段 ID 查找字段名；找不到返回 None"""
+        entry = self.by_id.get(field_id)
+        return entry[1] if entry else None
+
+    def lookup(self, table_id, field_id):
+        """先精确匹配 (table_id, field_id)，再按字段 ID 兜底；找不到返回 None"""
+        return self.get((table_id, field_id)) or self.find(field_id)
+
+
+class FieldIdView(Mapping):
+    """{field_id: (table_id, field_name)} 只读视图（同一字段 ID 保留最先注册的表）"""
+
+    __slots__ = ('_catalog',)
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __getitem__(self, field_id):
+        c = self._catalog
+        row = c.first_field_row(field_id) if isinstance(field_id, str) else -1
+        if row < 0:
+            raise KeyError(field_id)
+        return (c._strings[c._table_ids[c._field_tables[row]]], c._strings[c._field_names[row]])
+
+    def __iter__(self):
+        c = self._catalog
+        return (c._strings[fid] for row, fid in enumerate(c._field_ids) if c._field_by_string[fid] == row + 1)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class OptionMapView(Mapping):
+    """{option_id: option_name} 只读视图"""
+
+    __slots__ = ('_catalog',)
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __getitem__(self, option_id):
+        c = self._catalog
+        index = c._string_index.get(option_id) if isinstance(option_id, str) else None
+        row = -1 if index is None else c._option_by_string[index] - 1
+        if row < 0:
+            raise KeyError(option_id)
+        return c._string(c._option_names[row])
+
+    def __iter__(self):
+        # 按首次出现的顺序（与 dict 一致）
+        c = self._catalog
+        seen = set()
+        for oid in c._option_ids:
+            if oid not in seen:
+                seen.add(oid)
+                yield c._strings[oid]
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+公式翻译器 (Formula Translator)
+==============================
+功能：解析 Bitable 公式，并将其中的表/字段 ID 翻译为「表名」/「字段名」。
+特性：
+- 正则预编译，单次扫描同时处理 bitable::$table[...]、$field[...]、$column[...]
+- 按 (公式, 当前表ID) 做 LRU 缓存，复制出来的相同公式只翻译一次
+- 分词 + 递归下降解析生成语法树，一次遍历提取跨表引用、函数调用和 FILTER 条件，
+  正确处理括号嵌套；遇到无法识别的语法时容错继续，不会抛异常
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+import completeness_sink
+
+# 单次扫描的记号：表引用 / 字段引用 / 残留的 bitable:: 前缀（按顺序尝试）
+TOKEN_RE = re.compile(r'bitable::\$table\[(?P<table>.*?)\]|\$(?:field|column)\[(?P<field>.*?)\]|bitable::')
+
+# 翻译结果缓存条数
+CACHE_SIZE = 8192
+
+
+# ========== 分词 ==========
+TOKEN_SPEC = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<ref>(?:bitable::)?\$(?P<ref_kind>table|field|column)\[(?P<ref_id>[^\]]*)\])
+  | (?P<prefix>bitable::)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<name>[^\W\d]\w*)
+  | (?P<op>&&|\|\||!=|<>|>=|<=|==|[=<>+\-*/&!%^(),.\[\]{}:;])
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+Token = namedtuple('Token', ['kind', 'value', 'start', 'end'])
+
+
+def tokenize(formula):
+    """
+    将公式切分为记号列表（忽略空白和多余的 bitable:: 前缀）。
+    kind: table / field / string / number / name / op / other
+    """
+    tokens = []
+    for m in TOKEN_SPEC.finditer(formula):
+        kind = m.lastgroup
+        if kind in ('ws', 'prefix'):
+            continue
+        if m.group('ref') is not None:
+            ref_kind = 'table' if m.group('ref_kind') == 'table' else 'field'
+            tokens.append(Token(ref_kind, m.group('ref_id'), m.start(), m.end()))
+        else:
+            tokens.append(Token(kind, m.group(), m.start(), m.end()))
+    return tokens
+
+
+# ========== 语法树 ==========
+class Node:
+    """
+    语法树节点。
+    kind: table / field / string / number / name / list / group / unary / binary /
+          call（函数调用，value=函数名）/ method（链式调用 x.FUNC(...)，children[0] 为调用对象）/
+          member（x.$column[...]）/ attr（x.name）/ index（x[...]）/ seq / error
+    start, end: 在原公式中的位置，formula[start:end] 即该节点的源码
+    """
+    __slots__ = ('kind', 'value', 'children', 'start', 'end')
+
+    def __init__(self, kind, value=None, children=(), start=0, end=0):
+        self.kind = kind
+        self.value = value
+        self.children = list(children)
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"Node({self.kind!r}, {self.value!r}, {self.children!r})"
+
+    def walk(self):
+        """按源码顺序（前序）遍历所有节点"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+
+# 二元运算符优先级（数值越大结合越紧）
+BINARY_PRECEDENCE = {
+    '||': 1,
+    '&&': 2,
+    '=': 3, '==': 3, '!=': 3, '<>': 3, '>': 3, '<': 3, '>=': 3, '<=': 3,
+    '&': 4,
+    '+': 5, '-': 5,
+    '*': 6, '/': 6, '%': 6,
+    '^': 7,
+}
+
+# 遇到这些记号时结束当前表达式，交给上层处理
+CLOSING = {')', ',', ']', '}'}
+
+
+class _Parser:
+    """容错的递归下降（优先级爬升）解析器"""
+
+    def __init__(self, formula):
+        self.formula = formula
+        self.tokens = tokenize(formula)
+        self.i = 0
+
+    def peek(self, offset=0):
+        j = self.i + offset
+        return self.tokens[j] if j < len(self.tokens) else None
+
+    def peek_op(self, value, offset=0):
+        tok = self.peek(offset)
+        return tok is not None and tok.kind == 'op' and tok.value == value
+
+    def advance(self):
+        tok = self.tokens[self.i]
+        self.i += 1
+        return tok
+
+    def parse(self):
+        items = []
+        while self.i < len(self.tokens):
+            before = self.i
+            items.append(self.expression(0))
+            if self.i == before:
+                # 多余的右括号/逗号等，跳过
+                self.advance()
+        if len(items) == 1:
+            return items[0]
+        return Node('seq', children=items, start=0, end=len(self.formula))
+
+    def expression(self, min_prec):
+        left = self.unary()
+        while True:
+            tok = self.peek()
+            if tok is None or tok.kind != 'op':
+                break
+            prec = BINARY_PRECEDENCE.get(tok.value)
+            if prec is None or prec < min_prec:
+                break
+            self.advance()
+            right = self.expression(prec + 1)
+            left = Node('binary', tok.value, [left, right], left.start, max(right.end, tok.end))
+        return left
+
+    def unary(self):
+        tok = self.peek()
+        if tok is not None and tok.kind == 'op' and tok.value in ('-', '+', '!'):
+            self.advance()
+            operand = self.unary()
+            return Node('unary', tok.value, [operand], tok.start, max(operand.end, tok.end))
+        return self.postfix(self.primary())
+
+    def primary(self):
+        tok = self.peek()
+        if tok is None:
+            end = len(self.formula)
+            return Node('error', None, (), end, end)
+        if tok.kind == 'op' and tok.value in CLOSING:
+            return Node('error', None, (), tok.start, tok.start)
+
+        self.advance()
+        if tok.kind in ('table', 'field', 'string', 'number'):
+            return Node(tok.kind, tok.value, (), tok.start, tok.end)
+        if tok.kind == 'name':
+            if self.peek_op('('):
+                args, end = self.arguments(')')
+                return Node('call', tok.value, args, tok.start, end)
+            return Node('name', tok.value, (), tok.start, tok.end)
+        if tok.kind == 'op' and tok.value == '(':
+            inner = self.expression(0)
+            end = inner.end
+            if self.peek_op(')'):
+                end = self.advance().end
+            return Node('group', None, [inner], tok.start, end)
+        if tok.kind == 'op' and tok.value == '{':
+            self.i -= 1
+            items, end = self.arguments('}')
+            return Node('list', None, items, tok.start, end)
+        return Node('error', tok.value, (), tok.start, tok.end)
+
+    def arguments(self, closing):
+        """解析 (a, b, ...) 或 {a, b, ...}，当前记号为左括号"""
+        opening = self.advance()
+        args = []
+        end = opening.end
+        if self.peek_op(closing):
+            return args, self.advance().end
+        while self.i < len(self.tokens):
+            before = self.i
+            arg = self.expression(0)
+            args.append(arg)
+            end = max(end, arg.end)
+            if self.peek_op(','):
+                end = self.advance().end
+                continue
+            if self.peek_op(closing):
+                end = self.advance().end
+                break
+            if self.i == before:
+                # 无法识别的记号（如不匹配的右括号），结束参数列表
+                break
+        return args, end
+
+    def postfix(self, node):
+        while True:
+            if self.peek_op('.'):
+                nxt = self.peek(1)
+                if nxt is not None and nxt.kind in ('field', 'table'):
+                    self.advance()
+                    self.advance()
+                    ref = Node(nxt.kind, nxt.value, (), nxt.start, nxt.end)
+                    node = Node('member', None, [node, ref], node.start, nxt.end)
+                elif nxt is not None and nxt.kind == 'name':
+                    self.advance()
+                    self.advance()
+                    if self.peek_op('('):
+                        args, end = self.arguments(')')
+                        node = Node('method', nxt.value, [node] + args, node.start, end)
+                    else:
+                        node = Node('attr', nxt.value, [node], node.start, nxt.end)
+                else:
+                    break
+            elif self.peek_op('['):
+                self.advance()
+                index = self.expression(0)
+                end = index.end
+                if self.peek_op(']'):
+                    end = self.advance().end
+                node = Node('index', None, [node, index], node.start, end)
+            else:
+                break
+        return node
+
+
+def parse_formula(formula):
+    """将公式解析为语法树；空公式返回 None"""
+    if not formula:
+        return None
+    try:
+        return _Parser(formula).parse()
+    except RecursionError:
+        # 嵌套层数超过解释器递归上限，按无法解析处理
+        return Node('error', formula, (), 0, len(formula))
+
+
+# ========== 分析 ==========
+FormulaInfo = namedtuple('FormulaInfo', ['tree', 'table_refs', 'field_refs', 'functions', 'filters'])
+FormulaInfo.__doc__ = """
+公式分析结果（按语法树前序遍历顺序，可能重复）。
+- tree: 语法树
+- table_refs: 引用的表 ID
+- field_refs: 引用的字段 ID
+- functions: 调用的函数名（含链式调用，如 FILTER、SUM）
+- filters: 每个 FILTER 的条件表达式节点
+"""
+
+EMPTY_INFO = FormulaInfo(None, [], [], [], [])
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def analyze_formula(formula):
+    """解析公式并在一次遍历中提取引用、函数调用和 FILTER 条件（带缓存）"""
+    tree = parse_formula(formula)
+    if tree is None:
+        return EMPTY_INFO
+
+    table_refs, field_refs, functions, filters = [], [], [], []
+    for node in tree.walk():
+        kind = node.kind
+        if kind == 'table':
+            table_refs.append(node.value)
+        elif kind == 'field':
+            field_refs.append(node.value)
+        elif kind in ('call', 'method'):
+            functions.append(node.value)
+            if node.value.upper() == 'FILTER':
+                # 链式 x.FILTER(条件) 的条件是第 1 个参数；函数式 FILTER(区域, 条件) 是第 2 个
+                args = node.children[1:] if kind == 'method' else node.children
+                cond_index = 0 if kind == 'method' else 1
+                if len(args) > cond_index:
+                    filters.append(args[cond_index])
+    return FormulaInfo(tree, table_refs, field_refs, functions, filters)
+
+
+def find_table_refs(formula):
+    """返回公式中引用的全部表 ID（可能重复；字符串字面量中的内容不计入）"""
+    return analyze_formula(formula).table_refs if formula else []
+
+
+def _is_current_value_field(node):
+    """是否形如 CurrentValue.$column[fldXXX]，是则返回字段 ID"""
+    if node.kind == 'member' and node.children[0].kind == 'name' and node.children[0].value == 'CurrentValue':
+        return node.children[1].value
+    return None
+
+
+def _collect_conditions(node, formula, render, out):
+    kind, value = node.kind, node.value
+    if kind == 'group':
+        _collect_conditions(node.children[0], formula, render, out)
+    elif (kind == 'binary' and value == '&&') or (kind == 'call' and value.upper() == 'AND'):
+        for child in node.children:
+            _collect_conditions(child, formula, render, out)
+    elif (kind == 'binary' and value == '||') or (kind == 'call' and value.upper() == 'OR'):
+        branches = []
+        for child in node.children:
+            sub = []
+            _collect_conditions(child, formula, render, sub)
+            if sub:
+                branches.append(" 且 ".join(sub))
+        if len(branches) == 1:
+            out.append(branches[0])
+        elif branches:
+            out.append("(" + " 或 ".join(branches) + ")")
+    elif kind == 'binary' and value in ('=', '==', '!='):
+        left, right = node.children
+        field_id = _is_current_value_field(left)
+        if field_id is not None:
+            op = '!=' if value == '!=' else '='
+            out.append(render(field_id, op, formula[right.start:right.end].strip()))
+
+
+def filter_conditions(formula, render):
+    """
+    提取公式中所有 FILTER 里形如 CurrentValue.$column[fld] = / != 右值 的条件。
+    render(field_id, op, right_source) 负责生成单个条件的描述，op 为 '=' 或 '!='。
+    且 (&& / AND) 展开为并列条件，或 (|| / OR) 合并为一个带括号的条件。
+    返回条件描述列表（各 FILTER 依次排列）。
+    """
+    if not formula:
+        return []
+    conditions = []
+    for predicate in analyze_formula(formula).filters:
+        _collect_conditions(predicate, formula, render, conditions)
+    return conditions
+
+
+class FormulaTranslator:
+    """
+    绑定一组名称映射的公式翻译器。
+    - table_label(table_id) -> 表的显示名
+    - field_label(current_table_id, field_id) -> 字段的显示名
+    未提供时使用默认规则：找不到的表标记为 [已删除的表:ID]，找不到的字段标记为 [未知字段:ID]。
+    名称映射在生成过程中不会变化，因此翻译结果可以安全缓存。
+    """
+
+    def __init__(self, table_map, field_map, table_label=None, field_label=None, cache_size=CACHE_SIZE):
+        self.table_map = table_map
+        self.field_map = field_map
+        self.table_label = table_label or self._default_table_label
+        self.field_label = field_label or self._default_field_label
+        self._translate_cached = lru_cache(maxsize=cache_size)(self._translate)
+
+    def bound_to(self, table_map, field_map):
+        """是否绑定在给定的这组映射上"""
+        return self.table_map is table_map and self.field_map is field_map
+
+    def translate(self, formula, current_table_id):
+        """翻译公式；相同 (公式, 当前表ID) 直接命中缓存，缓存中的未解析记录按当前位置重新登记"""
+        if not formula:
+            return ""
+        text, unresolved = self._translate_cached(formula, current_table_id)
+        if unresolved:
+            completeness_sink.replay(unresolved)
+        return text
+
+    def cache_info(self):
+        """LRU 缓存命中统计"""
+        return self._translate_cached.cache_info()
+
+    def _default_table_label(self, table_id):
+        return (self.table_map.get(table_id)
+                or completeness_sink.record('已删除引用', table_id, f"[已删除的表:{table_id}]"))
+
+    def _default_field_label(self, current_table_id, field_id):
+        # 先尝试当前表，再尝试所有表
+        return (self.field_map.lookup(current_table_id, field_id)
+                or completeness_sink.record('显式未知项', field_id, f"[未知字段:{field_id}]"))
+
+    def _translate(self, formula, current_table_id):
+        """返回 (译文, 未解析记录)；记录随译文一起缓存"""
+        with completeness_sink.capture() as unresolved:
+            text = self._translate_text(formula, current_table_id)
+        return text, tuple(unresolved)
+
+    def _translate_text(self, formula, current_table_id):
+        parts = []
+        pos = 0
+        for m in TOKEN_RE.finditer(formula):
+            parts.append(formula[pos:m.start()])
+            table_id, field_id = m.group('table', 'field')
+            if table_id is not None:
+                parts.append(f"「{self.table_label(table_id)}」")
+            elif field_id is not None:
+                parts.append(f"「{self.field_label(current_table_id, field_id)}」")
+            # 否则是多余的 bitable:: 前缀，直接丢弃
+            pos = m.end()
+        parts.append(formula[pos:])
+        return "".join(parts)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+片段缓存 (Fragment Cache)
+=========================
+功能：按内容哈希缓存每张表 / 每个工作流渲染出的 Markdown 片段，
+      重新生成文档时只重新渲染发生变化的部分，其余直接拼接缓存。
+特性：
+- 缓存键 = 片段内容哈希 + 上下文哈希（名称映射等全局数据）+ 脚本源码哈希，
+  任何一项变化都会使对应片段失效，输出与完整重新生成一致
+- 每份文档一个子目录，每个片段一个文件，写入采用临时文件 + 替换，中断不会留下半个片段
+- 生成结束后清理本次未用到的旧片段，缓存大小只与当前 .base 相关
+- 片段的完整性记录（见 completeness_sink）保存在同名 .json 中，命中缓存时一并取回
+
+用法：
+    cache = FragmentCache(".feishu_cache", "全量字段表", table_map, field_map)
+    for text, result, records in splice(tables, cache, render_many):
+        ...
+    cache.prune()
+"""
+
+import hashlib
+import json
+import os
+
+CACHE_VERSION = 1
+SUFFIX = ".md"
+RECORDS_SUFFIX = ".json"
+
+_source_digest = None
+
+
+def digest(obj):
+    """对任意可 JSON 序列化的对象求 SHA-256（键排序，结果与 dict 插入顺序无关）"""
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def source_digest():
+    """scripts 目录下全部 .py 源码的哈希：解析逻辑有改动时，旧片段全部失效"""
+    global _source_digest
+    if _source_digest is None:
+        scripts_dir = os.path.dirname(os.path.abspath(__file__))
+        h = hashlib.sha256(str(CACHE_VERSION).encode())
+        for name in sorted(os.listdir(scripts_dir)):
+            if name.endswith('.py'):
+                with open(os.path.join(scripts_dir, name), 'rb') as f:
+                    h.update(name.encode('utf-8'))
+                    h.update(f.read())
+        _source_digest = h.hexdigest()
+    return _source_digest
+
+
+class FragmentCache:
+    """
+    单份文档的片段缓存。
+    - cache_dir: 缓存根目录，片段保存在 cache_dir/namespace/ 下
+    - namespace: 文档名称，如 "全量字段表"
+    - context: 影响渲染结果的全局数据（表名、字段名映射等），参与每个片段的缓存键
+    """
+
+    def __init__(self, cache_dir, namespace, *context):
+        self.path = os.path.join(cache_dir, namespace)
+        os.makedirs(self.path, exist_ok=True)
+        self._context = digest([source_digest(), [_as_json(c) for c in context]])
+        self._used = set()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, content):
+        """片段内容（表定义、工作流等）对应的缓存键"""
+        return digest([self._context, content])
+
+    def _file(self, key):
+        return os.path.join(self.path, key + SUFFIX)
+
+    def has(self, key):
+        """缓存中是否已有该片段"""
+        return os.path.exists(self._file(key))
+
+    def get(self, key):
+        """读取缓存片段；不存在返回 None"""
+        try:
+            with open(self._file(key), 'r', encoding='utf-8', newline='') as f:
+                text = f.read()
+        except OSError:
+            return None
+        self._used.add(key)
+        self.hits += 1
+        return text
+
+    def records(self, key):
+        """读取片段的完整性记录；没有记录返回空列表"""
+        try:
+            with open(os.path.join(self.path, key + RECORDS_SUFFIX), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def put(self, key, text, records=None):
+        """写入片段（先写临时文件再替换）；records 非空时另存为同名 .json"""
+        if records:
+            self._write(os.path.join(self.path, key + RECORDS_SUFFIX),
+                        json.dumps(records, ensure_ascii=False))
+        self._write(self._file(key), text)
+        self._used.add(key)
+        self.misses += 1
+
+    @staticmethod
+    def _write(path, text):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def prune(self):
+        """删除本次生成未用到的片段（连同其记录文件），返回删除的个数"""
+        removed = 0
+        for name in os.listdir(self.path):
+            stem, ext = os.path.splitext(name)
+            if ext not in (SUFFIX, RECORDS_SUFFIX) or stem not in self._used:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def summary(self):
+        """命中统计，用于进度输出"""
+        return f"缓存命中 {self.hits} 个，重新渲染 {self.misses} 个"
+
+
+def _as_json(obj):
+    """FieldMap 等以元组为键的 dict 无法直接 JSON 序列化，转为有序的键值对列表"""
+    if isinstance(obj, dict) and any(isinstance(k, tuple) for k in obj):
+        return sorted([list(k), v] for k, v in obj.items())
+    return obj
+
+
+def splice(items, cache, render_many, text_of=None, records_of=None):
+    """
+    按顺序产出 items 中每一项的 (片段文本, 渲染结果, 完整性记录)。
+    - 命中缓存的项直接读取缓存，渲染结果为 None，记录取自缓存
+    - 其余项的下标一次性交给 render_many(indices)，由它按同样顺序产出渲染结果
+      （可以是进程池并行渲染），渲染结果经 text_of / records_of 取出片段文本和记录后写回缓存
+    cache 为 None 时等同于全部重新渲染。
+    """
+    text_of = text_of or (lambda result: result)
+    records_of = records_of or (lambda result: [])
+    if cache is None:
+        for result in render_many(list(range(len(items)))):
+            yield text_of(result), result, records_of(result)
+        return
+
+    keys = [cache.key(item) for item in items]
+    pending = [i for i, key in enumerate(keys) if not cache.has(key)]
+    fresh = render_many(pending)
+    pending = set(pending)
+
+    for i, key in enumerate(keys):
+        text = None if i in pending else cache.get(key)
+        if text is not None:
+            yield text, None, cache.records(key)
+            continue
+        # 未命中，或检查后缓存文件被外部删除
+        result = next(fresh) if i in pending else next(iter(render_many([i])))
+        text, records = text_of(result), records_of(result)
+        cache.put(key, text, records)
+        yield text, result, records
@@ -9,16 +9,24 @@
 - 公式翻译为「表名」.「字段名」格式
 - AI 字段单独标注并展示提示词
 - 选项、查找引用等配置完整展示
+- 支持 --jobs 并行渲染、--cache-dir 增量生成（只重新渲染有变化的表）
+- 支持 --tables 只生成指定的表，只注册这些表及其引用涉及的表的字段
 
 输出：全量字段表.md
 """
 
-import json
-import base64
-import gzip
-import io
+import argparse
 import datetime
-import re
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import completeness_sink
+import profiling
+from base_loader import BaseDocument, parse_table_list, resolve_jobs
+from formula import FormulaTranslator, filter_conditions
+from fragment_cache import FragmentCache, splice
+from name_registry import NameRegistry
 
 # ========== 配置 ==========
 FILE_PATH = "【演示】成品布管理系统.base"
@@ -34,19 +42,11 @@ FIELD_TYPES = {
     1005: "自动编号", 3001: "按钮"
 }
 
+# 当前名称映射对应的公式翻译器（见 get_translator）
+_translator = None
 
-def decompress_content(compressed_content):
-    """解压 gzip + base64 编码的内容"""
-    try:
-        if isinstance(compressed_content, str):
-            compressed_bytes = base64.b64decode(compressed_content)
-        else:
-            return None
-        with gzip.GzipFile(fileobj=io.BytesIO(compressed_bytes)) as gz:
-            return json.loads(gz.read().decode('utf-8'))
-    except Exception as e:
-        print(f"解压失败: {e}")
-        return None
+# 并行渲染时子进程持有的数据 (sorted_tables, table_map, field_map)，见 _init_worker
+_worker_state = None
 
 
 def build_name_registry(snapshot):
@@ -54,53 +54,11 @@ def build_name_registry(snapshot):
     从快照中构建表名和字段名的映射表。
     返回: (table_map, field_map, all_tables)
     - table_map: {table_id: table_name}
-    - field_map: {(table_id, field_id): field_name}
+    - field_map: {(table_id, field_id): field_name}，支持 field_map.find(field_id)
     - all_tables: [table_dict, ...]
     """
-    table_map = {}
-    field_map = {}
-    all_tables = []
-
-    for item in snapshot:
-        if 'schema' not in item:
-            continue
-        
-        schema = item['schema']
-        
-        # 首先从 tableMap 获取表名（这里通常有完整的表名）
-        for tid, tinfo in schema.get('tableMap', {}).items():
-            if isinstance(tinfo, dict) and tinfo.get('name'):
-                table_map[tid] = tinfo['name']
-        
-        # 然后处理 data 中的表结构
-        if 'data' not in schema:
-            continue
-            
-        data = schema['data']
-        tables = data.get('tables', [])
-        if 'table' in data:
-            tables.append(data['table'])
-        
-        for table in tables:
-            if not isinstance(table, dict):
-                continue
-            
-            all_tables.append(table)
-            table_id = table.get('meta', {}).get('id')
-            table_name = table.get('meta', {}).get('name')
-            
-            # 只有当 tableMap 中没有这个表时才使用 meta.name
-            if table_id and table_id not in table_map:
-                table_map[table_id] = table_name or table_id
-                
-            # 提取字段名
-            if table_id:
-                for field_id, field_def in table.get('fieldMap', {}).items():
-                    field_name = field_def.get('name') or field_id
-                    field_map[(table_id, field_id)] = field_name
-
-    return table_map, field_map, all_tables
-
+    registry = NameRegistry.from_snapshot(snapshot)
+    return registry.table_map, registry.field_map, registry.all_tables
 
 
 def get_field_type_name(type_id):
@@ -108,44 +66,20 @@ def get_field_type_name(type_id):
     return FIELD_TYPES.get(type_id, f"未知类型({type_id})")
 
 
+def get_translator(table_map, field_map):
+    """返回绑定当前名称映射的公式翻译器；映射不变时复用，以共享翻译缓存"""
+    global _translator
+    if _translator is None or not _translator.bound_to(table_map, field_map):
+        _translator = FormulaTranslator(table_map, field_map)
+    return _translator
+
+
 def translate_formula(formula, current_table_id, table_map, field_map):
     """
     将公式中的 ID 翻译为可读的「表名」.「字段名」格式。
+    未找到的表/字段返回友好标记 [已删除的表:ID] / [未知字段:ID]。
     """
-    if not formula:
-        return ""
-    
-    # 替换表引用: bitable::$table[tblXXX] -> 「表名」
-    def replace_table(match):
-        tid = match.group(1)
-        tname = table_map.get(tid)
-        if tname:
-            return f"「{tname}」"
-        # 未找到时返回友好标记
-        return f"「[已删除的表:{tid}]」"
-    
-    formula = re.sub(r'bitable::\$table\[(.*?)\]', replace_table, formula)
-    
-    # 替换字段引用: $field[fldXXX] 或 $column[fldXXX] -> 「字段名」
-    def replace_field(match):
-        fid = match.group(1)
-        # 先尝试当前表
-        fname = field_map.get((current_table_id, fid))
-        if fname:
-            return f"「{fname}」"
-        # 再尝试所有表
-        for (tid, f_id), name in field_map.items():
-            if f_id == fid:
-                return f"「{name}」"
-        # 未找到时返回友好标记
-        return f"「[未知字段:{fid}]」"
-    
-    formula = re.sub(r'\$(?:field|column)\[(.*?)\]', replace_field, formula)
-    
-    # 清理 bitable:: 前缀
-    formula = formula.replace("bitable::", "")
-    
-    return formula
+    return get_translator(table_map, field_map).translate(formula, current_table_id)
 
 
 def extract_ai_config(field_def, field_map):
@@ -167,11 +101,7 @@ def extract_ai_config(field_def, field_map):
                 val = p.get('value', {})
                 if val.get('valueType') == 'field':
                     fid = val.get('value', {}).get('id')
-                    fname = fid
-                    for (tid, f_id), name in field_map.items():
-                        if f_id == fid:
-                            fname = name
-                            break
+                    fname = field_map.find(fid) or fid
                     prompt_parts.append(f"{{字段:{fname}}}")
         return True, "提示词: " + "".join(prompt_parts)
     
@@ -224,12 +154,7 @@ def extract_ai_config(field_def, field_map):
     source_obj = form_data.get('source', {}) or form_data.get('choiceColumn', {})
     source_id = source_obj.get('id', '') if isinstance(source_obj, dict) else ''
     if source_id:
-        for (tid, f_id), name in field_map.items():
-            if f_id == source_id:
-                source_field = name
-                break
-        if not source_field:
-            source_field = source_id
+        source_field = field_map.find(source_id) or source_id
     
     # 构建描述
     desc_parts = []
@@ -247,49 +172,32 @@ def extract_ai_config(field_def, field_map):
     return True, " | ".join(desc_parts) if desc_parts else "AI 字段"
 
 
-def extract_filter_conditions_from_formula(formula, current_table_id, table_map, field_map):
+def extract_filter_conditions_from_formula(formula, current_table_id, table_map, field_map, translator=None):
     """
     从公式中提取 FILTER 条件，返回可读描述。
+    translator: 指定时用它翻译右值，否则使用 get_translator 返回的共享翻译器。
     """
-    if not formula:
-        return ""
-    
-    conditions = []
-    
-    # 提取 FILTER 内的条件
-    filter_matches = re.findall(r'\.FILTER\((.*?)\)', formula, re.DOTALL)
-    for filter_expr in filter_matches:
-        # 等于条件
-        eq_matches = re.findall(r'CurrentValue\.\$(?:column|field)\[(.*?)\]\s*=\s*([^&\)]+)', filter_expr)
-        for left_fid, right_expr in eq_matches:
-            left_fname = field_map.get((current_table_id, left_fid), left_fid)
-            # 尝试全局查找
-            if left_fname == left_fid:
-                for (tid, fid), name in field_map.items():
-                    if fid == left_fid:
-                        left_fname = name
-                        break
-            right_translated = translate_formula(right_expr.strip(), current_table_id, table_map, field_map)
-            conditions.append(f"「{left_fname}」= {right_translated}")
-        
-        # 不等于条件
-        neq_matches = re.findall(r'CurrentValue\.\$(?:column|field)\[(.*?)\]\s*!=\s*([^&\)]+)', filter_expr)
-        for left_fid, right_expr in neq_matches:
-            left_fname = field_map.get((current_table_id, left_fid), left_fid)
-            if left_fname == left_fid:
-                for (tid, fid), name in field_map.items():
-                    if fid == left_fid:
-                        left_fname = name
-                        break
-            right_translated = translate_formula(right_expr.strip(), current_table_id, table_map, field_map)
-            conditions.append(f"「{left_fname}」≠ {right_translated}")
-    
+    translator = translator or get_translator(table_map, field_map)
+    
+    def render(left_fid, op, right_expr):
+        left_fname = field_map.get((current_table_id, left_fid), left_fid)
+        # 尝试全局查找
+        if left_fname == left_fid:
+            left_fname = field_map.find(left_fid) or left_fid
+        right_translated = translator.translate(right_expr, current_table_id)
+        if op == '!=':
+            return f"「{left_fname}」≠ {right_translated}"
+        return f"「{left_fname}」= {right_translated}"
+    
+    conditions = filter_conditions(formula, render)
     return " 且 ".join(conditions) if conditions else ""
 
 
-def extract_field_config(field_def, current_table_id, table_map, field_map):
+def extract_field_config(field_def, current_table_id, table_map, field_map, translator=None):
     """
     提取字段的配置信息（公式、选项、查找引用等）。
+    translator: 同时处理多组名称映射时（如 base_diff 的新旧版本），传入各自的 FormulaTranslator，
+                避免交替调用时共享翻译器反复重建、缓存失效。
     返回: (config_text, is_ai, ai_desc)
     """
     field_type = field_def.get('type')
@@ -301,7 +209,7 @@ def extract_field_config(field_def, current_table_id, table_map, field_map):
     # 公式
     if field_type == 20:
         formula = prop.get('formula', '')
-        translated = translate_formula(formula, current_table_id, table_map, field_map)
+        translated = (translator or get_translator(table_map, field_map)).translate(formula, current_table_id)
         return f"`{translated}`", is_ai, ai_desc
     
     # 单选/多选
@@ -327,18 +235,13 @@ def extract_field_config(field_def, current_table_id, table_map, field_map):
             # 翻译目标表名，未找到则标记为已删除
             target_tname = table_map.get(target_tid)
             if not target_tname:
-                target_tname = f"[已删除的表:{target_tid}]"
+                target_tname = completeness_sink.record('已删除引用', target_tid, f"[已删除的表:{target_tid}]")
             
             # 翻译目标字段名，未找到则标记为已删除
-            target_fname = field_map.get((target_tid, target_fid))
+            # 先精确匹配，再尝试全局查找
+            target_fname = field_map.lookup(target_tid, target_fid)
             if not target_fname:
-                # 尝试全局查找
-                for (tid, fid), name in field_map.items():
-                    if fid == target_fid:
-                        target_fname = name
-                        break
-            if not target_fname:
-                target_fname = f"[已删除的字段:{target_fid}]"
+                target_fname = completeness_sink.record('已删除引用', target_fid, f"[已删除的字段:{target_fid}]")
             
             # 基本信息
             result = f"查找引用自「{target_tname}」的「{target_fname}」"
@@ -347,7 +250,8 @@ def extract_field_config(field_def, current_table_id, table_map, field_map):
             lookup_formula = prop.get('formula', '')
             if lookup_formula:
                 # 提取 FILTER 条件
-                filter_conds = extract_filter_conditions_from_formula(lookup_formula, current_table_id, table_map, field_map)
+                filter_conds = extract_filter_conditions_from_formula(lookup_formula, current_table_id, table_map,
+                                                                      field_map, translator)
                 if filter_conds:
                     result += f"<br>筛选条件: {filter_conds}"
             
@@ -359,7 +263,7 @@ def extract_field_config(field_def, current_table_id, table_map, field_map):
         if target_tid:
             target_tname = table_map.get(target_tid)
             if not target_tname:
-                target_tname = f"[已删除的表:{target_tid}]"
+                target_tname = completeness_sink.record('已删除引用', target_tid, f"[已删除的表:{target_tid}]")
             return f"关联到「{target_tname}」", is_ai, ai_desc
     
     # 自动编号
@@ -433,90 +337,183 @@ def extract_field_config(field_def, current_table_id, table_map, field_map):
     return "-", is_ai, ai_desc
 
 
-def generate_document(all_tables, table_map, field_map):
-    """生成全量字段表 Markdown 文档"""
+def render_table(table, table_map, field_map):
+    """渲染单张表的 Markdown 片段（表头 + 字段明细）"""
+    table_id = table.get('meta', {}).get('id')
+    table_name = table_map.get(table_id, table_id)
+    field_map_data = table.get('fieldMap', {})
+    
     lines = []
-    lines.append("# 全量字段表\n")
-    lines.append(f"> 生成时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-    lines.append(f"> 数据表总数: {len(all_tables)}\n\n")
+    lines.append(f"## 📊 {table_name}\n")
+    lines.append(f"- 表 ID: `{table_id}`\n")
+    lines.append(f"- 字段数量: {len(field_map_data)}\n\n")
     
-    # 按表名排序
-    sorted_tables = sorted(all_tables, key=lambda t: table_map.get(t.get('meta', {}).get('id'), ''))
+    lines.append("| 字段名称 | 字段类型 | 是否AI字段 | 业务描述 | 完整配置/公式 |\n")
+    lines.append("| :--- | :--- | :--- | :--- | :--- |\n")
     
-    for table in sorted_tables:
-        table_id = table.get('meta', {}).get('id')
-        table_name = table_map.get(table_id, table_id)
-        field_map_data = table.get('fieldMap', {})
-        
-        lines.append(f"## 📊 {table_name}\n")
-        lines.append(f"- 表 ID: `{table_id}`\n")
-        lines.append(f"- 字段数量: {len(field_map_data)}\n\n")
+    # 按字段名排序
+    sorted_fields = sorted(field_map_data.items(), key=lambda x: x[1].get('name', ''))
+    
+    for field_id, field_def in sorted_fields:
+        field_name = field_def.get('name', field_id)
+        completeness_sink.locate(field=field_name)
+        field_type = get_field_type_name(field_def.get('type'))
+        description = field_def.get('description', {}).get('text', '').replace('\n', ' ')
         
-        lines.append("| 字段名称 | 字段类型 | 是否AI字段 | 业务描述 | 完整配置/公式 |\n")
-        lines.append("| :--- | :--- | :--- | :--- | :--- |\n")
+        config, is_ai, ai_desc = extract_field_config(field_def, table_id, table_map, field_map)
         
-        # 按字段名排序
-        sorted_fields = sorted(field_map_data.items(), key=lambda x: x[1].get('name', ''))
+        # 处理配置文本，避免破坏表格
+        config_clean = config.replace('\n', ' ').replace('|', '\\|')
+        if len(config_clean) > 500:
+            config_clean = config_clean[:500] + "..."
         
-        for field_id, field_def in sorted_fields:
-            field_name = field_def.get('name', field_id)
-            field_type = get_field_type_name(field_def.get('type'))
-            description = field_def.get('description', {}).get('text', '').replace('\n', ' ')
-            
-            config, is_ai, ai_desc = extract_field_config(field_def, table_id, table_map, field_map)
-            
-            # 处理配置文本，避免破坏表格
-            config_clean = config.replace('\n', ' ').replace('|', '\\|')
-            if len(config_clean) > 500:
-                config_clean = config_clean[:500] + "..."
-            
-            ai_marker = "🤖 是" if is_ai else "否"
-            if is_ai and ai_desc:
-                config_clean = f"**AI配置**: {ai_desc}<br><br>{config_clean}"
-            
-            lines.append(f"| **{field_name}** | {field_type} | {ai_marker} | {description} | {config_clean} |\n")
+        ai_marker = "🤖 是" if is_ai else "否"
+        if is_ai and ai_desc:
+            config_clean = f"**AI配置**: {ai_desc}<br><br>{config_clean}"
         
-        lines.append("\n---\n\n")
+        lines.append(f"| **{field_name}** | {field_type} | {ai_marker} | {description} | {config_clean} |\n")
     
+    lines.append("\n---\n\n")
     return "".join(lines)
 
 
-def main():
-    print("=" * 50)
-    print("全量字段表生成器")
-    print("=" * 50)
-    
-    # 读取 .base 文件
-    print(f"\n[1/4] 读取文件: {FILE_PATH}")
-    try:
-        with open(FILE_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception as e:
-        print(f"❌ 文件读取失败: {e}")
+def _init_worker(sorted_tables, table_map, field_map):
+    """子进程初始化：保存表结构和名称映射（fork 时直接继承，无需逐表序列化）"""
+    global _worker_state
+    _worker_state = (sorted_tables, table_map, field_map)
+
+
+def _timed_render(table, table_map, field_map):
+    """渲染单张表并计时，返回 (片段, 耗时秒数, 完整性记录)"""
+    table_id = table.get('meta', {}).get('id')
+    start = time.perf_counter()
+    with completeness_sink.capture(table=table_map.get(table_id, table_id)) as records:
+        fragment = render_table(table, table_map, field_map)
+    return fragment, time.perf_counter() - start, records
+
+
+def _render_table_at(index):
+    """子进程：渲染排序后第 index 张表，返回 (片段, 耗时秒数, 完整性记录)"""
+    sorted_tables, table_map, field_map = _worker_state
+    return _timed_render(sorted_tables[index], table_map, field_map)
+
+
+def iter_rendered_tables(sorted_tables, table_map, field_map, jobs=1):
+    """
+    按顺序产出每张表的 (Markdown 片段, 完整性记录)。
+    jobs > 1 时由进程池并行渲染，结果仍按 sorted_tables 的顺序产出，与串行输出完全一致。
+    每张表的渲染耗时（并行时为子进程内的耗时）记入剖析报告。
+    """
+    if jobs <= 1 or len(sorted_tables) < 2:
+        results = (_timed_render(table, table_map, field_map) for table in sorted_tables)
+        for table, (fragment, elapsed, records) in zip(sorted_tables, results):
+            profiling.record_item("渲染表", table.get('meta', {}).get('id'), elapsed)
+            yield fragment, records
         return
     
+    chunksize = max(1, len(sorted_tables) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(sorted_tables, table_map, field_map)) as executor:
+        results = executor.map(_render_table_at, range(len(sorted_tables)), chunksize=chunksize)
+        for table, (fragment, elapsed, records) in zip(sorted_tables, results):
+            profiling.record_item("渲染表", table.get('meta', {}).get('id'), elapsed)
+            yield fragment, records
+
+
+def write_document(out, all_tables, table_map, field_map, jobs=1, cache=None):
+    """
+    将全量字段表逐表写入 out（任意带 write() 的文本输出，如文件）。
+    每渲染完一张表立即写出，内存占用只与单张表的大小有关。
+    jobs > 1 时并行渲染各表，输出顺序不变。
+    cache: FragmentCache，命中缓存的表直接拼接缓存片段，只渲染有变化的表。
+    """
+    out.write("# 全量字段表\n")
+    out.write(f"> 生成时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    out.write(f"> 数据表总数: {len(all_tables)}\n\n")
+    
+    # 按表名排序
+    sorted_tables = sorted(all_tables, key=lambda t: table_map.get(t.get('meta', {}).get('id'), ''))
+    
+    def render_many(indices):
+        return iter_rendered_tables([sorted_tables[i] for i in indices], table_map, field_map, jobs)
+    
+    for fragment, _, records in splice(sorted_tables, cache, render_many,
+                                       text_of=lambda r: r[0], records_of=lambda r: r[1]):
+        completeness_sink.add(records, fragment)
+        out.write(fragment)
+
+
+def generate_document(all_tables, table_map, field_map):
+    """生成全量字段表 Markdown 文档（返回完整字符串）"""
+    buf = io.StringIO()
+    write_document(buf, all_tables, table_map, field_map)
+    return buf.getvalue()
+
+
+def run(doc, output_path=OUTPUT_PATH, jobs=1, cache_dir=None):
+    """
+    基于已加载的 BaseDocument 生成全量字段表，成功返回 True。
+    jobs: 并行渲染的进程数，1 为串行。
+    cache_dir: 片段缓存目录，指定后只重新渲染内容有变化的表。
+    """
     # 解压快照数据
     print("[2/4] 解压快照数据...")
-    snapshot = decompress_content(data.get('gzipSnapshot'))
+    snapshot = doc.snapshot
     if not snapshot:
         print("❌ 快照解压失败")
-        return
+        return False
     
     # 构建名称映射
     print("[3/4] 构建名称映射...")
-    table_map, field_map, all_tables = build_name_registry(snapshot)
+    registry = doc.registry
+    table_map, field_map, all_tables = registry.table_map, registry.field_map, registry.all_tables
     print(f"    - 发现 {len(table_map)} 张表")
     print(f"    - 发现 {len(field_map)} 个字段")
+    if registry.selected is not None:
+        print(f"    - 限定范围: {len(all_tables)} 张表（连同引用涉及的表共注册 {len(registry.loaded)} 张表的字段）")
+    
+    # 生成文档，边渲染边写入文件
+    print("[4/4] 生成文档..." + (f" (并行: {jobs} 个进程)" if jobs > 1 else ""))
+    cache = FragmentCache(cache_dir, "全量字段表", table_map, field_map) if cache_dir else None
+    with profiling.stage("生成文档"), open(output_path, 'w', encoding='utf-8') as f:
+        out = profiling.timed_writer(completeness_sink.tracking_writer(f, output_path))
+        write_document(out, all_tables, table_map, field_map, jobs, cache)
+    if cache:
+        cache.prune()
+        print(f"    - {cache.summary()}")
+    
+    print(f"\n✅ 成功生成: {output_path}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全量字段表生成器")
+    parser.add_argument("--jobs", type=int, default=1, help="并行渲染的进程数（0 = CPU 核数，默认 1 即串行）")
+    parser.add_argument("--cache-dir", help="片段缓存目录，指定后只重新渲染内容有变化的表，同时缓存解压后的数据（.base 未变化时跳过解压）")
+    parser.add_argument("--tables", help="只生成指定的表（逗号分隔的表名或表 ID），其引用涉及的表只用于名称解析")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
     
-    # 生成文档
-    print("[4/4] 生成文档...")
-    document = generate_document(all_tables, table_map, field_map)
-    
-    # 写入文件
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        f.write(document)
+    print("=" * 50)
+    print("全量字段表生成器")
+    print("=" * 50)
     
-    print(f"\n✅ 成功生成: {OUTPUT_PATH}")
+    with profiling.session(profiling.report_path(args), args.cprofile):
+        # 读取 .base 文件
+        print(f"\n[1/4] 读取文件: {FILE_PATH}")
+        try:
+            doc = BaseDocument.load(FILE_PATH, cache_dir=args.cache_dir)
+        except Exception as e:
+            print(f"❌ 文件读取失败: {e}")
+            return
+        if args.tables:
+            try:
+                doc.select_tables(parse_table_list(args.tables))
+            except ValueError as e:
+                print(f"❌ {e}")
+                return
+    
+        run(doc, jobs=resolve_jobs(args.jobs), cache_dir=args.cache_dir)
     print("=" * 50)
 
 
@@ -9,80 +9,36 @@
 - 识别三种关联类型：公式关联、查找引用、选项同步
 - 公式翻译为「表名」.「字段名」格式
 - 完整展示关联逻辑
+- 支持 --cache-dir 增量生成（只重新渲染有变化的表）
+- 支持 --tables 只生成指定的表，只注册这些表及其引用涉及的表的字段
 
 输出：关联关系图.md
 """
 
-import json
-import base64
-import gzip
-import io
+import argparse
 import datetime
-import re
+import io
+import time
+
+import completeness_sink
+import profiling
+from base_loader import BaseDocument, parse_table_list
+from formula import FormulaTranslator, filter_conditions, find_table_refs
+from fragment_cache import FragmentCache, splice
+from name_registry import NameRegistry
 
 # ========== 配置 ==========
 FILE_PATH = "【演示】成品布管理系统.base"
 OUTPUT_PATH = "字段关联关系图.md"
 
-
-def decompress_content(compressed_content):
-    """解压 gzip + base64 编码的内容"""
-    try:
-        if isinstance(compressed_content, str):
-            compressed_bytes = base64.b64decode(compressed_content)
-        else:
-            return None
-        with gzip.GzipFile(fileobj=io.BytesIO(compressed_bytes)) as gz:
-            return json.loads(gz.read().decode('utf-8'))
-    except Exception as e:
-        print(f"解压失败: {e}")
-        return None
+# 当前名称映射对应的公式翻译器（见 get_translator）
+_translator = None
 
 
 def build_name_registry(snapshot):
     """从快照中构建表名和字段名的映射表"""
-    table_map = {}
-    field_map = {}
-    all_tables = []
-
-    for item in snapshot:
-        if 'schema' not in item:
-            continue
-        
-        schema = item['schema']
-        
-        # 首先从 tableMap 获取表名（这里通常有完整的表名）
-        for tid, tinfo in schema.get('tableMap', {}).items():
-            if isinstance(tinfo, dict) and tinfo.get('name'):
-                table_map[tid] = tinfo['name']
-        
-        # 然后处理 data 中的表结构
-        if 'data' not in schema:
-            continue
-            
-        data = schema['data']
-        tables = data.get('tables', [])
-        if 'table' in data:
-            tables.append(data['table'])
-        
-        for table in tables:
-            if not isinstance(table, dict):
-                continue
-            
-            all_tables.append(table)
-            table_id = table.get('meta', {}).get('id')
-            table_name = table.get('meta', {}).get('name')
-            
-            # 只有当 tableMap 中没有这个表时才使用 meta.name
-            if table_id and table_id not in table_map:
-                table_map[table_id] = table_name or table_id
-                
-            if table_id:
-                for field_id, field_def in table.get('fieldMap', {}).items():
-                    field_name = field_def.get('name') or field_id
-                    field_map[(table_id, field_id)] = field_name
-
-    return table_map, field_map, all_tables
+    registry = NameRegistry.from_snapshot(snapshot)
+    return registry.table_map, registry.field_map, registry.all_tables
 
 
 def get_table_name(table_id, table_map):
@@ -93,7 +49,7 @@ def get_table_name(table_id, table_map):
     if name:
         return name
     # 对于找不到的表，返回友好标记但包含ID
-    return f"[已删除的表:{table_id}]"
+    return completeness_sink.record('已删除引用', table_id, f"[已删除的表:{table_id}]")
 
 
 def get_field_name(table_id, field_id, field_map):
@@ -101,43 +57,30 @@ def get_field_name(table_id, field_id, field_map):
     if not field_id:
         return "未知字段"
     
-    # 先尝试精确匹配
-    name = field_map.get((table_id, field_id))
+    # 先尝试精确匹配，再尝试只用字段ID匹配（跨表引用场景）
+    name = field_map.lookup(table_id, field_id)
     if name:
         return name
     
-    # 再尝试只用字段ID匹配（跨表引用场景）
-    for (tid, fid), fname in field_map.items():
-        if fid == field_id:
-            return fname
-    
     # 找不到时返回友好标记但包含ID
-    return f"[已删除的字段:{field_id}]"
+    return completeness_sink.record('已删除引用', field_id, f"[已删除的字段:{field_id}]")
+
+
+def get_translator(table_map, field_map):
+    """返回绑定当前名称映射的公式翻译器；映射不变时复用，以共享翻译缓存"""
+    global _translator
+    if _translator is None or not _translator.bound_to(table_map, field_map):
+        _translator = FormulaTranslator(
+            table_map, field_map,
+            table_label=lambda tid: get_table_name(tid, table_map),
+            field_label=lambda current_tid, fid: get_field_name(current_tid, fid, field_map),
+        )
+    return _translator
 
 
 def translate_formula(formula, current_table_id, table_map, field_map):
-    """将公式中的 ID 翻译为可读格式"""
-    if not formula:
-        return ""
-    
-    # 替换表引用
-    def replace_table(match):
-        tid = match.group(1)
-        return f"「{get_table_name(tid, table_map)}」"
-    
-    formula = re.sub(r'bitable::\$table\[(.*?)\]', replace_table, formula)
-    
-    # 替换字段引用
-    def replace_field(match):
-        fid = match.group(1)
-        return f"「{get_field_name(current_table_id, fid, field_map)}」"
-    
-    formula = re.sub(r'\$(?:field|column)\[(.*?)\]', replace_field, formula)
-    
-    # 清理前缀
-    formula = formula.replace("bitable::", "")
-    
-    return formula
+    """将公式中的 ID 翻译为可读格式（带缓存，同一公式重复调用不会重复翻译）"""
+    return get_translator(table_map, field_map).translate(formula, current_table_id)
 
 
 def find_cross_table_references(formula, current_table_id):
@@ -145,16 +88,10 @@ def find_cross_table_references(formula, current_table_id):
     检查公式中是否引用了其他表。
     返回引用的表ID列表。
     """
-    if not formula:
-        return []
-    
-    # 提取所有表引用
-    table_refs = re.findall(r'bitable::\$table\[(.*?)\]', formula)
-    
-    # 过滤出外部表引用
-    external_refs = [tid for tid in table_refs if tid != current_table_id]
+    # 提取所有表引用，过滤出外部表引用（去重并保持出现顺序，保证输出稳定）
+    external_refs = [tid for tid in find_table_refs(formula) if tid != current_table_id]
     
-    return list(set(external_refs))
+    return list(dict.fromkeys(external_refs))
 
 
 def extract_filter_conditions(formula, current_table_id, table_map, field_map):
@@ -162,33 +99,38 @@ def extract_filter_conditions(formula, current_table_id, table_map, field_map):
     从公式中提取 FILTER 条件，返回可读的条件描述。
     例如: FILTER(CurrentValue.「字段A」=「表B」.「字段C」) -> 「字段A」 等于 「表B」.「字段C」
     """
-    if not formula:
-        return ""
-    
-    # 先翻译整个公式（将所有 ID 转为可读名称）
-    translated_formula = translate_formula(formula, current_table_id, table_map, field_map)
-    
-    # 查找 FILTER 中的条件
-    conditions = []
-    
-    # 提取 FILTER 内的条件表达式（从已翻译的公式提取）
-    filter_matches = re.findall(r'\.FILTER\((.*?)\)', translated_formula, re.DOTALL)
-    for filter_expr in filter_matches:
-        # 查找等于条件: CurrentValue.「字段名」=...
-        eq_matches = re.findall(r'CurrentValue\.「([^」]+)」\s*=\s*([^&\)]+)', filter_expr)
-        for left_fname, right_expr in eq_matches:
-            conditions.append(f"「{left_fname}」= {right_expr.strip()}")
-        
-        # 查找不等于条件: CurrentValue.「字段名」!="xxx"
-        neq_matches = re.findall(r'CurrentValue\.「([^」]+)」\s*!=\s*([^&\)]+)', filter_expr)
-        for left_fname, right_expr in neq_matches:
-            conditions.append(f"「{left_fname}」≠ {right_expr.strip()}")
+    def render(left_fid, op, right_expr):
+        left_fname = get_field_name(current_table_id, left_fid, field_map)
+        right_translated = translate_formula(right_expr, current_table_id, table_map, field_map)
+        if op == '!=':
+            return f"「{left_fname}」≠ {right_translated}"
+        return f"「{left_fname}」= {right_translated}"
     
+    conditions = filter_conditions(formula, render)
     if conditions:
         return "筛选条件: " + " 且 ".join(conditions)
     return ""
 
 
+def has_cross_table_relation(field_def, table_id):
+    """
+    判断字段是否会被 extract_relationships 收录为跨表关联。
+    只检查配置、不翻译公式，用于在写出正文前快速统计摘要。
+    """
+    field_type = field_def.get('type')
+    prop = field_def.get('property', {})
+    
+    if field_type == 20:
+        return bool(find_cross_table_references(prop.get('formula', ''), table_id))
+    if field_type == 19:
+        return bool(prop.get('filterInfo', {}).get('targetTable'))
+    if field_type in [18, 21]:
+        return bool(prop.get('tableId'))
+    if field_type in [3, 4]:
+        return bool(prop.get('optionsRule', {}).get('targetTable'))
+    return False
+
+
 def extract_relationships(table, table_id, table_map, field_map):
     """
     提取单个表中所有与外部表有关联的字段。
@@ -206,8 +148,10 @@ def extract_relationships(table, table_id, table_map, field_map):
     relationships = []
     field_map_data = table.get('fieldMap', {})
     
-    for field_id, field_def in field_map_data.items():
+    # 按字段名顺序提取（与 render_table 的输出顺序一致，完整性记录的先后也与文档一致）
+    for field_id, field_def in sorted(field_map_data.items(), key=lambda x: x[1].get('name', x[0])):
         field_name = field_def.get('name', field_id)
+        completeness_sink.locate(field=field_name)
         field_type = field_def.get('type')
         prop = field_def.get('property', {})
         
@@ -301,100 +245,158 @@ def extract_relationships(table, table_id, table_map, field_map):
     return relationships
 
 
-def generate_document(all_tables, table_map, field_map):
-    """生成关联关系图 Markdown 文档"""
+def render_table(table, table_id, table_map, field_map, relationships):
+    """渲染单张表的关联关系 Markdown 片段"""
+    table_name = table_map.get(table_id, table_id)
+    
     lines = []
-    lines.append("# 关联关系图\n")
-    lines.append(f"> 生成时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-    lines.append(f"> 数据表总数: {len(all_tables)}\n\n")
+    lines.append(f"## 📊 {table_name}\n")
+    lines.append(f"- 表 ID: `{table_id}`\n")
+    lines.append(f"- 对外关联字段数: {len(relationships)}\n\n")
     
-    lines.append("本文档列出了系统中所有具有 **跨表关联** 的字段，包括：\n")
-    lines.append("- **公式关联**: 通过公式引用其他表的数据进行计算\n")
-    lines.append("- **查找引用**: 从关联记录中获取特定字段的值\n")
-    lines.append("- **选项同步**: 下拉选项从其他表字段动态获取\n")
-    lines.append("- **记录关联**: 与其他表建立记录级别的关联\n\n")
+    lines.append("| 字段名称 | 关联类型 | 目标表 | 目标字段 | 逻辑说明 |\n")
+    lines.append("| :--- | :--- | :--- | :--- | :--- |\n")
     
-    total_relationships = 0
-    tables_with_relations = 0
+    for rel in sorted(relationships, key=lambda x: x['field_name']):
+        logic = rel['logic']
+        if rel['formula']:
+            # 添加可展开的公式详情
+            formula_clean = rel['formula'].replace('\n', ' ').replace('|', '\\|')
+            if len(formula_clean) > 100:
+                logic += f"<br><details><summary>查看完整公式</summary>`{formula_clean}`</details>"
+            else:
+                logic += f"<br>公式: `{formula_clean}`"
+        
+        lines.append(f"| **{rel['field_name']}** | {rel['relation_type']} | {rel['target_table']} | {rel['target_field']} | {logic} |\n")
     
+    lines.append("\n---\n\n")
+    return "".join(lines)
+
+
+def render_table_section(table, table_map, field_map):
+    """提取并渲染单张表的关联关系；没有跨表关联的表返回空字符串"""
+    table_id = table.get('meta', {}).get('id')
+    relationships = extract_relationships(table, table_id, table_map, field_map)
+    if not relationships:
+        return ""
+    return render_table(table, table_id, table_map, field_map, relationships)
+
+
+def write_document(out, all_tables, table_map, field_map, cache=None):
+    """
+    将关联关系图逐表写入 out（任意带 write() 的文本输出，如文件）。
+    统计摘要位于正文之前，先用 has_cross_table_relation 快速计数，
+    正文每渲染完一张表立即写出，内存占用只与单张表的大小有关。
+    cache: FragmentCache，命中缓存的表直接拼接缓存片段，只渲染有变化的表。
+    """
     # 按表名排序
     sorted_tables = sorted(all_tables, key=lambda t: table_map.get(t.get('meta', {}).get('id'), ''))
     
+    total_relationships = 0
+    tables_with_relations = 0
     for table in sorted_tables:
         table_id = table.get('meta', {}).get('id')
-        table_name = table_map.get(table_id, table_id)
-        
-        relationships = extract_relationships(table, table_id, table_map, field_map)
-        
-        if not relationships:
-            continue
-        
-        tables_with_relations += 1
-        total_relationships += len(relationships)
-        
-        lines.append(f"## 📊 {table_name}\n")
-        lines.append(f"- 表 ID: `{table_id}`\n")
-        lines.append(f"- 对外关联字段数: {len(relationships)}\n\n")
-        
-        lines.append("| 字段名称 | 关联类型 | 目标表 | 目标字段 | 逻辑说明 |\n")
-        lines.append("| :--- | :--- | :--- | :--- | :--- |\n")
-        
-        for rel in sorted(relationships, key=lambda x: x['field_name']):
-            logic = rel['logic']
-            if rel['formula']:
-                # 添加可展开的公式详情
-                formula_clean = rel['formula'].replace('\n', ' ').replace('|', '\\|')
-                if len(formula_clean) > 100:
-                    logic += f"<br><details><summary>查看完整公式</summary>`{formula_clean}`</details>"
-                else:
-                    logic += f"<br>公式: `{formula_clean}`"
-            
-            lines.append(f"| **{rel['field_name']}** | {rel['relation_type']} | {rel['target_table']} | {rel['target_field']} | {logic} |\n")
-        
-        lines.append("\n---\n\n")
+        count = sum(1 for field_def in table.get('fieldMap', {}).values()
+                    if has_cross_table_relation(field_def, table_id))
+        if count:
+            tables_with_relations += 1
+            total_relationships += count
     
-    # 添加统计摘要到开头
-    summary = f"**统计摘要**: 共 {tables_with_relations} 张表存在跨表关联，涉及 {total_relationships} 个关联字段。\n\n"
-    lines.insert(4, summary)
+    out.write("# 关联关系图\n")
+    out.write(f"> 生成时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    out.write(f"> 数据表总数: {len(all_tables)}\n\n")
     
-    return "".join(lines)
-
-
-def main():
-    print("=" * 50)
-    print("关联关系图生成器")
-    print("=" * 50)
+    out.write("本文档列出了系统中所有具有 **跨表关联** 的字段，包括：\n")
+    out.write(f"**统计摘要**: 共 {tables_with_relations} 张表存在跨表关联，涉及 {total_relationships} 个关联字段。\n\n")
+    out.write("- **公式关联**: 通过公式引用其他表的数据进行计算\n")
+    out.write("- **查找引用**: 从关联记录中获取特定字段的值\n")
+    out.write("- **选项同步**: 下拉选项从其他表字段动态获取\n")
+    out.write("- **记录关联**: 与其他表建立记录级别的关联\n\n")
     
-    # 读取文件
-    print(f"\n[1/4] 读取文件: {FILE_PATH}")
-    try:
-        with open(FILE_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception as e:
-        print(f"❌ 文件读取失败: {e}")
-        return
+    def render_many(indices):
+        for i in indices:
+            table_id = sorted_tables[i].get('meta', {}).get('id')
+            start = time.perf_counter()
+            with completeness_sink.capture(table=table_map.get(table_id, table_id)) as records:
+                fragment = render_table_section(sorted_tables[i], table_map, field_map)
+            profiling.record_item("渲染表", table_id, time.perf_counter() - start)
+            yield fragment, records
     
+    for fragment, _, records in splice(sorted_tables, cache, render_many,
+                                       text_of=lambda r: r[0], records_of=lambda r: r[1]):
+        completeness_sink.add(records, fragment)
+        out.write(fragment)
+
+
+def generate_document(all_tables, table_map, field_map):
+    """生成关联关系图 Markdown 文档（返回完整字符串）"""
+    buf = io.StringIO()
+    write_document(buf, all_tables, table_map, field_map)
+    return buf.getvalue()
+
+
+def run(doc, output_path=OUTPUT_PATH, cache_dir=None):
+    """
+    基于已加载的 BaseDocument 生成关联关系图，成功返回 True。
+    cache_dir: 片段缓存目录，指定后只重新渲染内容有变化的表。
+    """
     # 解压快照
     print("[2/4] 解压快照数据...")
-    snapshot = decompress_content(data.get('gzipSnapshot'))
+    snapshot = doc.snapshot
     if not snapshot:
         print("❌ 快照解压失败")
-        return
+        return False
     
     # 构建名称映射
     print("[3/4] 构建名称映射...")
-    table_map, field_map, all_tables = build_name_registry(snapshot)
+    registry = doc.registry
+    table_map, field_map, all_tables = registry.table_map, registry.field_map, registry.all_tables
     print(f"    - 发现 {len(table_map)} 张表")
     print(f"    - 发现 {len(field_map)} 个字段")
+    if registry.selected is not None:
+        print(f"    - 限定范围: {len(all_tables)} 张表（连同引用涉及的表共注册 {len(registry.loaded)} 张表的字段）")
     
-    # 生成文档
+    # 生成文档，边渲染边写入文件
     print("[4/4] 生成文档...")
-    document = generate_document(all_tables, table_map, field_map)
+    cache = FragmentCache(cache_dir, "关联关系图", table_map, field_map) if cache_dir else None
+    with profiling.stage("生成文档"), open(output_path, 'w', encoding='utf-8') as f:
+        out = profiling.timed_writer(completeness_sink.tracking_writer(f, output_path))
+        write_document(out, all_tables, table_map, field_map, cache)
+    if cache:
+        cache.prune()
+        print(f"    - {cache.summary()}")
+    
+    print(f"\n✅ 成功生成: {output_path}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="关联关系图生成器")
+    parser.add_argument("--cache-dir", help="片段缓存目录，指定后只重新渲染内容有变化的表，同时缓存解压后的数据（.base 未变化时跳过解压）")
+    parser.add_argument("--tables", help="只生成指定的表（逗号分隔的表名或表 ID），其引用涉及的表只用于名称解析")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    
+    print("=" * 50)
+    print("关联关系图生成器")
+    print("=" * 50)
     
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        f.write(document)
+    with profiling.session(profiling.report_path(args), args.cprofile):
+        # 读取文件
+        print(f"\n[1/4] 读取文件: {FILE_PATH}")
+        try:
+            doc = BaseDocument.load(FILE_PATH, cache_dir=args.cache_dir)
+        except Exception as e:
+            print(f"❌ 文件读取失败: {e}")
+            return
+        if args.tables:
+            try:
+                doc.select_tables(parse_table_list(args.tables))
+            except ValueError as e:
+                print(f"❌ {e}")
+                return
     
-    print(f"\n✅ 成功生成: {OUTPUT_PATH}")
+        run(doc, cache_dir=args.cache_dir)
     print("=" * 50)
 
 
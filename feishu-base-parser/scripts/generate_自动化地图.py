@@ -10,20 +10,43 @@
 - 显示启用/禁用状态
 - 深度解析每个步骤的判断逻辑和条件
 - 显示修改的字段和具体值
+- 支持 --jobs 多进程并行解析工作流，输出顺序不变
+- 打印每个工作流的解析耗时汇总，便于定位异常缓慢的工作流
+- 支持 --cache-dir 增量生成（只重新解析有变化的工作流）
+- 支持 --cost 静态估算每个工作流单次触发的最坏记录操作数，并标出扇出热点
+- 支持 --tables 只收录涉及指定表的工作流
+
+用法：
+    python3 scripts/generate_自动化地图.py [--jobs N] [--slowest N] [--cache-dir DIR] [--cost] [--tables 表A,表B]
 
 输出：自动化地图.md
 """
 
+import argparse
 import json
-import base64
-import gzip
-import io
 import datetime
-import re
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import completeness_sink
+import profiling
+from base_loader import BaseDocument, parse_table_list, resolve_jobs
+from fragment_cache import FragmentCache, splice
+from name_registry import FieldMap, NameRegistry, WorkflowRefs
 
 # ========== 配置 ==========
 FILE_PATH = "【演示】成品布管理系统.base"
 OUTPUT_PATH = "自动化工作流.md"
+SLOWEST_COUNT = 10  # 耗时汇总中列出的最慢工作流个数
+
+# 执行成本估算（--cost）的假定值：静态分析无法得知真实记录数
+COST_TABLE_ROWS = 5000  # 无条件查找时假定返回的全表记录数
+COST_MATCHED_ROWS = 100  # 带条件查找时假定命中的记录数
+COST_HOTSPOT_OPS = 1000  # 单次触发估算的记录操作数超过该值即标记为热点
+
+# 并行解析时子进程持有的数据 (workflows, table_map, field_map, option_map, block_map)，见 _init_worker
+_worker_state = None
 
 # 操作符翻译 (包含 snake_case 和 camelCase 两种格式)
 OPERATORS = {
@@ -90,91 +113,34 @@ TRIGGER_TYPES = {
 }
 
 
-def decompress_content(compressed_content):
-    """解压 gzip 压缩的数据 (支持 int列表 或 Base64字符串)"""
-    if not compressed_content:
-        return None
-        
-    # 情况1: List of integers
-    if isinstance(compressed_content, list):
-        try:
-            compressed_bytes = bytes(compressed_content)
-            with gzip.GzipFile(fileobj=io.BytesIO(compressed_bytes)) as gz:
-                return json.loads(gz.read().decode('utf-8'))
-        except Exception as e:
-            # print(f"List解压失败: {e}")
-            pass
+# 记录类触发器的触发来源（triggerControlList）；这些来源都是批量写入
+TRIGGER_SOURCES = {
+    'pasteUpdate': '粘贴更新',
+    'automationBatchUpdate': '自动化批量更新',
+    'appendImport': '追加导入',
+    'openAPIBatchUpdate': 'API批量更新'
+}
 
-    # 情况2: Base64 String
-    if isinstance(compressed_content, str):
-        try:
-            import base64
-            decoded = base64.b64decode(compressed_content)
-            with gzip.GzipFile(fileobj=io.BytesIO(decoded)) as gz:
-                return json.loads(gz.read().decode('utf-8'))
-        except Exception as e:
-            # print(f"Base64解压失败: {e}")
-            pass
-            
-    return None
+
+def translate_operator(op):
+    """翻译操作符；不在 OPERATORS 中的原样返回，并登记为未翻译操作符"""
+    name = OPERATORS.get(op)
+    if name is None:
+        return completeness_sink.record('未翻译操作符', op, op) if op else op
+    return name
 
 
 def build_name_registry(snapshot):
     """从快照中构建表名和字段名的映射表"""
-    table_map = {}
-    field_map = {}
-    option_map = {}  # (table_id, field_id, option_id) -> option_name
-
-    for item in snapshot:
-        if 'schema' not in item:
-            continue
-        
-        schema = item['schema']
-        
-        # 首先从 tableMap 获取表名（这里通常有完整的表名）
-        for tid, tinfo in schema.get('tableMap', {}).items():
-            if isinstance(tinfo, dict) and tinfo.get('name'):
-                table_map[tid] = tinfo['name']
-        
-        # 然后处理 data 中的表结构
-        if 'data' not in schema:
-            continue
-            
-        data = schema['data']
-        tables = data.get('tables', [])
-        if 'table' in data:
-            tables.append(data['table'])
-        
-        for table in tables:
-            if not isinstance(table, dict):
-                continue
-            
-            table_id = table.get('meta', {}).get('id')
-            table_name = table.get('meta', {}).get('name')
-            
-            # 只有当 tableMap 中没有这个表时才使用 meta.name
-            if table_id and table_id not in table_map:
-                table_map[table_id] = table_name or table_id
-                
-            if table_id:
-                for field_id, field_def in table.get('fieldMap', {}).items():
-                    field_name = field_def.get('name') or field_id
-                    field_map[(table_id, field_id)] = field_name
-                    
-                    # 提取选项 - 使用简单的 opt_id 作为键（选项ID全局唯一）
-                    for opt in field_def.get('property', {}).get('options', []):
-                        opt_id = opt.get('id')
-                        opt_name = opt.get('name')
-                        if opt_id:
-                            option_map[opt_id] = opt_name
-                            
-    return table_map, field_map, option_map
+    registry = NameRegistry.from_snapshot(snapshot)
+    return registry.table_map, registry.field_map, registry.option_map
 
 
 def resolve_table_id(ref_id, wf_table_map, global_table_map):
     """
     解析工作流中的表引用ID到实际表名。
     工作流中常用 ref_tblXXX 格式，需要通过 Extra.TableMap 映射到实际 ID。
+    wf_table_map: 编译后的 WorkflowRefs（也接受原始 TableMap）。
     """
     if not ref_id:
         return "未知表"
@@ -184,8 +150,8 @@ def resolve_table_id(ref_id, wf_table_map, global_table_map):
         ref_id = ref_id.strip('"').strip('\\"')
     
     # 先检查工作流的映射表
-    if wf_table_map and ref_id in wf_table_map:
-        real_id = wf_table_map[ref_id].get('TableID', '').strip('"')
+    real_id = compile_refs(wf_table_map).table_id(ref_id)
+    if real_id is not None:
         if real_id in global_table_map:
             return global_table_map[real_id]
         return real_id if real_id else ref_id
@@ -194,66 +160,33 @@ def resolve_table_id(ref_id, wf_table_map, global_table_map):
     if ref_id in global_table_map:
         return global_table_map[ref_id]
     
-    return f"[已删除的表:{ref_id}]"
+    return completeness_sink.record('已删除引用', ref_id, f"[已删除的表:{ref_id}]")
 
 
 def resolve_field_id(ref_fid, wf_table_map, field_map):
-    """解析工作流中的字段引用ID到实际字段名"""
+    """
+    解析工作流中的字段引用ID到实际字段名。
+    wf_table_map: 编译后的 WorkflowRefs（也接受原始 TableMap），解析结果按引用 ID 缓存在其中。
+    """
     if not ref_fid:
         return "未知字段"
     
     if isinstance(ref_fid, str):
         ref_fid = ref_fid.strip('"')
     
-    # 处理 ref_ref_tblXXXX_fldYYYY 或 ref_tblXXXX_fldYYYY 格式
-    if isinstance(ref_fid, str) and (ref_fid.startswith('ref_ref_tbl') or ref_fid.startswith('ref_tbl')):
-        # 提取 tblXXXXX 和 fldYYYYY
-        import re
-        # 匹配 ref_tbl 或 ref_ref_tbl
-        match = re.search(r'(tbl[^_]+)_(fld.+)', ref_fid)
-        if match:
-            real_tid = match.group(1)
-            real_fid = match.group(2)
-            
-            # 1. 尝试从 wf_table_map 查找真实表ID (如果是 ref_tbl 引用)
-            # 构造 ref_tblXXX key
-            ref_key = f"ref_{real_tid}"
-            if wf_table_map and ref_key in wf_table_map:
-                mapped_tid = wf_table_map[ref_key].get('TableID', '').strip('"')
-                fname = field_map.get((mapped_tid, real_fid))
-                if fname:
-                    return fname
-            
-            # 2. 直接尝试全局查找 (假设 real_tid 就是真实 ID)
-            fname = field_map.get((real_tid, real_fid))
-            if fname:
-                return fname
-            
-            if fname:
-                return fname
-            
-            # 3. 忽略表ID，只匹配字段ID (兜底)
-            for (tid, fid), name in field_map.items():
-                if fid == real_fid:
-                    return name
-    
-    # 尝试从映射表中解析 (原有逻辑)
-    for ref_tid, info in (wf_table_map or {}).items():
-        field_mapping = info.get('FieldMap', {})
-        if ref_fid in field_mapping:
-            real_fid = field_mapping[ref_fid]
-            real_tid = info.get('TableID', '').strip('"')
-            fname = field_map.get((real_tid, real_fid))
-            if fname:
-                return fname
-    
-    # 直接查找
-    for (tid, fid), name in field_map.items():
-        if fid == ref_fid:
-            return name
+    fname = compile_refs(wf_table_map, field_map).field_name(ref_fid)
+    if fname:
+        return fname
     
     # 找不到时返回友好标记但包含ID
-    return f"[已删除的字段:{ref_fid}]"
+    return completeness_sink.record('已删除引用', ref_fid, f"[已删除的字段:{ref_fid}]")
+
+
+def compile_refs(wf_table_map, field_map=None):
+    """原始 TableMap 编译为 WorkflowRefs；已编译的直接返回"""
+    if isinstance(wf_table_map, WorkflowRefs):
+        return wf_table_map
+    return WorkflowRefs(wf_table_map, field_map if field_map is not None else FieldMap())
 
 
 def parse_condition(condition, wf_table_map, table_map, field_map, option_map):
@@ -266,7 +199,7 @@ def parse_condition(condition, wf_table_map, table_map, field_map, option_map):
     value = condition.get('value') or condition.get('matchValue', {}).get('value')
     
     field_name = resolve_field_id(field_id, wf_table_map, field_map)
-    op_name = OPERATORS.get(operator, operator)
+    op_name = translate_operator(operator)
     
     # 处理值
     if isinstance(value, dict) and value.get('type') == 'ref':
@@ -310,7 +243,7 @@ def parse_trigger_filter_condition(condition_obj, wf_table_map, field_map, optio
             field_name = resolve_field_id(field_id, wf_table_map, field_map)
             
             # 翻译操作符
-            op_name = OPERATORS.get(operator, operator)
+            op_name = translate_operator(operator)
             
             # 处理值
             if isinstance(value, list):
@@ -380,9 +313,9 @@ def parse_field_values(values, wf_table_map, field_map, option_map):
                             ref_field_name = resolve_field_id(ref_field_id, wf_table_map, field_map)
                             value_str = f"[步骤{step_num}的「{ref_field_name}」]"
                         else:
-                            value_str = f"[步骤{step_num}的结果]"
+                            value_str = completeness_sink.record('模糊引用', step_num, f"[步骤{step_num}的结果]")
                     else:
-                        value_str = f"[步骤{step_num}的结果]"
+                        value_str = completeness_sink.record('模糊引用', step_num, f"[步骤{step_num}的结果]")
                 elif value[0].get('type') == 'ref' and value[0].get('tagType') == 'loop':
                     # 循环引用
                     step_num = value[0].get('stepNum', '?')
@@ -393,9 +326,9 @@ def parse_field_values(values, wf_table_map, field_map, option_map):
                             ref_field_name = resolve_field_id(ref_field_id, wf_table_map, field_map)
                             value_str = f"[步骤{step_num}循环的「{ref_field_name}」]"
                         else:
-                             value_str = f"[步骤{step_num}的循环当前记录]"
+                             value_str = completeness_sink.record('模糊循环', step_num, f"[步骤{step_num}的循环当前记录]")
                     else:
-                        value_str = f"[步骤{step_num}的循环当前记录]"
+                        value_str = completeness_sink.record('模糊循环', step_num, f"[步骤{step_num}的循环当前记录]")
                 else:
                     value_str = str(value)
             else:
@@ -476,7 +409,8 @@ def format_value(value, option_map=None, depth=0, wf_table_map=None, field_map=N
                             fn = resolve_field_id(field_id, wf_table_map, field_map)
                             field_name_desc = f"的「{fn}」"
                         else:
-                            field_name_desc = f"的[未知字段:{field_id}]"
+                            field_name_desc = "的" + completeness_sink.record(
+                                '显式未知项', field_id, f"[未知字段:{field_id}]")
 
             # 尝试从 path 中提取字段 (用于 Loop 等场景)
             if not field_name_desc:
@@ -490,7 +424,8 @@ def format_value(value, option_map=None, depth=0, wf_table_map=None, field_map=N
                                     fn = resolve_field_id(fid, wf_table_map, field_map)
                                     field_name_desc = f"的「{fn}」"
                                 else:
-                                    field_name_desc = f"的[未知字段:{fid}]"
+                                    field_name_desc = "的" + completeness_sink.record(
+                                        '显式未知项', fid, f"[未知字段:{fid}]")
                                 break
                         elif isinstance(p, dict) and p.get('type') == 'RecordAttr':
                             attr = p.get('value', '')
@@ -526,15 +461,20 @@ def format_value(value, option_map=None, depth=0, wf_table_map=None, field_map=N
             if tag == 'loop':
                 if field_name_desc:
                     return f"[步骤{step}循环{field_name_desc}]"
-                return f"[步骤{step}的循环当前记录]"
+                return completeness_sink.record('模糊循环', step, f"[步骤{step}的循环当前记录]")
             
             if field_name_desc:
                 return f"[步骤{step}{field_name_desc}]"
-                
+            
+            if tag_desc in ('字段', 'formula', '结果'):
+                return completeness_sink.record('模糊引用', step, f"[步骤{step}的{tag_desc}]")
             return f"[步骤{step}的{tag_desc}]"
             
         items = []
         for k, v in value.items():
+            if k == 'operator' and isinstance(v, str) and v:
+                # 原样输出的条件对象中的操作符没有翻译
+                completeness_sink.record('未翻译操作符', v, v, anchor=f"{k}: {v}")
             items.append(f"{k}: {format_value(v, option_map, depth+1, wf_table_map, field_map)}")
         return "{ " + ", ".join(items) + " }"
         
@@ -577,7 +517,7 @@ def parse_step(step, wf_table_map, table_map, field_map, option_map, step_id_map
                 fname = resolve_field_id(fid, wf_table_map, field_map)
                 op = f.get('operator', '')
                 value = f.get('value', [])
-                op_name = OPERATORS.get(op, op)  # 使用全局操作符翻译表
+                op_name = translate_operator(op)  # 使用全局操作符翻译表
                 if op in ['isEmpty', 'isNotEmpty']:
                     cond_parts.append(f"「{fname}」{op_name}")
                 else:
@@ -600,13 +540,7 @@ def parse_step(step, wf_table_map, table_map, field_map, option_map, step_id_map
         trigger_list = step_data.get('triggerControlList', [])
         processed_keys.add('triggerControlList')
         if trigger_list:
-            trigger_map = {
-                'pasteUpdate': '粘贴更新',
-                'automationBatchUpdate': '自动化批量更新',
-                'appendImport': '追加导入',
-                'openAPIBatchUpdate': 'API批量更新'
-            }
-            triggers = [trigger_map.get(t, t) for t in trigger_list]
+            triggers = [TRIGGER_SOURCES.get(t, t) for t in trigger_list]
             lines.append(f"{indent}  - 触发来源: {', '.join(triggers)}")
     
     # AddRecordTrigger
@@ -622,13 +556,7 @@ def parse_step(step, wf_table_map, table_map, field_map, option_map, step_id_map
             lines.append(f"{indent}  - 监听字段: 「{fname}」")
             
         if trigger_list:
-            trigger_map = {
-                'pasteUpdate': '粘贴更新',
-                'automationBatchUpdate': '自动化批量更新',
-                'appendImport': '追加导入',
-                'openAPIBatchUpdate': 'API批量更新'
-            }
-            triggers = [trigger_map.get(t, t) for t in trigger_list]
+            triggers = [TRIGGER_SOURCES.get(t, t) for t in trigger_list]
             lines.append(f"{indent}  - 触发来源: {', '.join(triggers)}")
     
     # ============ 通用触发条件处理 (next.condition) ============
@@ -859,7 +787,10 @@ def parse_step(step, wf_table_map, table_map, field_map, option_map, step_id_map
                             #     val_text = val_text[:2000] + "...(过长截断)"
                         else:
                             val_text = format_value(val, option_map, 0, wf_table_map, field_map)
-                            
+                        
+                        if '"{引用}"' in val_text:
+                            # 动作配置中的引用只剩下占位符，原引用信息已丢失
+                            completeness_sink.record('模糊动作配置', label, '"{引用}"')
                         lines.append(f"{indent}    - {label}: {val_text}")
             else:
                 form_str = str(form_data)
@@ -927,7 +858,7 @@ def parse_if_else_condition(condition_obj, wf_table_map, table_map, field_map, o
             left_desc = parse_value_ref(left, wf_table_map, field_map)
             
             # 解析操作符 (使用全局 OPERATORS 字典)
-            op_desc = OPERATORS.get(op, op)
+            op_desc = translate_operator(op)
             
             # 解析右值
             right_desc = parse_right_value(right)
@@ -981,7 +912,7 @@ def parse_value_ref(value_obj, wf_table_map, field_map):
             field_id = fields[0].get('fieldId', '')
             field_name = resolve_field_id(field_id, wf_table_map, field_map)
             return f"[步骤{step_num}的「{field_name}」]"
-        return f"[步骤{step_num}的结果]"
+        return completeness_sink.record('模糊引用', step_num, f"[步骤{step_num}的结果]")
     
     # 直接字段引用
     fields = value_obj.get('fields', [])
@@ -1011,28 +942,32 @@ def parse_right_value(right_value):
     return str(right_value)
 
 
-def parse_workflow(wf_item, table_map, field_map, option_map, block_map):
-    """解析单个工作流，返回 Markdown 格式的描述"""
-    lines = []
-    
-    # 获取 WorkflowExtra
-    extra = wf_item.get('WorkflowExtra', {})
-    draft_str = extra.get('Draft', '{}')
-    
+def load_draft(wf_item):
+    """解析工作流的 Draft（JSON 字符串）；解析失败返回 {}"""
+    draft_str = wf_item.get('WorkflowExtra', {}).get('Draft', '{}')
     try:
-        draft = json.loads(draft_str) if isinstance(draft_str, str) else draft_str
+        return json.loads(draft_str) if isinstance(draft_str, str) else draft_str
     except:
-        draft = {}
-    
-    
-    if not isinstance(draft, dict):
-        return lines
-    
-    # 获取工作流的表映射
-    wf_table_map = extra.get('Extra', {}).get('TableMap', {})
-    
-    # 工作流基本信息
-    wf_id = wf_item.get('id', '未知')
+        return {}
+
+
+def iter_step_lines(steps, wf_table_map, table_map, field_map, option_map):
+    """按顺序产出每个步骤的 (step, Markdown 行列表)"""
+    # 建立步骤ID到序号的映射
+    step_id_map = {}
+    for i, step in enumerate(steps):
+        if step.get('id'):
+            step_id_map[step.get('id')] = i + 1
+    
+    for i, step in enumerate(steps):
+        completeness_sink.locate(step=i + 1)
+        yield step, parse_step(step, wf_table_map, table_map, field_map, option_map, step_id_map, step_index=i+1)
+
+
+def workflow_title(wf_id, draft, wf_table_map, table_map, block_map):
+    """
+    工作流标题：草稿标题 → 侧边栏名称 (block_map) → 根据触发器生成的描述性标题。
+    """
     title = draft.get('title')
     
     # 优先使用侧边栏名称 (block_map)
@@ -1065,6 +1000,31 @@ def parse_workflow(wf_item, table_map, field_map, option_map, block_map):
                 title = f"{ACTION_TYPES.get(stype, stype)} (「{tname}」)"
         else:
             title = "未命名工作流"
+    return title
+
+
+def parse_workflow(wf_item, table_map, field_map, option_map, block_map, draft=None):
+    """
+    解析单个工作流，返回 (标题, Markdown 行列表)；Draft 无法解析时为 ("", [])。
+    draft: 已解析的 Draft（不传则从 wf_item 解析）
+    """
+    lines = []
+    
+    # 获取 WorkflowExtra
+    extra = wf_item.get('WorkflowExtra', {})
+    if draft is None:
+        draft = load_draft(wf_item)
+    
+    if not isinstance(draft, dict):
+        return "", lines
+    
+    # 获取工作流的表映射，编译为引用解析表（每个引用只解析一次）
+    wf_table_map = WorkflowRefs(extra.get('Extra', {}).get('TableMap', {}), field_map)
+    
+    # 工作流基本信息
+    wf_id = wf_item.get('id', '未知')
+    title = workflow_title(wf_id, draft, wf_table_map, table_map, block_map)
+    completeness_sink.locate(workflow=title)
     
     status = wf_item.get('status', 0)
     # 飞书中 status=1 表示启用
@@ -1079,45 +1039,344 @@ def parse_workflow(wf_item, table_map, field_map, option_map, block_map):
     # 解析步骤
     steps = draft.get('steps', [])
     if steps:
-        # 建立步骤ID到序号的映射
-        step_id_map = {}
-        for i, step in enumerate(steps):
-             if step.get('id'):
-                 step_id_map[step.get('id')] = i + 1
-        
         lines.append("- **执行逻辑**:")
-        for i, step in enumerate(steps):
-            step_lines = parse_step(step, wf_table_map, table_map, field_map, option_map, step_id_map, step_index=i+1)
+        for step, step_lines in iter_step_lines(steps, wf_table_map, table_map, field_map, option_map):
             lines.extend(step_lines)
     
     lines.append("\n---\n")
-    return lines
+    return title, lines
 
 
-def generate_document(workflows, table_map, field_map, option_map, block_map):
-    """生成自动化地图 Markdown 文档"""
-    # print(f"DEBUG: generate_document -> field_map size: {len(field_map)}")
-    document = []
-    document.append("# 自动化地图\n")
-    document.append(f"> 生成时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-    document.append(f"> 工作流总数: {len(workflows)}\n\n")
+def _timed_parse(wf_item, table_map, field_map, option_map, block_map, cost=False):
+    """
+    解析单个工作流，返回 (lines, 标题, 耗时秒数, 完整性记录, 成本估算)。
+    cost 为真时用同一份 Draft 估算执行成本（见 workflow_cost），否则成本估算为 None。
+    """
+    start = time.perf_counter()
+    draft = load_draft(wf_item)
+    with completeness_sink.capture(workflow_id=wf_item.get('id', '未知')) as records:
+        title, lines = parse_workflow(wf_item, table_map, field_map, option_map, block_map, draft)
+    elapsed = time.perf_counter() - start
+    estimate = workflow_cost(wf_item, table_map, field_map, block_map, draft, title) if cost else None
+    return lines, title, elapsed, records, estimate
+
+
+def _init_worker(workflows, table_map, field_map, option_map, block_map, cost):
+    """子进程初始化：保存工作流列表和名称映射（fork 时直接继承，无需逐个序列化）"""
+    global _worker_state
+    _worker_state = (workflows, table_map, field_map, option_map, block_map, cost)
+
+
+def _parse_workflow_at(index):
+    """子进程：解析第 index 个工作流"""
+    workflows, table_map, field_map, option_map, block_map, cost = _worker_state
+    return _timed_parse(workflows[index], table_map, field_map, option_map, block_map, cost)
+
+
+def iter_parsed_workflows(workflows, table_map, field_map, option_map, block_map, jobs=1, cost=False):
+    """
+    按顺序产出每个工作流的 (lines, 标题, 耗时秒数, 完整性记录, 成本估算)。
+    jobs > 1 时由进程池并行解析，结果仍按 workflows 的顺序产出，与串行输出完全一致。
+    cost: 为真时顺带估算执行成本（每个 Draft 只解析一次）。
+    """
+    if jobs <= 1 or len(workflows) < 2:
+        for wf in workflows:
+            yield _timed_parse(wf, table_map, field_map, option_map, block_map, cost)
+        return
+    
+    chunksize = max(1, len(workflows) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(workflows, table_map, field_map, option_map, block_map, cost)) as executor:
+        yield from executor.map(_parse_workflow_at, range(len(workflows)), chunksize=chunksize)
+
+
+def write_document(out, workflows, table_map, field_map, option_map, block_map, jobs=1, timings=None,
+                   cache=None, costs=None):
+    """
+    将自动化地图逐个工作流写入 out（任意带 write() 的文本输出，如文件）。
+    每解析完一个工作流立即写出，内存占用只与单个工作流的大小有关。
+    jobs > 1 时并行解析各工作流，输出顺序不变。
+    timings: 传入列表时，按顺序追加每个重新解析的工作流的 (工作流ID, 标题, 耗时秒数)。
+    cache: FragmentCache，命中缓存的工作流直接拼接缓存片段，只解析有变化的工作流。
+    costs: 传入列表时，按顺序追加每个工作流的 (工作流, 标题, 成本估算)，并在文末追加执行成本估算章节；
+    重新解析的工作流在解析时顺带估算，命中缓存的工作流单独估算。
+    """
+    header = []
+    header.append("# 自动化地图\n")
+    header.append(f"> 生成时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    header.append(f"> 工作流总数: {len(workflows)}\n\n")
     
     # 飞书中 status=1 表示启用
     enabled_count = sum(1 for wf in workflows if wf.get('status') == 1)
     disabled_count = len(workflows) - enabled_count
-    document.append(f"- 已启用: {enabled_count} 个\n")
-    document.append(f"- 已禁用: {disabled_count} 个\n")
-    document.append("\n---\n")
-    
-    document.append("\n> **🔍 如何对应飞书界面？**")
-    document.append("> 1. **看名字**：文档已读取飞书侧边栏的真实名称，与界面完全一致。")
-    document.append("> 2. **看 ID**：如果需要精确排查，可参考自动化 ID。")
-    
-    for wf in workflows:
-        wf_lines = parse_workflow(wf, table_map, field_map, option_map, block_map)
-        document.extend(wf_lines)
-    
-    return "\n".join(document)
+    header.append(f"- 已启用: {enabled_count} 个\n")
+    header.append(f"- 已禁用: {disabled_count} 个\n")
+    header.append("\n---\n")
+    
+    header.append("\n> **🔍 如何对应飞书界面？**")
+    header.append("> 1. **看名字**：文档已读取飞书侧边栏的真实名称，与界面完全一致。")
+    header.append("> 2. **看 ID**：如果需要精确排查，可参考自动化 ID。")
+    out.write("\n".join(header))
+    
+    def render_many(indices):
+        for lines, title, elapsed, records, estimate in iter_parsed_workflows(
+                [workflows[i] for i in indices], table_map, field_map, option_map, block_map, jobs,
+                cost=costs is not None):
+            # 各行之间以换行分隔（与整体 "\n".join 的结果一致）
+            yield "".join("\n" + line for line in lines), title, elapsed, records, estimate
+    
+    fragments = splice(workflows, cache, render_many, text_of=lambda r: r[0], records_of=lambda r: r[3])
+    for wf, (fragment, result, records) in zip(workflows, fragments):
+        completeness_sink.add(records, fragment)
+        out.write(fragment)
+        estimate = None
+        if result is not None:
+            _, title, elapsed, _, estimate = result
+            profiling.record_item("解析工作流", wf.get('id', '未知'), elapsed)
+            if timings is not None:
+                timings.append((wf.get('id', '未知'), title, elapsed))
+        if costs is not None:
+            if estimate is None:
+                estimate = workflow_cost(wf, table_map, field_map, block_map)
+            costs.append((wf,) + estimate)
+    if costs is not None:
+        out.write("\n" + "\n".join(cost_section(costs)) + "\n")
+
+
+def print_timing_summary(timings, slowest=SLOWEST_COUNT):
+    """打印工作流解析耗时汇总：总耗时、平均耗时和最慢的若干个工作流"""
+    if not timings:
+        return
+    total = sum(t[2] for t in timings)
+    print(f"    - 解析耗时: 合计 {total:.2f}s，平均 {total / len(timings) * 1000:.1f}ms/个")
+    if slowest <= 0:
+        return
+    print(f"    - 最慢的 {min(slowest, len(timings))} 个工作流:")
+    for wf_id, title, elapsed in sorted(timings, key=lambda t: t[2], reverse=True)[:slowest]:
+        print(f"      {elapsed * 1000:8.1f}ms  {wf_id}  {title}")
+
+
+# ========== 执行成本估算 ==========
+
+FIND_STEP_TYPES = ('FindRecordAction', 'FindRecord')
+UPDATE_STEP_TYPES = ('SetRecordAction', 'UpdateRecordAction', 'UpdateRecord')
+ADD_STEP_TYPES = ('AddRecordAction', 'AddRecord')
+RECORD_TRIGGER_TYPES = ('ChangeRecordTrigger', 'ChangeRecordNewSatisfyTrigger', 'SetRecordTrigger',
+                        'AddRecordTrigger')
+# 不读写记录的控制步骤
+CONTROL_STEP_TYPES = ('Loop', 'IfElseBranch')
+
+
+def _references_loop(node, loop_num):
+    """node 中是否引用了第 loop_num 步循环的当前项 ({"tagType": "loop", "stepNum": N})"""
+    if isinstance(node, dict):
+        if node.get('tagType') == 'loop' and node.get('stepNum') == loop_num:
+            return True
+        return any(_references_loop(v, loop_num) for v in node.values())
+    if isinstance(node, list):
+        return any(_references_loop(v, loop_num) for v in node)
+    return False
+
+
+def loop_bodies(steps):
+    """
+    {循环步骤下标: [循环体步骤下标, ...]}（下标从 0 开始）。
+    Draft 中只记录循环体的第一步 (startChildStepId)：循环体取这一步，
+    以及紧随其后、引用了该循环当前项的连续步骤。
+    """
+    index_of = {step.get('id'): i for i, step in enumerate(steps) if step.get('id')}
+    bodies = {}
+    for i, step in enumerate(steps):
+        if step.get('type') != 'Loop':
+            continue
+        start = index_of.get((step.get('data') or {}).get('startChildStepId'))
+        if start is None or start <= i:
+            continue
+        body = [start]
+        for j in range(start + 1, len(steps)):
+            if not _references_loop(steps[j], i + 1):
+                break
+            body.append(j)
+        bodies[i] = body
+    return bodies
+
+
+def _ref_rows(rows, ref, default):
+    """引用第 stepNum 步结果时的记录数"""
+    if isinstance(ref, dict) and isinstance(ref.get('stepNum'), int) and 0 < ref['stepNum'] <= len(rows):
+        return rows[ref['stepNum'] - 1] or default
+    return default
+
+
+def _capped(value, cap):
+    return min(value, cap) if isinstance(cap, int) and cap > 0 else value
+
+
+def estimate_workflow_cost(wf_item, draft=None):
+    """
+    静态估算一个工作流单次触发的最坏记录操作数。
+    返回 {'trigger', 'batch_sources', 'reads', 'writes', 'calls', 'total', 'hotspots', 'steps'}，
+    steps 为 [(步骤序号, 步骤类型, 执行次数, 记录操作数), ...]。
+    - 查找记录：无条件时按 COST_TABLE_ROWS 条、有条件时按 COST_MATCHED_ROWS 条计读取
+    - 循环：遍历引用步骤的记录（受 maxLoopTimes 限制），循环体内步骤的次数相乘（支持嵌套）
+    - 修改记录：修改某步找到的记录时按该步记录数计写入（受 maxSetRecordNum 限制），否则 1 条
+    - 新增记录计 1 次写入；其余动作（通知、自定义动作等）计 1 次调用
+    draft: 已解析的 Draft（不传则从 wf_item 解析）
+    """
+    if draft is None:
+        draft = load_draft(wf_item)
+    steps = draft.get('steps', []) if isinstance(draft, dict) else []
+    steps = [step for step in steps if isinstance(step, dict)]
+    bodies = loop_bodies(steps)
+
+    runs = [1] * len(steps)  # 每一步在单次触发中的执行次数
+    rows = [0] * len(steps)  # 每一步产出的记录数（查找结果 / 循环次数）
+    cost = {'trigger': None, 'batch_sources': [], 'reads': 0, 'writes': 0, 'calls': 0, 'total': 0,
+            'hotspots': [], 'steps': []}
+
+    for i, step in enumerate(steps):
+        step_type = step.get('type')
+        data = step.get('data') or {}
+        num = i + 1
+        reads = writes = calls = 0
+
+        if i == 0 and step_type in TRIGGER_TYPES:
+            cost['trigger'] = step_type
+            rows[i] = 1
+            if step_type in RECORD_TRIGGER_TYPES:
+                cost['batch_sources'] = [s for s in data.get('triggerControlList') or [] if s in TRIGGER_SOURCES]
+            continue
+
+        if step_type in FIND_STEP_TYPES:
+            record_info = data.get('recordInfo')
+            if data.get('recordType') == 'Ref' and isinstance(record_info, dict):
+                # 在之前某步的结果中筛选，不超过该步的记录数
+                source = {'stepNum': _step_num_of(steps, record_info.get('stepId'))}
+                found = min(_ref_rows(rows, source, COST_MATCHED_ROWS), COST_MATCHED_ROWS)
+            elif isinstance(record_info, dict) and record_info.get('conditions'):
+                found = COST_MATCHED_ROWS
+            else:
+                found = COST_TABLE_ROWS
+                cost['hotspots'].append(f"步骤 {num} 查找记录无条件，返回全表记录（假定 {COST_TABLE_ROWS} 条）")
+            rows[i] = found
+            reads = found
+
+        elif step_type == 'Loop':
+            max_times = data.get('maxLoopTimes')
+            if data.get('loopType') == 'times':
+                iterations = max_times if isinstance(max_times, int) and max_times > 0 else COST_MATCHED_ROWS
+            else:
+                iterations = _capped(_ref_rows(rows, data.get('loopData'), COST_MATCHED_ROWS), max_times)
+            if not (isinstance(max_times, int) and max_times > 0):
+                cost['hotspots'].append(f"步骤 {num} 循环未设置最大循环次数")
+            rows[i] = iterations
+            for j in bodies.get(i, []):
+                runs[j] = runs[i] * iterations
+
+        elif step_type in UPDATE_STEP_TYPES:
+            record_info = data.get('recordInfo')
+            if data.get('recordType') == 'stepRecord' or (isinstance(record_info, dict)
+                                                          and record_info.get('type') == 'ref'):
+                writes = _capped(_ref_rows(rows, record_info, 1), data.get('maxSetRecordNum'))
+            elif isinstance(record_info, dict) and record_info.get('conditions'):
+                writes = _capped(COST_MATCHED_ROWS, data.get('maxSetRecordNum'))
+            else:
+                writes = 1
+
+        elif step_type in ADD_STEP_TYPES:
+            writes = 1
+
+        elif step_type not in CONTROL_STEP_TYPES:
+            calls = 1
+
+        times = runs[i]
+        if times > 1 and (writes or reads):
+            kind, records = ("写入", writes) if writes else ("读取", reads)
+            cost['hotspots'].append(f"步骤 {num} {ACTION_TYPES.get(step_type, step_type)}位于循环内，"
+                                    f"执行 {times} 次，共{kind} {records * times} 条记录")
+        cost['reads'] += reads * times
+        cost['writes'] += writes * times
+        cost['calls'] += calls * times
+        cost['steps'].append((num, step_type, times, (reads + writes + calls) * times))
+
+    cost['total'] = cost['reads'] + cost['writes'] + cost['calls']
+    if cost['batch_sources'] and cost['writes']:
+        sources = "、".join(TRIGGER_SOURCES[s] for s in cost['batch_sources'])
+        cost['hotspots'].append(f"触发来源包含批量写入（{sources}）：一次批量修改 N 条记录会触发 N 次运行")
+    if cost['total'] > COST_HOTSPOT_OPS:
+        cost['hotspots'].insert(0, f"单次触发估算 {cost['total']} 次记录操作，超过 {COST_HOTSPOT_OPS}")
+    return cost
+
+
+def _step_num_of(steps, step_id):
+    """步骤 ID → 步骤序号（从 1 开始）；找不到返回 None"""
+    for i, step in enumerate(steps):
+        if step.get('id') == step_id:
+            return i + 1
+    return None
+
+
+def workflow_cost(wf_item, table_map, field_map, block_map, draft=None, title=None):
+    """
+    单个工作流的 (标题, 成本估算)。
+    draft / title: 解析时已得到的 Draft 和标题，传入时直接复用，不再重复解析。
+    """
+    if draft is None:
+        draft = load_draft(wf_item)
+    if not isinstance(draft, dict):
+        draft = {}
+    if not title:
+        refs = WorkflowRefs(wf_item.get('WorkflowExtra', {}).get('Extra', {}).get('TableMap', {}), field_map)
+        title = workflow_title(wf_item.get('id', '未知'), draft, refs, table_map, block_map)
+    return title, estimate_workflow_cost(wf_item, draft)
+
+
+def cost_section(costs):
+    """
+    执行成本估算章节（Markdown 行列表）：按单次触发的估算操作数从高到低排列。
+    costs: [(工作流, 标题, 成本估算), ...]（见 write_document）
+    """
+    rows = sorted(((title, wf, cost) for wf, title, cost in costs), key=lambda r: r[2]['total'], reverse=True)
+
+    lines = [
+        "\n## 💰 执行成本估算\n",
+        f"> 静态估算单次触发的最坏记录操作数（读取 + 写入 + 其他动作调用）。"
+        f"无条件查找按 {COST_TABLE_ROWS} 条、带条件查找按 {COST_MATCHED_ROWS} 条记录估算，"
+        f"循环受最大循环次数限制。\n",
+        "| 工作流 | 状态 | 触发方式 | 读取 | 写入 | 调用 | 单次触发合计 | 批量触发 |",
+        "|--------|------|----------|------|------|------|--------------|----------|",
+    ]
+    for title, wf, cost in rows:
+        status = "✅" if wf.get('status') == 1 else "⚪"
+        trigger = TRIGGER_TYPES.get(cost['trigger'], cost['trigger'] or "-")
+        batch = "⚠️ 是" if cost['batch_sources'] else "否"
+        lines.append(f"| {title} | {status} | {trigger} | {cost['reads']} | {cost['writes']} | {cost['calls']} | "
+                     f"**{cost['total']}** | {batch} |")
+
+    hot = [(title, cost) for title, _, cost in rows if cost['hotspots']]
+    if hot:
+        lines.append("\n### 🔥 扇出热点\n")
+        for title, cost in hot:
+            lines.append(f"- **{title}**")
+            for note in cost['hotspots']:
+                lines.append(f"  - {note}")
+    return lines
+
+
+def print_cost_summary(costs, slowest=SLOWEST_COUNT):
+    """打印估算成本最高的若干个工作流；costs 同 cost_section"""
+    costs = sorted(((wf.get('id', '未知'), cost) for wf, _, cost in costs), key=lambda c: c[1]['total'], reverse=True)
+    hot = sum(1 for _, cost in costs if cost['hotspots'])
+    print(f"    - 成本估算: {hot} 个工作流存在扇出热点")
+    for wf_id, cost in costs[:slowest]:
+        print(f"      {cost['total']:>10} 次操作  {wf_id}")
+
+
+def generate_document(workflows, table_map, field_map, option_map, block_map):
+    """生成自动化地图 Markdown 文档（返回完整字符串）"""
+    buf = io.StringIO()
+    write_document(buf, workflows, table_map, field_map, option_map, block_map)
+    return buf.getvalue()
 
 
 def build_block_map(snapshot):
@@ -1135,30 +1394,37 @@ def build_block_map(snapshot):
     return block_map
 
 
-def main():
-    print("=" * 50)
-    print("自动化地图生成器")
-    print("=" * 50)
-    
-    # 读取文件
-    print(f"\n[1/5] 读取文件: {FILE_PATH}")
-    try:
-        with open(FILE_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception as e:
-        print(f"❌ 文件读取失败: {e}")
-        return
-    
+def workflow_table_ids(wf):
+    """工作流 Extra.TableMap 中涉及的真实表 ID 集合"""
+    table_map = wf.get('WorkflowExtra', {}).get('Extra', {}).get('TableMap', {}) or {}
+    return {(info.get('TableID') or '').strip('"') for info in table_map.values() if isinstance(info, dict)}
+
+
+def select_workflows(workflows, selected):
+    """限定范围（selected 为选中的表 ID 集合）时只保留涉及选中表的工作流；selected 为 None 时原样返回"""
+    if selected is None:
+        return workflows
+    return [wf for wf in workflows if workflow_table_ids(wf) & selected]
+
+
+def run(doc, output_path=OUTPUT_PATH, jobs=1, slowest=SLOWEST_COUNT, cache_dir=None, cost=False):
+    """
+    基于已加载的 BaseDocument 生成自动化地图，成功返回 True。
+    jobs: 并行解析的进程数，1 为串行；slowest: 耗时汇总中列出的最慢工作流个数。
+    cache_dir: 片段缓存目录，指定后只重新解析内容有变化的工作流。
+    cost: 为 True 时追加执行成本估算章节，并打印估算成本最高的工作流。
+    """
     # 解压快照
     print("[2/5] 解压快照数据...")
-    snapshot = decompress_content(data.get('gzipSnapshot'))
+    snapshot = doc.snapshot
     if not snapshot:
         print("❌ 快照解压失败")
-        return
+        return False
     
     # 构建名称映射
     print("[3/5] 构建名称映射...")
-    table_map, field_map, option_map = build_name_registry(snapshot)
+    registry = doc.registry
+    table_map, field_map, option_map = registry.table_map, registry.field_map, registry.option_map
     block_map = build_block_map(snapshot)
     print(f"    - 发现 {len(table_map)} 张表")
     print(f"    - 发现 {len(field_map)} 个字段")
@@ -1166,22 +1432,67 @@ def main():
     
     # 解压自动化数据
     print("[4/5] 解压自动化数据...")
-    workflows = decompress_content(data.get('gzipAutomation'))
+    workflows = doc.automation
     if not workflows or not isinstance(workflows, list):
         print("❌ 自动化数据解压失败或为空")
-        return
+        return False
     print(f"    - 发现 {len(workflows)} 个工作流")
+    if registry.selected is not None:
+        # 限定范围：只收录涉及选中表的工作流，并补充注册这些工作流涉及的其他表的字段
+        workflows = select_workflows(workflows, registry.selected)
+        registry.include(set().union(*map(workflow_table_ids, workflows)))
+        print(f"    - 限定范围: 其中 {len(workflows)} 个工作流涉及选中的表")
+    
+    # 生成文档，边解析边写入文件
+    print("[5/5] 生成文档..." + (f" (并行: {jobs} 个进程)" if jobs > 1 else ""))
+    timings = []
+    costs = [] if cost else None
+    cache = (FragmentCache(cache_dir, "自动化地图", table_map, field_map, option_map, block_map)
+             if cache_dir else None)
+    with profiling.stage("生成文档"), open(output_path, 'w', encoding='utf-8') as f:
+        out = profiling.timed_writer(completeness_sink.tracking_writer(f, output_path))
+        write_document(out, workflows, table_map, field_map, option_map, block_map, jobs, timings, cache, costs)
+    if cache:
+        cache.prune()
+        print(f"    - {cache.summary()}")
+    print_timing_summary(timings, slowest)
+    if cost:
+        print_cost_summary(costs, slowest)
+    
+    print(f"\n✅ 成功生成: {output_path}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自动化地图生成器")
+    parser.add_argument("--jobs", type=int, default=1, help="并行解析的进程数（0 = CPU 核数，默认 1 即串行）")
+    parser.add_argument("--slowest", type=int, default=SLOWEST_COUNT, help="耗时汇总中列出的最慢工作流个数（0 = 不列出）")
+    parser.add_argument("--cache-dir", help="片段缓存目录，指定后只重新解析内容有变化的工作流，同时缓存解压后的数据（.base 未变化时跳过解压）")
+    parser.add_argument("--cost", action="store_true", help="追加执行成本估算（单次触发的最坏记录操作数与扇出热点）")
+    parser.add_argument("--tables", help="只收录涉及指定表（逗号分隔的表名或表 ID）的工作流")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
     
-    # 生成文档
-    print("[5/5] 生成文档...")
-    
-    # print(f"DEBUG: main -> field_map size: {len(field_map)}")
-    document = generate_document(workflows, table_map, field_map, option_map, block_map)
+    print("=" * 50)
+    print("自动化地图生成器")
+    print("=" * 50)
     
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        f.write(document)
+    with profiling.session(profiling.report_path(args), args.cprofile):
+        # 读取文件
+        print(f"\n[1/5] 读取文件: {FILE_PATH}")
+        try:
+            doc = BaseDocument.load(FILE_PATH, cache_dir=args.cache_dir)
+        except Exception as e:
+            print(f"❌ 文件读取失败: {e}")
+            return
+        if args.tables:
+            try:
+                doc.select_tables(parse_table_list(args.tables))
+            except ValueError as e:
+                print(f"❌ {e}")
+                return
     
-    print(f"\n✅ 成功生成: {OUTPUT_PATH}")
+        run(doc, jobs=resolve_jobs(args.jobs), slowest=args.slowest, cache_dir=args.cache_dir, cost=args.cost)
     print("=" * 50)
 
 
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解码模型缓存 (Decoded Model Cache)
+==================================
+功能：把 .base 解压、解析后的数据块和名称注册表保存为 marshal 二进制文件，
+      .base 未变化时再次运行直接载入，跳过 JSON 解析、base64 解码、gzip 解压和注册表构建。
+特性：
+- 每个 .base 文件（按绝对路径）一个缓存目录，meta.json 记录文件大小、修改时间和 sign；
+  原文件已不存在的缓存目录在下次写入缓存时清理
+- 大小和修改时间都未变时完全不读取 .base 文件；有变化时重新读取，
+  若 sign 未变（文件被复制、touch 等），已解码的数据块仍然复用
+- 每个数据块一个文件，首次解压后写入、之后按需载入，写入采用临时文件 + 替换
+- 名称注册表只保存映射本身，all_tables 载入时从快照恢复（与快照共享同一份表结构）
+- 载入时暂停垃圾回收：反序列化大量小对象会反复触发 GC
+- marshal 格式与 Python 版本相关，版本不同时缓存整体失效
+
+用法：
+    doc = BaseDocument.load("xxx.base", cache_dir=".feishu_cache")
+"""
+
+import gc
+import hashlib
+import json
+import marshal
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+
+CACHE_VERSION = 1
+NAMESPACE = "解码模型"
+META_FILE = "meta.json"
+SUFFIX = ".marshal"
+# 名称注册表的缓存名称（数据块使用顶层键名，如 gzipSnapshot）
+REGISTRY = "registry"
+
+_registry_digest = None
+
+
+def registry_digest():
+    """name_registry.py 的源码哈希：注册表结构变化时，缓存的注册表失效"""
+    global _registry_digest
+    if _registry_digest is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'name_registry.py')
+        with open(path, 'rb') as f:
+            _registry_digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    return _registry_digest
+
+
+def file_stat(path):
+    """缓存键中与文件内容相关的部分：大小和修改时间（纳秒）"""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+@contextmanager
+def _paused_gc():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class ModelCache:
+    """
+    单个 .base 文件的解码缓存。
+    - fresh(): 缓存是否与当前文件一致（一致时无需读取 .base）
+    - adopt(data): 重新读取 .base 后调用，sign 未变时保留已缓存的数据块，否则清空
+    - has / load / save: 按名称读写数据块或注册表
+    """
+
+    def __init__(self, cache_dir, source):
+        self.source = os.path.abspath(source)
+        name = hashlib.sha256(self.source.encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(cache_dir, NAMESPACE, name)
+        self.version = [CACHE_VERSION, marshal.version, list(sys.version_info[:2])]
+        self.meta = self._read_meta()
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.path, META_FILE), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('version') == self.version else None
+
+    def fresh(self):
+        """缓存的文件大小、修改时间与当前 .base 一致"""
+        if self.meta is None:
+            return False
+        try:
+            size, mtime_ns = file_stat(self.source)
+        except OSError:
+            return False
+        return self.meta['size'] == size and self.meta['mtime_ns'] == mtime_ns
+
+    @property
+    def keys(self):
+        """缓存时 .base 的全部顶层键"""
+        return self.meta['keys']
+
+    @property
+    def top_level(self):
+        """缓存时 .base 中的非 gzip 顶层字段（如 sign）"""
+        return dict(self.meta['top'])
+
+    def adopt(self, data):
+        """
+        .base 重新读取后更新 meta：sign 和文件大小都未变时保留已缓存的数据块，否则清空缓存。
+        data: .base 顶层 JSON 对象
+        """
+        size, mtime_ns = file_stat(self.source)
+        sign = data.get('sign')
+        keep = (self.meta is not None and sign and self.meta.get('sign') == sign
+                and self.meta.get('size') == size)
+        os.makedirs(self.path, exist_ok=True)
+        if not keep:
+            for name in os.listdir(self.path):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+        self.meta = {
+            'version': self.version,
+            'source': self.source,
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'sign': sign,
+            'keys': sorted(data.keys()),
+            'top': {k: v for k, v in data.items() if not k.startswith('gzip')},
+        }
+        self._write(META_FILE, json.dumps(self.meta, ensure_ascii=False).encode('utf-8'))
+        self.prune()
+
+    def prune(self):
+        """删除原 .base 文件已不存在的其他缓存目录，返回删除的个数"""
+        root = os.path.dirname(self.path)
+        removed = 0
+        for name in os.listdir(root):
+            entry = os.path.join(root, name)
+            if entry == self.path:
+                continue
+            try:
+                with open(os.path.join(entry, META_FILE), 'r', encoding='utf-8') as f:
+                    source = json.load(f).get('source')
+            except (OSError, ValueError):
+                continue
+            if source and not os.path.exists(source):
+                shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def _file(self, name):
+        if name == REGISTRY:
+            name = f"{REGISTRY}-{registry_digest()}"
+        return os.path.join(self.path, name + SUFFIX)
+
+    def has(self, name):
+        return self.meta is not None and os.path.exists(self._file(name))
+
+    def load(self, name):
+        """载入缓存的对象；不存在或已损坏返回 None"""
+        try:
+            with open(self._file(name), 'rb') as f:
+                blob = f.read()
+            # marshal.load(f) 按对象逐段读取文件，整体读入后再 loads 快得多
+            with _paused_gc():
+                return marshal.loads(blob)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def save(self, name, obj):
+        """保存对象（只能包含内置类型）；meta 尚未写入或对象无法序列化时不保存"""
+        if self.meta is None:
+            return
+        try:
+            blob = marshal.dumps(obj)
+        except ValueError:
+            return
+        self._write(os.path.basename(self._file(name)), blob)
+
+    def _write(self, name, blob):
+        path = os.path.join(self.path, name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp, path)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+名称注册表 (Name Registry)
+==========================
+功能：从 gzipSnapshot 中一次性构建表名、字段名、选项名映射，供所有生成器共享。
+特性：
+- field_map 保持原有 {(table_id, field_id): field_name} 结构
+- 额外维护 field_id → (table_id, field_name) 反向索引，
+  跨表按字段 ID 查名称从遍历全部字段变为 O(1)
+- WorkflowRefs 把工作流的 Extra.TableMap 编译为扁平的引用 ID 解析表
+- 可只为指定的表（及其公式 / 查找引用等传递涉及的表）注册字段：TableIndex 只记录各表结构的位置，
+  不遍历字段，按需计算引用闭包，闭包之外的表不遍历、不保留字段和选项
+"""
+
+import re
+
+from formula import find_table_refs
+
+# ref_tblXXX_fldYYY / ref_ref_tblXXX_fldYYY 形式的字段引用
+REF_FIELD_PREFIXES = ('ref_ref_tbl', 'ref_tbl')
+REF_FIELD_RE = re.compile(r'(tbl[^_]+)_(fld.+)')
+
+
+class FieldMap(dict):
+    """
+    {(table_id, field_id): field_name}，附带按字段 ID 的反向索引。
+    同一字段 ID 出现在多张表时，反向索引保留最先注册的那一个
+    （与原先遍历 field_map 取第一个匹配的行为一致）。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.by_id = {}  # field_id -> (table_id, field_name)
+
+    def __setitem__(self, key, field_name):
+        super().__setitem__(key, field_name)
+        table_id, field_id = key
+        entry = self.by_id.get(field_id)
+        if entry is None or entry[0] == table_id:
+            self.by_id[field_id] = (table_id, field_name)
+
+    def __reduce__(self):
+        # 多进程 (spawn) 传递时按插入顺序重放 __setitem__，同时重建反向索引
+        return (self.__class__, (), None, None, iter(self.items()))
+
+    def find(self, field_id):
+        """忽略表 ID，仅按字段 ID 查找字段名；找不到返回 None"""
+        entry = self.by_id.get(field_id)
+        return entry[1] if entry else None
+
+    def lookup(self, table_id, field_id):
+        """先精确匹配 (table_id, field_id)，再按字段 ID 兜底；找不到返回 None"""
+        return self.get((table_id, field_id)) or self.find(field_id)
+
+
+class TableIndex:
+    """
+    快照中各表的索引：表 ID → 原始表结构，以及与 NameRegistry 规则相同的表名。
+    构建时只遍历表列表、不遍历字段；字段只在计算引用闭包时按需遍历。
+    """
+
+    def __init__(self):
+        self.tables = {}  # table_id -> table_dict
+        self.names = {}  # table_id -> table_name
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        index = cls()
+        for item in snapshot or []:
+            if 'schema' not in item:
+                continue
+            schema = item['schema']
+            for tid, tinfo in schema.get('tableMap', {}).items():
+                if isinstance(tinfo, dict) and tinfo.get('name'):
+                    index.names[tid] = tinfo['name']
+            for table in iter_schema_tables(schema):
+                table_id = table.get('meta', {}).get('id')
+                if table_id:
+                    index.tables.setdefault(table_id, table)
+                    if table_id not in index.names:
+                        index.names[table_id] = table.get('meta', {}).get('name') or table_id
+        return index
+
+    def resolve(self, queries):
+        """表名或表 ID 列表 → 表 ID 集合（同名的表全部选中）；有找不到的抛出 ValueError"""
+        selected, missing = set(), []
+        for query in queries:
+            matched = [tid for tid in self.tables if tid == query or self.names.get(tid) == query]
+            if not matched:
+                missing.append(query)
+            selected.update(matched)
+        if missing:
+            raise ValueError(f"未找到数据表: {', '.join(missing)}")
+        return selected
+
+    def references(self, table_id):
+        """表中字段（公式、查找引用、关联、选项同步）直接引用的其他表 ID"""
+        refs = set()
+        for field_def in self.tables.get(table_id, {}).get('fieldMap', {}).values():
+            field_type = field_def.get('type')
+            prop = field_def.get('property') or {}
+            if field_type in (19, 20):
+                refs.update(find_table_refs(prop.get('formula', '')))
+            if field_type == 19:
+                refs.add((prop.get('filterInfo') or {}).get('targetTable'))
+            elif field_type in (18, 21):
+                refs.add(prop.get('tableId'))
+            elif field_type in (3, 4):
+                refs.add((prop.get('optionsRule') or {}).get('targetTable'))
+        refs.discard(table_id)
+        return {tid for tid in refs if tid in self.tables}
+
+    def closure(self, table_ids):
+        """table_ids 及其传递引用的全部表 ID"""
+        reached = set(table_ids)
+        pending = list(reached)
+        while pending:
+            for tid in self.references(pending.pop()):
+                if tid not in reached:
+                    reached.add(tid)
+                    pending.append(tid)
+        return reached
+
+
+def iter_schema_tables(schema):
+    """schema.data 中的表结构（tables 列表 + 单独的 table）"""
+    data = schema.get('data')
+    if not data:
+        return []
+    tables = list(data.get('tables', []))  # 复制一份，避免 append 污染共享的快照
+    if 'table' in data:
+        tables.append(data['table'])
+    return [table for table in tables if isinstance(table, dict)]
+
+
+def snapshot_tables(snapshot):
+    """快照中全部的表结构（按出现顺序，与未限定范围的 NameRegistry.all_tables 相同）"""
+    return [table for item in snapshot or [] if 'schema' in item for table in iter_schema_tables(item['schema'])]
+
+
+class NameRegistry:
+    """
+    名称注册表。
+    - table_map: {table_id: table_name}（始终包含全部表）
+    - field_map: FieldMap {(table_id, field_id): field_name}
+    - option_map: {option_id: option_name}（选项ID全局唯一）
+    - all_tables: [table_dict, ...]
+    - selected: 限定范围时为选中的表 ID 集合（all_tables 只含这些表），否则为 None
+    - loaded: 限定范围时为已注册字段的表 ID 集合（选中的表及其传递引用的表），否则为 None
+    """
+
+    def __init__(self):
+        self.table_map = {}
+        self.field_map = FieldMap()
+        self.option_map = {}
+        self.all_tables = []
+        self.selected = None
+        self.loaded = None
+        self._index = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot, tables=None):
+        """
+        从快照中构建表名和字段名的映射表。
+        tables: 表名或表 ID 列表；指定后 all_tables 只含这些表，字段和选项只注册这些表
+                及其公式 / 查找引用 / 关联 / 选项同步传递涉及的表。有找不到的表时抛出 ValueError。
+        """
+        registry = cls()
+        if tables is not None:
+            registry._index = TableIndex.from_snapshot(snapshot)
+            registry.selected = registry._index.resolve(tables)
+            registry.loaded = registry._index.closure(registry.selected)
+        for item in snapshot or []:
+            if 'schema' in item:
+                registry._add_schema(item['schema'])
+        return registry
+
+    def dump(self):
+        """
+        导出为只含内置类型的元组（供 model_cache 用 marshal 保存）。
+        all_tables 不导出，restore 时从快照恢复；限定范围的注册表不应缓存。
+        """
+        return (self.table_map, list(self.field_map.items()), self.field_map.by_id, self.option_map)
+
+    @classmethod
+    def restore(cls, data, snapshot):
+        """由 dump() 的结果和同一份快照恢复注册表，不重新遍历字段"""
+        registry = cls()
+        registry.table_map, field_items, by_id, registry.option_map = data
+        dict.update(registry.field_map, field_items)  # 反向索引直接取缓存的 by_id，不经过 __setitem__
+        registry.field_map.by_id = by_id
+        registry.all_tables = snapshot_tables(snapshot)
+        return registry
+
+    def in_scope(self, table_id):
+        """表是否在选中范围内（未限定范围时总是 True）"""
+        return self.selected is None or table_id in self.selected
+
+    def include(self, table_ids):
+        """
+        限定范围时，补充注册 table_ids 及其传递引用的表的字段（如选中表的工作流还涉及其他表），
+        只用于名称解析，不加入 all_tables。未限定范围时不做任何事。
+        """
+        if self._index is None:
+            return
+        added = self._index.closure(tid for tid in table_ids if tid in self._index.tables) - self.loaded
+        self.loaded |= added
+        for table_id in sorted(added):
+            self._add_fields(table_id, self._index.tables[table_id])
+
+    def _add_schema(self, schema):
+        # 首先从 tableMap 获取表名（这里通常有完整的表名）
+        for tid, tinfo in schema.get('tableMap', {}).items():
+            if isinstance(tinfo, dict) and tinfo.get('name'):
+                self.table_map[tid] = tinfo['name']
+
+        # 然后处理 data 中的表结构
+        for table in iter_schema_tables(schema):
+            self._add_table(table)
+
+    def _add_table(self, table):
+        table_id = table.get('meta', {}).get('id')
+        table_name = table.get('meta', {}).get('name')
+        if self.in_scope(table_id):
+            self.all_tables.append(table)
+
+        # 只有当 tableMap 中没有这个表时才使用 meta.name
+        if table_id and table_id not in self.table_map:
+            self.table_map[table_id] = table_name or table_id
+
+        if not table_id or (self.loaded is not None and table_id not in self.loaded):
+            return
+        self._add_fields(table_id, table)
+
+    def _add_fields(self, table_id, table):
+        # 提取字段名和选项
+        for field_id, field_def in table.get('fieldMap', {}).items():
+            self.field_map[(table_id, field_id)] = field_def.get('name') or field_id
+            for opt in (field_def.get('property') or {}).get('options') or []:
+                opt_id = opt.get('id')
+                if opt_id:
+                    self.option_map[opt_id] = opt.get('name')
+
+
+class WorkflowRefs:
+    """
+    单个工作流的引用解析表，加载工作流时由 Extra.TableMap 编译一次。
+    - tables: {ref_tblXXX: 真实表ID}
+    - fields: {引用ID: (真实表ID, 真实字段ID, 字段名)}，字段名为 None 表示未能解析；
+      TableMap 中各表 FieldMap 声明的引用在编译时全部解析，
+      其余引用（ref_tblXXX_fldYYY、原始字段 ID 等）首次出现时解析并写入，之后直接查表
+    解析顺序：ref_tbl 前缀引用按 TableMap 映射 → 按原表 ID → 仅按字段 ID；
+    然后是 FieldMap 声明的映射；最后忽略表 ID 按字段 ID 查找。
+    """
+
+    def __init__(self, table_map, field_map):
+        self.field_map = field_map
+        self.tables = {}
+        self.fields = {}
+        self._declared = {}  # FieldMap 声明的引用 → 第一个能解析出名称的 (表ID, 字段ID, 名称)
+        for ref_tid, info in (table_map or {}).items():
+            if not isinstance(info, dict):
+                continue
+            real_tid = (info.get('TableID') or '').strip('"')
+            self.tables[ref_tid] = real_tid
+            for ref_fid, real_fid in (info.get('FieldMap') or {}).items():
+                name = field_map.get((real_tid, real_fid))
+                if name and ref_fid not in self._declared:
+                    self._declared[ref_fid] = (real_tid, real_fid, name)
+        for ref_fid in self._declared:
+            self.fields[ref_fid] = self._resolve(ref_fid)
+
+    def table_id(self, ref_tid):
+        """ref_tblXXX → 真实表ID；不在 TableMap 中返回 None"""
+        return self.tables.get(ref_tid)
+
+    def resolve(self, ref_fid):
+        """引用ID → (真实表ID, 真实字段ID, 字段名)"""
+        entry = self.fields.get(ref_fid)
+        if entry is None:
+            entry = self.fields[ref_fid] = self._resolve(ref_fid)
+        return entry
+
+    def field_name(self, ref_fid):
+        """引用ID → 字段名；找不到返回 None"""
+        return self.resolve(ref_fid)[2]
+
+    def _by_field_id(self, field_id):
+        entry = self.field_map.by_id.get(field_id)
+        return (entry[0], field_id, entry[1]) if entry and entry[1] else None
+
+    def _resolve(self, ref_fid):
+        if isinstance(ref_fid, str) and ref_fid.startswith(REF_FIELD_PREFIXES):
+            match = REF_FIELD_RE.search(ref_fid)
+            if match:
+                real_tid, real_fid = match.groups()
+                mapped_tid = self.tables.get(f"ref_{real_tid}")
+                for tid in (mapped_tid, real_tid):
+                    name = self.field_map.get((tid, real_fid)) if tid is not None else None
+                    if name:
+                        return (tid, real_fid, name)
+                entry = self._by_field_id(real_fid)
+                if entry:
+                    return entry
+
+        return self._declared.get(ref_fid) or self._by_field_id(ref_fid) or (None, ref_fid, None)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能剖析 (Profiling Instrumentation)
+====================================
+功能：按阶段记录墙钟时间、CPU 时间和内存，输出 JSON 计时报告；
+      可选用 cProfile 包裹整次运行，打印按累计耗时排序的热点函数。
+特性：
+- 按需开启（--profile）：未开启时 stage() / record_item() 只是空操作
+- 阶段可以嵌套，名称以 / 连接（如 全量字段表/解压 gzipSnapshot）
+- CPU 时间分为本进程和已回收子进程（--jobs 并行时的工作进程）两部分
+- 内存为阶段结束时的常驻内存 (RSS)、进程峰值 (ru_maxrss) 以及阶段内峰值的增长；平台不支持时为 null
+- 逐表 / 逐工作流的渲染耗时（并行时由工作进程计时）和写出耗时按组汇总：个数、合计、最慢的若干项
+
+用法：
+    python3 scripts/run_all.py xxx.base --profile [--profile-out 计时报告.json] [--cprofile [N]]
+    各生成器脚本同样支持 --profile / --profile-out / --cprofile
+"""
+
+import cProfile
+import datetime
+import json
+import os
+import platform
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ========== 配置 ==========
+REPORT_PATH = "计时报告.json"
+CPROFILE_TOP = 25  # --cprofile 默认列出的热点函数个数
+SLOWEST_ITEMS = 10  # 报告中每组列出的最慢项个数
+
+# 当前生效的 Profiler；为 None 时各埋点不做任何事
+_active = None
+
+
+def _rss_mb():
+    """当前常驻内存 (MB)；仅 Linux 可取，其他平台返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mb():
+    """进程启动以来的常驻内存峰值 (MB)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _child_cpu():
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+class _Stage:
+    """单个阶段的计时上下文"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        profiler = self.profiler
+        profiler._stack.append(self.name)
+        self.record = {'name': "/".join(profiler._stack), 'depth': len(profiler._stack) - 1}
+        profiler.stages.append(self.record)
+        self.peak = _peak_rss_mb()
+        self.child_cpu = _child_cpu()
+        self.cpu = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.cpu
+        peak = _peak_rss_mb()
+        self.record.update({
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(cpu, 4),
+            'child_cpu_seconds': round(_child_cpu() - self.child_cpu, 4),
+            'rss_mb': _rss_mb(),
+            'peak_rss_mb': peak,
+            'peak_growth_mb': round(peak - self.peak, 1) if peak is not None else None,
+        })
+        self.profiler._stack.pop()
+        return False
+
+
+class _NullStage:
+    """未开启剖析时的空上下文"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profiler:
+    """
+    一次运行的计时记录。
+    - stages: 按开始顺序排列的阶段记录
+    - items: {组名: [(标签, 秒数), ...]}，组名带上所在阶段的路径
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.items = {}
+        self._stack = []
+        self._start = time.perf_counter()
+        self._cpu = time.process_time()
+        self._child_cpu = _child_cpu()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def record_item(self, group, label, seconds):
+        key = "/".join(self._stack + [group])
+        self.items.setdefault(key, []).append((label, seconds))
+
+    def report(self, hot_functions=None):
+        """可 JSON 序列化的计时报告"""
+        items = {}
+        for group, entries in self.items.items():
+            total = sum(seconds for _, seconds in entries)
+            slowest = sorted(entries, key=lambda e: e[1], reverse=True)[:SLOWEST_ITEMS]
+            items[group] = {
+                'count': len(entries),
+                'total_seconds': round(total, 4),
+                'mean_ms': round(total / len(entries) * 1000, 3),
+                'slowest': [{'label': str(label), 'seconds': round(seconds, 4)} for label, seconds in slowest],
+            }
+        report = {
+            'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'argv': sys.argv,
+            'total': {
+                'wall_seconds': round(time.perf_counter() - self._start, 4),
+                'cpu_seconds': round(time.process_time() - self._cpu, 4),
+                'child_cpu_seconds': round(_child_cpu() - self._child_cpu, 4),
+                'peak_rss_mb': _peak_rss_mb(),
+            },
+            'stages': self.stages,
+            'items': items,
+        }
+        if hot_functions is not None:
+            report['hot_functions'] = hot_functions
+        return report
+
+
+# ========== 埋点 ==========
+
+def enabled():
+    return _active is not None
+
+
+def stage(name):
+    """阶段计时上下文：with profiling.stage("解压"): ..."""
+    return _active.stage(name) if _active is not None else _NULL_STAGE
+
+
+def record_item(group, label, seconds):
+    """记录一项（一张表、一个工作流……）的耗时，归入当前阶段下的 group 组"""
+    if _active is not None:
+        _active.record_item(group, label, seconds)
+
+
+class TimedWriter:
+    """包装文本输出，把每次 write() 的耗时记入 group 组"""
+
+    def __init__(self, out, group):
+        self._out = out
+        self._group = group
+
+    def write(self, text):
+        start = time.perf_counter()
+        result = self._out.write(text)
+        record_item(self._group, "write", time.perf_counter() - start)
+        return result
+
+
+def timed_writer(out, group="写出"):
+    """开启剖析时返回计时包装，否则原样返回 out"""
+    return TimedWriter(out, group) if _active is not None else out
+
+
+# ========== 会话 ==========
+
+def add_arguments(parser):
+    """为命令行加入 --profile / --profile-out / --cprofile 参数"""
+    parser.add_argument("--profile", action="store_true",
+                        help=f"记录各阶段耗时和内存，写出 JSON 计时报告（默认 {REPORT_PATH}）")
+    parser.add_argument("--profile-out", metavar="JSON路径",
+                        help="计时报告的写出路径（指定时隐含 --profile）")
+    parser.add_argument("--cprofile", type=int, nargs="?", const=CPROFILE_TOP, metavar="N",
+                        help=f"用 cProfile 包裹整次运行，打印累计耗时最高的 N 个函数（默认 {CPROFILE_TOP}）")
+
+
+def report_path(args):
+    """add_arguments 解析结果 → 计时报告路径；未开启 --profile 时为 None"""
+    return args.profile_out or (REPORT_PATH if args.profile else None)
+
+
+def _hot_functions(profile, top):
+    """cProfile 结果 → 按累计耗时排序的前 top 个函数"""
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, func), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({func})",
+            'calls': calls,
+            'total_seconds': round(total, 4),
+            'cumulative_seconds': round(cumulative, 4),
+        })
+    rows.sort(key=lambda r: r['cumulative_seconds'], reverse=True)
+    return rows[:top]
+
+
+def print_summary(report):
+    """打印阶段耗时树、逐项汇总和热点函数"""
+    total = report['total']
+    print(f"\n⏱️ 计时汇总: 墙钟 {total['wall_seconds']:.2f}s，CPU {total['cpu_seconds']:.2f}s"
+          f"（子进程 {total['child_cpu_seconds']:.2f}s），峰值内存 {total['peak_rss_mb']} MB")
+    for record in report['stages']:
+        if 'wall_seconds' not in record:
+            continue
+        name = record['name'].rsplit("/", 1)[-1]
+        print(f"    {'  ' * record['depth']}{name:<24} {record['wall_seconds']:>8.3f}s  "
+              f"CPU {record['cpu_seconds']:>7.3f}s  峰值 {record['peak_rss_mb']} MB (+{record['peak_growth_mb']})")
+    for group, summary in report['items'].items():
+        print(f"    [{group}] {summary['count']} 项，合计 {summary['total_seconds']:.3f}s，"
+              f"平均 {summary['mean_ms']:.2f}ms")
+    if report.get('hot_functions'):
+        print("    热点函数（累计 / 自身耗时 / 调用次数）:")
+    for row in report.get('hot_functions') or []:
+        print(f"    {row['cumulative_seconds']:>8.3f}s  {row['total_seconds']:>8.3f}s  "
+              f"{row['calls']:>8}  {row['function']}")
+
+
+@contextmanager
+def session(report_path=None, cprofile_top=None):
+    """
+    开启一次剖析会话：期间的 stage() / record_item() 生效；
+    结束时打印汇总，并把计时报告写入 report_path（未指定且只开启 cProfile 时不写文件）。
+    两个参数都为空时什么也不做。
+    """
+    global _active
+    if not report_path and not cprofile_top:
+        yield None
+        return
+
+    profiler = _active = Profiler()
+    profile = cProfile.Profile() if cprofile_top else None
+    if profile:
+        profile.enable()
+    try:
+        yield profiler
+    finally:
+        if profile:
+            profile.disable()
+        _active = None
+        report = profiler.report(_hot_functions(profile, cprofile_top) if profile else None)
+        print_summary(report)
+        if report_path:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"    计时报告: {report_path}")
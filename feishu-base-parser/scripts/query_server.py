@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查询服务 (Query Server)
+=======================
+功能：一次加载 .base 并建好索引后常驻，按请求回答临时查询（按名称找字段、哪些公式引用了某张表、
+      哪些工作流用到某个字段……），不必重新生成文档再搜索 Markdown。
+特性：
+- 两种接入方式：默认从标准输入逐行读取 JSON-RPC 2.0 请求、向标准输出逐行写出响应；
+  --http PORT 在本机启动 HTTP 服务（POST /rpc 发送 JSON-RPC，或 GET /<方法>?参数=值）
+- 加载沿用 BaseDocument（支持 --cache-dir 解码模型缓存）、名称注册表和 DependencyGraph，
+  字段名、表名、工作流名等查找表在启动时一次建好，单次查询只做字典查找或一次线性扫描
+- --compact-names 改用紧凑字段目录 (FieldCatalog) 保存名称，超大 .base 常驻内存更小
+- 查询方法：
+  - find_field(name, exact=false, limit=50)：按字段名查找（默认忽略大小写的子串匹配）
+  - formulas_referencing(table, limit=100)：引用指定表的公式 / 查找引用字段，附翻译后的公式
+  - workflows_touching(field)：触发条件、读取或写入指定字段的工作流
+  - impact(node, depth=null)：删除字段 / 表后传递影响到的字段和工作流（同 dependency_graph --impact）
+  - stats()：索引规模与加载耗时
+- 表、字段、工作流参数可以是 ID、名称或「表名.字段名」；每个响应附带服务端耗时 elapsed_ms
+- 状态信息输出到标准错误，标准输出只有 JSON-RPC 响应；没有 id 的请求是通知，不返回响应
+- 参数先按方法签名校验，缺少 / 多余 / 类型不对时返回 -32602 且不执行查询；
+  查询执行中的任何异常都记录到标准错误并返回 -32000，不会使常驻服务退出
+
+用法：
+    python3 scripts/query_server.py [xxx.base] [--cache-dir DIR] [--compact-names]
+    echo '{"jsonrpc": "2.0", "id": 1, "method": "find_field", "params": {"name": "金额"}}' | python3 scripts/query_server.py xxx.base
+    python3 scripts/query_server.py xxx.base --http 8765
+    curl 'http://127.0.0.1:8765/workflows_touching?field=订单表.金额'
+"""
+
+import argparse
+import inspect
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from base_loader import BaseDocument
+from dependency_graph import EDGE_KINDS, RECALC_EDGE_KINDS, DependencyGraph, field_node
+from generate_全量字段表 import get_field_type_name, translate_formula
+from name_registry import snapshot_tables
+
+# ========== 配置 ==========
+FILE_PATH = "【演示】成品布管理系统.base"
+HTTP_HOST = "127.0.0.1"  # 只监听本机
+FIND_LIMIT = 50  # find_field 默认最多返回的字段数
+FORMULA_LIMIT = 100  # formulas_referencing 默认最多返回的字段数
+
+# JSON-RPC 2.0 错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+QUERY_ERROR = -32000
+
+# 取整数值的查询参数：执行前统一转换并校验，不合法时返回 INVALID_PARAMS
+INT_PARAMS = ('limit', 'depth')
+
+KIND_NAMES = {'table': '表', 'field': '字段', 'workflow': '工作流'}
+
+
+class QueryError(Exception):
+    """查询参数无法解析（如找不到指定的表 / 字段），作为 JSON-RPC 错误返回"""
+
+
+class QueryIndex:
+    """
+    常驻的查询索引。
+    - graph: DependencyGraph（正向 / 反向依赖邻接）
+    - field_names: [(小写字段名, 字段节点ID), ...]，子串查找时线性扫描
+    - by_name: {名称: [节点ID, ...]}，包含字段名、「表名.字段名」、表名、工作流名
+    - by_id: {ID: [节点ID, ...]}，包含字段 ID、表 ID、工作流 ID
+    - field_defs: {字段节点ID: 原始字段定义}
+    """
+
+    def __init__(self, doc, compact=False):
+        start = time.perf_counter()
+        registry = doc.names(compact)
+        self.table_map = registry.table_map
+        self.field_map = registry.field_map
+        self.graph = DependencyGraph.from_document(doc, compact)
+        self.field_defs = {}
+        for table in snapshot_tables(doc.snapshot):
+            table_id = table.get('meta', {}).get('id')
+            if table_id:
+                for field_id, field_def in table.get('fieldMap', {}).items():
+                    self.field_defs[field_node(table_id, field_id)] = field_def
+
+        self.field_names = []
+        self.by_name = {}
+        self.by_id = {}
+        for node_id, node in self.graph.nodes.items():
+            raw_id = node_id.rsplit(':', 1)[1]
+            names = [node['name']]
+            if node['kind'] == 'field':
+                self.field_names.append((str(node['name']).lower(), node_id))
+                names.append(f"{self.table_map.get(node['table'], node['table'])}.{node['name']}")
+            for name in names:
+                self.by_name.setdefault(name, []).append(node_id)
+            self.by_id.setdefault(raw_id, []).append(node_id)
+
+        # 索引建好后不再变化，规模统计只算一次
+        kinds = {}
+        for node in self.graph.nodes.values():
+            kinds[node['kind']] = kinds.get(node['kind'], 0) + 1
+        self._stats = {'nodes': kinds, 'edges': self.graph.edge_count(),
+                       'index_ms': round((time.perf_counter() - start) * 1000, 1)}
+
+    # ---------- 参数解析 ----------
+
+    def resolve(self, query, kind=None):
+        """ID、节点 ID、名称或「表名.字段名」→ 节点 ID 列表（可按 kind 过滤）；找不到抛出 QueryError"""
+        query = str(query).strip()
+        if query in self.graph.nodes:
+            matches = [query]
+        else:
+            matches = self.by_id.get(query) or self.by_name.get(query) or []
+        if kind is not None:
+            matches = [node_id for node_id in matches if self.graph.nodes[node_id]['kind'] == kind]
+        if not matches:
+            raise QueryError(f"未找到{KIND_NAMES.get(kind, '')}: {query}")
+        return matches
+
+    # ---------- 结果格式 ----------
+
+    def describe(self, node_id):
+        """节点的 JSON 描述"""
+        node = self.graph.nodes.get(node_id, {})
+        kind = node.get('kind')
+        raw_id = node_id.rsplit(':', 1)[1]
+        if kind == 'field':
+            field_type = self.field_defs.get(node_id, {}).get('type')
+            return {'kind': kind, 'table_id': node['table'],
+                    'table_name': self.table_map.get(node['table'], node['table']),
+                    'id': raw_id, 'name': node['name'], 'type': field_type,
+                    'type_name': get_field_type_name(field_type), 'label': self.graph.label(node_id)}
+        return {'kind': kind, 'id': raw_id, 'name': node.get('name'), 'label': self.graph.label(node_id)}
+
+    # ---------- 查询方法 ----------
+
+    def find_field(self, name, exact=False, limit=FIND_LIMIT):
+        """按字段名查找：exact 为真时完全匹配（也接受「表名.字段名」），否则忽略大小写的子串匹配"""
+        if exact:
+            matches = [n for n in self.by_name.get(str(name).strip(), []) if n.startswith('field:')]
+        else:
+            needle = str(name).strip().lower()
+            matches = [node_id for key, node_id in self.field_names if needle in key]
+        return {'total': len(matches), 'fields': [self.describe(n) for n in matches[:limit]]}
+
+    def formulas_referencing(self, table, limit=FORMULA_LIMIT):
+        """引用指定表的公式 / 查找引用字段（不含表内自引用），附原始公式和翻译后的公式"""
+        fields = []
+        for table_id_node in self.resolve(table, 'table'):
+            for source, kinds in self.graph.dependents.get(table_id_node, {}).items():
+                if not source.startswith('field:') or kinds.isdisjoint(RECALC_EDGE_KINDS):
+                    continue
+                fields.append((source, kinds))
+        fields.sort(key=lambda item: self.graph.label(item[0]))
+
+        results = []
+        for source, kinds in fields[:limit]:
+            entry = self.describe(source)
+            entry['relations'] = sorted(EDGE_KINDS.get(k, k) for k in kinds & set(RECALC_EDGE_KINDS))
+            formula = (self.field_defs.get(source, {}).get('property') or {}).get('formula') or ''
+            entry['formula'] = formula
+            entry['formula_text'] = translate_formula(formula, entry['table_id'], self.table_map, self.field_map)
+            results.append(entry)
+        return {'total': len(fields), 'fields': results}
+
+    def workflows_touching(self, field):
+        """触发条件、读取或写入指定字段的工作流"""
+        workflows = []
+        for node_id in self.resolve(field, 'field'):
+            for source, kinds in self.graph.dependents.get(node_id, {}).items():
+                if source.startswith('workflow:'):
+                    entry = self.describe(source)
+                    entry['field'] = self.graph.label(node_id)
+                    entry['relations'] = sorted(EDGE_KINDS.get(k, k) for k in kinds)
+                    workflows.append(entry)
+        workflows.sort(key=lambda entry: (entry['name'] or '', entry['id']))
+        return {'total': len(workflows), 'workflows': workflows}
+
+    def impact(self, node, depth=None):
+        """删除字段 / 表后传递影响到的全部节点，按发现顺序排列"""
+        results = []
+        for node_id in self.resolve(node):
+            for target, level, via, kinds in self.graph.impact(node_id, depth):
+                entry = self.describe(target)
+                entry.update(depth=level, via=self.graph.label(via),
+                             relations=sorted(EDGE_KINDS.get(k, k) for k in kinds))
+                results.append(entry)
+        return {'total': len(results), 'nodes': results}
+
+    def stats(self):
+        """索引规模与构建耗时"""
+        return dict(self._stats, nodes=dict(self._stats['nodes']))
+
+
+METHODS = ('find_field', 'formulas_referencing', 'workflows_touching', 'impact', 'stats')
+
+
+def _error(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+def _bind(func, params):
+    """
+    按方法签名绑定 params（数组按位置、对象按名称），并把 INT_PARAMS 转为非负整数。
+    返回 inspect.BoundArguments；参数不合法时抛出 TypeError，不执行查询。
+    """
+    if params is None:
+        params = {}
+    if isinstance(params, list):
+        bound = inspect.signature(func).bind(*params)
+    elif isinstance(params, dict):
+        bound = inspect.signature(func).bind(**params)
+    else:
+        raise TypeError("params 必须是数组或对象")
+    for name in INT_PARAMS:
+        value = bound.arguments.get(name)
+        if value is None:
+            continue
+        try:
+            number = int(value)
+            if isinstance(value, bool) or number < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise TypeError(f"{name} 必须是非负整数: {value!r}") from None
+        bound.arguments[name] = number
+    return bound
+
+
+def _call(index, method, params):
+    """
+    执行查询方法，返回 (结果, 错误响应的 (code, message))，二者之一为 None。
+    参数先按签名校验（INVALID_PARAMS）；执行过程中的任何异常都作为查询错误返回。
+    """
+    func = getattr(index, method)
+    try:
+        bound = _bind(func, params)
+    except TypeError as e:
+        return None, (INVALID_PARAMS, f"参数错误: {e}")
+    start = time.perf_counter()
+    try:
+        result = func(*bound.args, **bound.kwargs)
+    except QueryError as e:
+        return None, (QUERY_ERROR, str(e))
+    except Exception as e:
+        # 单个查询出错不能让常驻服务退出
+        print(f"❌ 查询 {method} 出错: {type(e).__name__}: {e}", file=sys.stderr)
+        return None, (QUERY_ERROR, f"查询失败: {type(e).__name__}: {e}")
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return result, None
+
+
+def dispatch(index, request):
+    """
+    处理一个 JSON-RPC 请求（已解析的 dict），返回响应 dict。
+    没有 id 的请求是通知：照常执行，但不返回响应（返回 None），出错时也一样。
+    """
+    if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+        return _error(None, INVALID_REQUEST, "请求必须是包含 method 的 JSON 对象")
+    notification = 'id' not in request
+    request_id = request.get('id')
+    method = request['method']
+    if method not in METHODS:
+        error = (METHOD_NOT_FOUND, f"未知方法: {method}（可用: {', '.join(METHODS)}）")
+        result = None
+    else:
+        result, error = _call(index, method, request.get('params'))
+    if notification:
+        return None
+    if error is not None:
+        return _error(request_id, *error)
+    return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+
+def handle_line(index, line):
+    """处理一行 JSON 文本（单个请求或批量请求数组），返回响应的 JSON 文本；全部是通知时返回 None"""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return json.dumps(_error(None, PARSE_ERROR, f"JSON 解析失败: {e}"), ensure_ascii=False)
+    if isinstance(request, list):
+        if not request:
+            return json.dumps(_error(None, INVALID_REQUEST, "批量请求不能为空"), ensure_ascii=False)
+        responses = [r for r in (dispatch(index, item) for item in request) if r is not None]
+        return json.dumps(responses, ensure_ascii=False) if responses else None
+    response = dispatch(index, request)
+    return json.dumps(response, ensure_ascii=False) if response is not None else None
+
+
+def serve_stdio(index, stdin=sys.stdin, stdout=sys.stdout):
+    """逐行读取请求并写出响应（通知没有响应），直到输入结束"""
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        response = handle_line(index, line)
+        if response is not None:
+            stdout.write(response + "\n")
+            stdout.flush()
+
+
+def make_handler(index):
+    """绑定索引的 HTTP 请求处理类"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            if body is None:
+                # 只有通知：没有响应内容
+                self.send_response(204)
+                self.end_headers()
+                return
+            data = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            # GET /<方法>?参数=值：参数值按 JSON 解析（数字、true / false），失败时作为字符串；
+            # GET 总是需要响应，因此显式带上 id: null，不作为通知处理
+            url = urlsplit(self.path)
+            params = {}
+            for key, value in parse_qsl(url.query):
+                try:
+                    params[key] = json.loads(value)
+                except ValueError:
+                    params[key] = value
+            request = {'jsonrpc': '2.0', 'id': None, 'method': unquote(url.path.strip('/')), 'params': params}
+            response = dispatch(index, request)
+            self._send(400 if 'error' in response else 200, json.dumps(response, ensure_ascii=False))
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode('utf-8')
+            self._send(200, handle_line(index, body))
+
+        def log_message(self, format, *args):
+            sys.stderr.write(f"[HTTP] {self.address_string()} {format % args}\n")
+
+    return Handler
+
+
+def load_index(path, cache_dir=None, compact=False):
+    """加载 .base 并构建查询索引；compact 为真时名称取自紧凑字段目录"""
+    start = time.perf_counter()
+    doc = BaseDocument.load(path, cache_dir=cache_dir)
+    index = QueryIndex(doc, compact)
+    stats = index.stats()
+    print(f"索引已就绪: 表 {stats['nodes'].get('table', 0)} 张，字段 {stats['nodes'].get('field', 0)} 个，"
+          f"工作流 {stats['nodes'].get('workflow', 0)} 个，耗时 {(time.perf_counter() - start) * 1000:.0f}ms",
+          file=sys.stderr)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻查询服务（JSON-RPC over stdin / HTTP）")
+    parser.add_argument("file", nargs="?", default=FILE_PATH, help=".base 文件路径")
+    parser.add_argument("--cache-dir", help="解码模型缓存目录，.base 未变化时跳过解压")
+    parser.add_argument("--compact-names", action="store_true",
+                        help="用紧凑字段目录 (FieldCatalog) 保存名称：常驻内存更小，构建和查找稍慢，适合超大 .base")
+    parser.add_argument("--http", type=int, metavar="PORT", help=f"在 {HTTP_HOST}:PORT 启动 HTTP 服务（默认使用标准输入输出）")
+    args = parser.parse_args()
+
+    print(f"读取文件: {args.file}", file=sys.stderr)
+    try:
+        index = load_index(args.file, args.cache_dir, args.compact_names)
+    except Exception as e:
+        print(f"❌ 文件读取失败: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.http is None:
+        print(f"等待 JSON-RPC 请求（每行一个，方法: {', '.join(METHODS)}）", file=sys.stderr)
+        serve_stdio(index)
+        return
+
+    server = HTTPServer((HTTP_HOST, args.http), make_handler(index))
+    print(f"HTTP 服务已启动: http://{HTTP_HOST}:{args.http}/（Ctrl+C 退出）", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
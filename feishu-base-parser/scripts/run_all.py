@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+一键生成全部文档 (Run All)
+==========================
+功能：只读取、解压一次 .base 文件，依次运行全部生成器和完整性校验。
+特性：
+- 4 个脚本共享同一个 BaseDocument，gzip 数据块各只解压一次
+- 生成文档时同步登记未解析引用，完整性校验直接使用，不再扫描生成的文档
+- 执行顺序与单独运行脚本时一致：字段表 → 关联关系 → 自动化 → 校验
+- --cache-dir 开启增量生成：只重新渲染内容有变化的表和工作流；解压后的数据也缓存到磁盘，.base 未变化时不再读取、解压
+- --tables 只为指定的表生成文档（以及涉及这些表的工作流），字段只注册这些表及其引用涉及的表
+- --profile 记录各阶段耗时和内存并写出 JSON 计时报告，--cprofile 打印热点函数
+
+用法：
+    python3 scripts/run_all.py [xxx.base] [--jobs N] [--cache-dir DIR] [--tables 表A,表B] [--profile [--profile-out 计时报告.json]] [--cprofile [N]]
+
+输出：全量字段表.md、字段关联关系图.md、自动化工作流.md、完整性校验报告.md
+"""
+
+import argparse
+import os
+
+import completeness_sink
+import profiling
+from base_loader import BaseDocument, parse_table_list, resolve_jobs
+import generate_全量字段表
+import generate_关联关系图
+import generate_自动化地图
+import completeness_checker
+
+# ========== 配置 ==========
+FILE_PATH = "【演示】成品布管理系统.base"
+
+# (名称, 模块, 透传给 run() 的命令行参数) —— 校验器依赖前三份文档，必须最后执行
+STAGES = [
+    ("全量字段表", generate_全量字段表, ('jobs', 'cache_dir')),
+    ("关联关系图", generate_关联关系图, ('cache_dir',)),
+    ("自动化地图", generate_自动化地图, ('jobs', 'cache_dir')),
+    ("完整性校验", completeness_checker, ('records',)),
+]
+
+
+def run_stages(doc, output_dir=".", **options):
+    """
+    依次运行全部阶段，文档写入 output_dir，全部成功返回 True。
+    options: 命令行参数（jobs、cache_dir 等），按 STAGES 的声明透传给各阶段。
+    生成过程中登记的未解析引用 (records) 交给完整性校验。
+    """
+    with completeness_sink.session() as sink:
+        options = dict(options, records=sink.records)
+        for name, module, option_names in STAGES:
+            print(f"\n>>> {name}")
+            kwargs = {k: options[k] for k in option_names if k in options}
+            with profiling.stage(name):
+                ok = module.run(doc, output_path=os.path.join(output_dir, module.OUTPUT_PATH), **kwargs)
+            if not ok:
+                print(f"❌ {name} 失败，已中止")
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="一键生成飞书多维表格解析文档")
+    parser.add_argument("file", nargs="?", default=FILE_PATH, help=".base 文件路径")
+    parser.add_argument("--jobs", type=int, default=1, help="并行渲染 / 解析的进程数（0 = CPU 核数，默认 1 即串行）")
+    parser.add_argument("--cache-dir", help="片段缓存目录，指定后只重新渲染内容有变化的表和工作流，同时缓存解压后的数据（.base 未变化时跳过解压）")
+    parser.add_argument("--tables", help="只生成指定的表（逗号分隔的表名或表 ID）及涉及它们的工作流")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    args.jobs = resolve_jobs(args.jobs)
+
+    print("=" * 50)
+    print("飞书多维表格解析器 - 一键生成")
+    print("=" * 50)
+
+    with profiling.session(profiling.report_path(args), args.cprofile):
+        print(f"\n读取文件: {args.file}")
+        try:
+            doc = BaseDocument.load(args.file, cache_dir=args.cache_dir)
+        except Exception as e:
+            print(f"❌ 文件读取失败: {e}")
+            return
+        if args.tables:
+            try:
+                doc.select_tables(parse_table_list(args.tables))
+            except ValueError as e:
+                print(f"❌ {e}")
+                return
+
+        if not run_stages(doc, jobs=args.jobs, cache_dir=args.cache_dir):
+            return
+
+        print("\n✅ 全部文档生成完毕")
+
+
+if __name__ == "__main__":
+    main()
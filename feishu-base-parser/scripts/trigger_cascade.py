@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自动化连锁触发检测 (Automation Trigger Cascade Detector)
+=======================================================
+功能：找出「工作流 A 写入的字段正好被工作流 B 的触发器监听」形成的连锁触发，
+      报告触发环（可能无限循环的自动化风暴）和过长的触发链。
+特性：
+- 触发端：记录类触发器监听的表和字段（fields / fieldIds / watchedFieldId；
+  未指定字段时该表任意修改都会触发），新增记录触发器监听该表的新增
+- 写入端：修改记录步骤写入的表和字段 (values)，新增记录步骤在表中新增记录
+- A 的写入能触发 B 时建立边 A → B，边上记录经由的字段
+- 用强连通分量（dependency_graph.strongly_connected_components）找出全部触发环，含自己触发自己的工作流
+- 在分量收缩后的有向无环图上求最长触发链
+- 默认只分析已启用的工作流，--all 包含已禁用的
+
+用法：
+    python3 scripts/trigger_cascade.py [xxx.base] [--min-length 3] [--all] [--export 连锁触发.json] [--compact-names]
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from base_loader import BaseDocument
+from dependency_graph import strongly_connected_components
+from generate_自动化地图 import (ADD_STEP_TYPES, RECORD_TRIGGER_TYPES, UPDATE_STEP_TYPES, build_block_map,
+                              load_draft, workflow_title)
+from name_registry import WorkflowRefs
+
+# ========== 配置 ==========
+FILE_PATH = "【演示】成品布管理系统.base"
+MIN_CHAIN_LENGTH = 3  # 报告的触发链最少包含的工作流个数
+
+# 新增记录也会触发的记录类触发器
+ADD_TRIGGER_TYPES = ('AddRecordTrigger', 'ChangeRecordTrigger', 'ChangeRecordNewSatisfyTrigger')
+# 修改记录会触发的记录类触发器
+UPDATE_TRIGGER_TYPES = ('ChangeRecordTrigger', 'ChangeRecordNewSatisfyTrigger', 'SetRecordTrigger')
+
+
+def _field_refs(data):
+    """触发器配置中监听的字段引用"""
+    refs = [f.get('fieldId') for f in data.get('fields') or [] if isinstance(f, dict)]
+    refs.extend(data.get('fieldIds') or [])
+    refs.append(data.get('watchedFieldId'))
+    return [ref.strip('"') for ref in refs if isinstance(ref, str) and ref]
+
+
+def _resolve_table(refs, ref_tid):
+    if not isinstance(ref_tid, str) or not ref_tid:
+        return None
+    ref_tid = ref_tid.strip('"')
+    return refs.table_id(ref_tid) or ref_tid
+
+
+class WorkflowIO:
+    """单个工作流的触发端与写入端"""
+
+    def __init__(self, wf_id, title, enabled):
+        self.id = wf_id
+        self.title = title
+        self.enabled = enabled
+        self.trigger_type = None
+        self.trigger_table = None
+        self.watched = set()  # 监听的字段 ID；为空表示该表任意修改都触发
+        self.updates = {}  # 表ID -> 写入的字段 ID 集合
+        self.adds = set()  # 新增记录的表ID
+
+    @classmethod
+    def from_workflow(cls, wf, table_map, field_map, block_map):
+        draft = load_draft(wf)
+        if not isinstance(draft, dict):
+            draft = {}
+        refs = WorkflowRefs(wf.get('WorkflowExtra', {}).get('Extra', {}).get('TableMap', {}), field_map)
+        wf_id = wf.get('id', '未知')
+        item = cls(wf_id, workflow_title(wf_id, draft, refs, table_map, block_map), wf.get('status') == 1)
+
+        steps = [step for step in draft.get('steps') or [] if isinstance(step, dict)]
+        if steps and steps[0].get('type') in RECORD_TRIGGER_TYPES:
+            data = steps[0].get('data') or {}
+            item.trigger_type = steps[0]['type']
+            item.trigger_table = _resolve_table(refs, data.get('tableId'))
+            for ref in _field_refs(data):
+                real_tid, real_fid, _ = refs.resolve(ref)
+                if real_fid:
+                    item.watched.add(real_fid)
+
+        for step in steps[1:]:
+            step_type = step.get('type')
+            data = step.get('data') or {}
+            table_id = _resolve_table(refs, data.get('tableId'))
+            if not table_id:
+                continue
+            if step_type in ADD_STEP_TYPES:
+                item.adds.add(table_id)
+            elif step_type in UPDATE_STEP_TYPES:
+                written = item.updates.setdefault(table_id, set())
+                for value in data.get('values') or []:
+                    ref = value.get('fieldId') if isinstance(value, dict) else None
+                    if isinstance(ref, str) and ref:
+                        real_tid, real_fid, _ = refs.resolve(ref.strip('"'))
+                        written.add(real_fid or ref)
+        return item
+
+    def triggered_by(self, writer):
+        """
+        writer 的写入能否触发本工作流，返回经由的说明列表（空列表表示不能）。
+        - 新增记录：writer 在触发表中新增记录，且本工作流的触发器响应新增
+        - 修改记录：writer 修改触发表，且写入的字段与监听字段有交集（未监听具体字段时任意修改都算）
+        """
+        if not self.trigger_table:
+            return []
+        via = []
+        if self.trigger_type in ADD_TRIGGER_TYPES and self.trigger_table in writer.adds:
+            via.append(('add', None))
+        if self.trigger_type in UPDATE_TRIGGER_TYPES and self.trigger_table in writer.updates:
+            written = writer.updates[self.trigger_table]
+            if not self.watched:
+                via.append(('update', None))
+            else:
+                via.extend(('update', fid) for fid in sorted(written & self.watched))
+        return via
+
+
+class TriggerGraph:
+    """
+    工作流之间的连锁触发图。
+    - workflows: {工作流ID: WorkflowIO}
+    - edges: {A: {B: [(动作, 字段ID), ...]}}，表示 A 的写入会触发 B
+    """
+
+    def __init__(self):
+        self.workflows = {}
+        self.edges = {}
+        self.table_map = {}
+        self.field_map = {}
+
+    @classmethod
+    def from_document(cls, doc, include_disabled=False, compact=False):
+        """compact 为真时名称取自紧凑字段目录（见 BaseDocument.names）"""
+        graph = cls()
+        registry = doc.names(compact)
+        graph.table_map, graph.field_map = registry.table_map, registry.field_map
+        block_map = build_block_map(doc.snapshot or [])
+        workflows = doc.automation if isinstance(doc.automation, list) else []
+        for wf in workflows:
+            if not isinstance(wf, dict):
+                continue
+            item = WorkflowIO.from_workflow(wf, registry.table_map, registry.field_map, block_map)
+            if item.enabled or include_disabled:
+                graph.workflows[item.id] = item
+
+        # 按触发表建索引，只比较写入了该表的工作流
+        by_trigger_table = {}
+        for item in graph.workflows.values():
+            if item.trigger_table:
+                by_trigger_table.setdefault(item.trigger_table, []).append(item)
+        for writer in graph.workflows.values():
+            targets = {}
+            # 排序后遍历：边的顺序（以及导出结果）不随字符串哈希种子变化
+            for table_id in sorted(writer.adds | set(writer.updates)):
+                for reader in by_trigger_table.get(table_id, []):
+                    via = reader.triggered_by(writer)
+                    if via:
+                        targets.setdefault(reader.id, []).extend(via)
+            graph.edges[writer.id] = targets
+        return graph
+
+    # ---------- 分析 ----------
+
+    def edge_count(self):
+        return sum(len(targets) for targets in self.edges.values())
+
+    def components(self):
+        """强连通分量列表，按逆拓扑序排列：分量只指向排在它前面的分量"""
+        return strongly_connected_components(self.workflows, self.edges)
+
+    def cycles(self):
+        """触发环：包含多个工作流的强连通分量，以及自己触发自己的工作流"""
+        return [sorted(component) for component in self.components()
+                if len(component) > 1 or component[0] in self.edges.get(component[0], {})]
+
+    def longest_chains(self, min_length=MIN_CHAIN_LENGTH):
+        """
+        最长触发链：在强连通分量收缩后的有向无环图上，从每个没有上游的分量出发的最长路径。
+        返回 [(链长, [分量, ...]), ...]，链长为途经的工作流个数（环按成员数计），按链长降序。
+        """
+        components = self.components()
+        owner = {wf_id: i for i, component in enumerate(components) for wf_id in component}
+        successors = [set() for _ in components]
+        has_upstream = [False] * len(components)
+        for source, targets in self.edges.items():
+            for target in targets:
+                a, b = owner[source], owner[target]
+                if a != b:
+                    successors[a].add(b)
+                    has_upstream[b] = True
+
+        # 逆拓扑序：后继分量总是先算好
+        best = [0] * len(components)
+        best_next = [None] * len(components)
+        for i, component in enumerate(components):
+            best[i] = len(component)
+            for j in sorted(successors[i]):
+                if len(component) + best[j] > best[i]:
+                    best[i], best_next[i] = len(component) + best[j], j
+
+        chains = []
+        for i in range(len(components)):
+            if has_upstream[i] or best[i] < min_length:
+                continue
+            path, node = [], i
+            while node is not None:
+                path.append(sorted(components[node]))
+                node = best_next[node]
+            chains.append((best[i], path))
+        chains.sort(key=lambda c: c[0], reverse=True)
+        return chains
+
+    # ---------- 输出 ----------
+
+    def label(self, wf_id):
+        item = self.workflows.get(wf_id)
+        return f"「{item.title}」({wf_id})" if item else str(wf_id)
+
+    def describe_edge(self, source, target):
+        """A → B 经由的写入说明，如 修改「订单表」.「状态」"""
+        table_id = self.workflows[target].trigger_table
+        table_name = self.table_map.get(table_id, table_id)
+        parts = []
+        for action, field_id in self.edges.get(source, {}).get(target, []):
+            if action == 'add':
+                parts.append(f"新增「{table_name}」记录")
+            elif field_id:
+                parts.append(f"修改「{table_name}」.「{self.field_map.get((table_id, field_id), field_id)}」")
+            else:
+                parts.append(f"修改「{table_name}」记录")
+        return "、".join(dict.fromkeys(parts))
+
+    def to_json(self, min_length=MIN_CHAIN_LENGTH):
+        return {
+            'workflows': [{'id': item.id, 'title': item.title, 'enabled': item.enabled, 'trigger': item.trigger_type,
+                           'trigger_table': item.trigger_table} for item in self.workflows.values()],
+            'edges': [{'source': source, 'target': target, 'via': self.describe_edge(source, target)}
+                      for source, targets in self.edges.items() for target in targets],
+            'cycles': self.cycles(),
+            'chains': [{'length': length, 'path': path} for length, path in self.longest_chains(min_length)],
+        }
+
+
+def print_report(graph, min_length=MIN_CHAIN_LENGTH):
+    """打印触发环和长触发链"""
+    cycles = graph.cycles()
+    print(f"\n🔁 触发环 {len(cycles)} 个")
+    for members in cycles:
+        print(f"\n  - 环内 {len(members)} 个工作流: {', '.join(members)}")
+        member_set = set(members)
+        for source in members:
+            for target in graph.edges.get(source, {}):
+                if target in member_set:
+                    print(f"      {graph.label(source)} → {graph.label(target)}  [{graph.describe_edge(source, target)}]")
+
+    chains = graph.longest_chains(min_length)
+    print(f"\n⛓️ 长度 ≥ {min_length} 的触发链 {len(chains)} 条")
+    for length, path in chains:
+        hops = [("[环: " + ", ".join(part) + "]") if len(part) > 1 else part[0] for part in path]
+        print(f"\n  - 链长 {length}: {' → '.join(hops)}")
+        for part in path:
+            print(f"      {', '.join(graph.label(wf_id) for wf_id in part)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自动化连锁触发检测")
+    parser.add_argument("file", nargs="?", default=FILE_PATH, help=".base 文件路径")
+    parser.add_argument("--min-length", type=int, default=MIN_CHAIN_LENGTH, help="报告的触发链最少包含的工作流个数")
+    parser.add_argument("--all", action="store_true", help="包含已禁用的工作流")
+    parser.add_argument("--export", metavar="JSON路径", help="导出触发图、触发环和触发链为 JSON")
+    parser.add_argument("--compact-names", action="store_true", help="用紧凑字段目录 (FieldCatalog) 保存名称：常驻内存更小，构建和查找稍慢，适合超大 .base")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("自动化连锁触发检测")
+    print("=" * 50)
+
+    print(f"\n[1/2] 读取文件: {args.file}")
+    try:
+        doc = BaseDocument.load(args.file)
+    except Exception as e:
+        print(f"❌ 文件读取失败: {e}")
+        sys.exit(1)
+
+    print("[2/2] 构建触发图...")
+    start = time.perf_counter()
+    graph = TriggerGraph.from_document(doc, include_disabled=args.all, compact=args.compact_names)
+    print(f"    - 工作流 {len(graph.workflows)} 个{'' if args.all else '（已启用）'}，"
+          f"连锁触发边 {graph.edge_count()} 条，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    print_report(graph, args.min_length)
+
+    if args.export:
+        with open(args.export, 'w', encoding='utf-8') as f:
+            json.dump(graph.to_json(args.min_length), f, ensure_ascii=False, indent=1)
+        print(f"\n✅ 已导出: {args.export}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共配置：脚本按 `python3 scripts/xxx.py` 方式运行、互相直接 import，
+这里把 scripts/ 和 benchmarks/ 加入 sys.path，并提供合成 .base 与名称映射。
+"""
+
+import base64
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'scripts'), os.path.join(ROOT, 'benchmarks')]
+
+import synthetic_base  # noqa: E402
+from name_registry import NameRegistry  # noqa: E402
+
+# 手写的小快照：两张表，字段 ID 与名称一一对应，便于断言翻译结果
+SNAPSHOT = [{"schema": {
+    "tableMap": {"tblOrder": {"name": "订单"}, "tblItem": {"name": "明细"}},
+    "data": {"tables": [
+        {"meta": {"id": "tblOrder", "name": "订单"}, "fieldMap": {
+            "fldNo": {"name": "订单号", "type": 1},
+            "fldCust": {"name": "客户", "type": 1},
+            "fldState": {"name": "状态", "type": 3},
+        }},
+        {"meta": {"id": "tblItem", "name": "明细"}, "fieldMap": {
+            "fldOrderNo": {"name": "所属订单", "type": 1},
+            "fldQty": {"name": "数量", "type": 2},
+            "fldKind": {"name": "类别", "type": 3},
+        }},
+    ]},
+}}]
+
+
+@pytest.fixture
+def names():
+    """手写快照的 NameRegistry"""
+    return NameRegistry.from_snapshot(SNAPSHOT)
+
+
+# 注入到每张表的公式字段：引用不存在的表和字段，生成文档时会登记完整性记录
+BROKEN_FIELD = {"name": "失效引用", "type": 20,
+                "property": {"formula": "bitable::$table[tblGone].$column[fldGone] & $field[fldMissing]"}}
+
+
+def unpack(data):
+    """synthetic_base.pack 的逆操作"""
+    return json.loads(gzip.decompress(base64.b64decode(data)))
+
+
+def write_synthetic(path, broken=False, edit=None, **kwargs):
+    """
+    写出合成 .base。broken 为真时每张表追加 BROKEN_FIELD；
+    edit(tables) 可直接修改快照中的表结构列表（用于模拟改动某张表）。
+    """
+    base = synthetic_base.build_base(**kwargs)
+    snapshot = unpack(base['gzipSnapshot'])
+    tables = snapshot[0]['schema']['data']['tables']
+    if broken:
+        for table in tables:
+            table['fieldMap']['fldBroken'] = dict(BROKEN_FIELD)
+    if edit is not None:
+        edit(tables)
+    base['gzipSnapshot'] = synthetic_base.pack(snapshot)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(base, f, ensure_ascii=False)
+    return str(path)
+
+
+@pytest.fixture
+def base_path(tmp_path):
+    """小规模合成 .base（6 张表、12 个工作流），每张表带一个失效引用字段"""
+    return write_synthetic(tmp_path / "synthetic.base", broken=True, tables=6, fields=10, workflows=12)
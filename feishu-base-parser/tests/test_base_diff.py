@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""base_diff：新旧两侧各用自己的公式翻译器"""
+
+import base_diff
+import generate_全量字段表
+from base_loader import BaseDocument
+from conftest import write_synthetic
+
+TABLE0, TABLE1 = "tbl00000000syn", "tbl00000001syn"
+TARGET = "fld0000100000"  # 数据表1 的第一个字段
+FORMULA = f"bitable::$table[{TABLE1}].$column[{TARGET}]"
+
+
+def reference_target(tables):
+    tables[0]['fieldMap']['fldBroken']['property'] = {'formula': FORMULA}
+
+
+def rename_and_edit(tables):
+    reference_target(tables)
+    tables[0]['fieldMap']['fldBroken']['property']['formula'] += ' & "新"'
+    tables[1]['fieldMap'][TARGET]['name'] = "改名后"
+
+
+def load_pair(tmp_path):
+    kwargs = dict(broken=True, tables=3, fields=6, workflows=2)
+    old = write_synthetic(tmp_path / "old.base", edit=reference_target, **kwargs)
+    new = write_synthetic(tmp_path / "new.base", edit=rename_and_edit, **kwargs)
+    return BaseDocument.load(old), BaseDocument.load(new)
+
+
+def test_formula_change_translated_with_each_side_names(tmp_path, monkeypatch):
+    old_doc, new_doc = load_pair(tmp_path)
+    old_name = old_doc.registry.field_map[(TABLE1, TARGET)]
+
+    # 比对过程中不应经过 get_translator 反复重建共享翻译器
+    built = []
+    monkeypatch.setattr(generate_全量字段表, 'FormulaTranslator',
+                        lambda *args, **kw: built.append(args) or base_diff.FormulaTranslator(*args, **kw))
+    records = base_diff.diff_documents(old_doc, new_doc)
+    assert built == []
+
+    modified = [r for r in records if r['kind'] == 'field' and r['action'] == 'modified' and r['id'] == 'fldBroken']
+    assert len(modified) == 1
+    change = next(c for c in modified[0]['changes'] if c['attr'] == '公式')
+    assert change['old'] == f"「数据表1」.「{old_name}」"
+    assert change['new'] == '「数据表1」.「改名后」 & "新"'
+
+
+def test_each_side_translates_with_its_own_cache(tmp_path, monkeypatch):
+    old_doc, new_doc = load_pair(tmp_path)
+    sides = []
+    init = base_diff.DiffSide.__init__
+    monkeypatch.setattr(base_diff.DiffSide, '__init__', lambda self, doc: (init(self, doc), sides.append(self))[0])
+    base_diff.diff_documents(old_doc, new_doc)
+
+    old, new = sides
+    assert old.translator.bound_to(old.table_map, old.field_map)
+    assert new.translator.bound_to(new.table_map, new.field_map)
+    # 交替比较新旧字段后，各自缓存中仍保留本侧的翻译结果
+    assert old.translator.cache_info().currsize > 0 and new.translator.cache_info().currsize > 0
+    hits = old.translator.cache_info().hits
+    old.translator.translate(FORMULA, TABLE0)
+    assert old.translator.cache_info().hits == hits + 1
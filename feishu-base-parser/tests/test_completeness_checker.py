@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""completeness_checker：合并正则的首字符过滤与单遍扫描，结果须与逐个模式扫描一致"""
+
+import contextlib
+import io
+import os
+import re
+
+import pytest
+
+import completeness_checker
+import generate_全量字段表
+import generate_自动化地图
+from base_loader import BaseDocument
+from completeness_checker import ID_PATTERNS, RESIDUE_FIRST_CHARS, _first_chars, scan_residue
+
+SAMPLE = """# 全量字段表
+前言里的 [未知字段:fldIntro] 不属于任何表
+
+## 订单
+| **客户** | 公式 | `「[已删除的表:tblGone]」.「[未知字段:fldGone]」` |
+| **状态** | 单选 | 条件: 状态 is 已完成 / contains 退货 / isNot 空 |
+| 多行 | 说明 | this island contains an isEmpty check |
+## 标题行内 [未知表:tblInHeader] 与 isNotEmpty
+- [步骤3的结果] 写入 [步骤12的字段]，[步骤2的循环当前记录]
+- {"default_url": "{引用}"} 与 {"default_url":"{引用}"}
+## 明细
+|[未知选项:opt1]|[未知引用:ref[嵌套]]|doesNotContain|
+[已删除的字段:fldLast]"""
+
+
+def old_scan(content):
+    """原实现：逐个模式 re.finditer，行号和所属标题按截至匹配位置的前缀计算"""
+    hits = []
+    for i, (pattern, _, _) in enumerate(ID_PATTERNS):
+        for match in re.finditer(pattern, content):
+            start = match.start()
+            line_start = content.rfind('\n', 0, start) + 1
+            line_end = content.find('\n', start)
+            if line_end == -1:
+                line_end = len(content)
+            header = None
+            for header in re.finditer(r'^##\s+(.*?)$', content[:start], re.MULTILINE):
+                pass
+            hits.append({
+                'pattern': i,
+                'text': match.group(0),
+                'id': match.group(1) if match.lastindex and match.lastindex >= 1 else match.group(0),
+                'line': content[:start].count('\n') + 1,
+                'line_content': content[line_start:line_end],
+                'table_name': header.group(1).strip() if header else "未知表",
+            })
+    return hits
+
+
+def test_guard_derived_from_patterns():
+    assert set(RESIDUE_FIRST_CHARS) == {'[', 'd', 'i', 'c'}
+    # 每个模式在样例中的每个匹配，首字符都在过滤集合内
+    for pattern, _, _ in ID_PATTERNS:
+        for match in re.finditer(pattern, SAMPLE):
+            assert match.group(0)[0] in RESIDUE_FIRST_CHARS
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    (r'\[未知:(\w+)\]', {'['}),
+    (r'\b(is|isNot)\b', {'i'}),
+    (r'(?:foo|\$bar|(x|y)z)', {'f', '$', 'x', 'y'}),
+    (r'abc+', {'a'}),
+])
+def test_first_chars(pattern, expected):
+    assert _first_chars(pattern) == expected
+
+
+@pytest.mark.parametrize('pattern', [r'\d+', r'\w', r'a?b', r'[ab]c', r'(a|b)?c', r'(a|)b', r'(?=x)', r'.x', r'(?P<n>x)'])
+def test_first_chars_rejects_unknown_leading_syntax(pattern):
+    with pytest.raises(ValueError):
+        _first_chars(pattern)
+
+
+def test_scan_matches_per_pattern_finditer():
+    hits = scan_residue(SAMPLE)
+    assert hits == old_scan(SAMPLE)
+    # 样例覆盖了全部模式，以及标题行内的匹配
+    assert {hit['pattern'] for hit in hits} == set(range(len(ID_PATTERNS)))
+    assert any(hit['table_name'] == '标题行内' for hit in hits)
+
+
+@pytest.mark.parametrize('content', ['', 'no residue here', 'is', '\n\n## 表\nis\n', 'isis is-is_is'])
+def test_scan_edge_cases(content):
+    assert scan_residue(content) == old_scan(content)
+
+
+def test_scan_matches_on_generated_documents(base_path, tmp_path):
+    doc = BaseDocument.load(base_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for module in (generate_全量字段表, generate_自动化地图):
+            path = os.path.join(str(tmp_path), module.OUTPUT_PATH)
+            assert module.run(doc, output_path=path)
+            with open(path, encoding='utf-8') as f:
+                content = f.read()
+            hits = completeness_checker.scan_residue(content)
+            assert hits and hits == old_scan(content)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""formula.py 解析器：FILTER 条件提取、跨表引用、容错，以及与原正则实现的输出对照"""
+
+import re
+
+import pytest
+
+import generate_全量字段表
+import generate_关联关系图
+from formula import filter_conditions, find_table_refs, parse_formula
+
+ITEMS = 'bitable::$table[tblItem]'
+
+
+def plain(field_id, op, right):
+    return f"{field_id} {op} {right}"
+
+
+def conditions(predicate):
+    return filter_conditions(f"{ITEMS}.FILTER({predicate})", plain)
+
+
+# ========== 括号嵌套 ==========
+def test_nested_parentheses_keep_whole_right_operand():
+    formula = f"{ITEMS}.FILTER(CurrentValue.$column[fldOrderNo]=MID($field[fldNo],1,(2+3))).$column[fldQty].SUM()"
+    assert filter_conditions(formula, plain) == ['fldOrderNo = MID($field[fldNo],1,(2+3))']
+
+
+def test_grouped_predicate_and_function_style_filter():
+    assert conditions("((CurrentValue.$column[fldKind]=1))") == ['fldKind = 1']
+    formula = f'FILTER({ITEMS}, CurrentValue.$column[fldKind]="a")'
+    assert filter_conditions(formula, plain) == ['fldKind = "a"']
+
+
+def test_every_filter_is_collected_in_order():
+    formula = (f"{ITEMS}.FILTER(CurrentValue.$column[fldKind]=1).$column[fldQty].SUM()"
+               f" + {ITEMS}.FILTER(CurrentValue.$column[fldQty]!=0).$column[fldQty].COUNTA()")
+    assert filter_conditions(formula, plain) == ['fldKind = 1', 'fldQty != 0']
+
+
+# ========== 且 / 或 优先级 ==========
+def test_and_binds_tighter_than_or():
+    predicate = 'CurrentValue.$column[fldKind]="a" || CurrentValue.$column[fldQty]=1 && CurrentValue.$column[fldOrderNo]=2'
+    assert conditions(predicate) == ['(fldKind = "a" 或 fldQty = 1 且 fldOrderNo = 2)']
+
+
+def test_parenthesised_or_inside_and():
+    predicate = '(CurrentValue.$column[fldKind]="a" || CurrentValue.$column[fldQty]=1) && CurrentValue.$column[fldOrderNo]=2'
+    assert conditions(predicate) == ['(fldKind = "a" 或 fldQty = 1)', 'fldOrderNo = 2']
+
+
+def test_and_or_functions_match_operators():
+    functions = conditions('AND(CurrentValue.$column[fldKind]=1, OR(CurrentValue.$column[fldQty]=1, CurrentValue.$column[fldQty]!=2))')
+    operators = conditions('CurrentValue.$column[fldKind]=1 && (CurrentValue.$column[fldQty]=1 || CurrentValue.$column[fldQty]!=2)')
+    assert functions == operators == ['fldKind = 1', '(fldQty = 1 或 fldQty != 2)']
+
+
+def test_conditions_listed_in_source_order():
+    predicate = 'CurrentValue.$column[fldQty]!=0 && CurrentValue.$column[fldKind]=1'
+    assert conditions(predicate) == ['fldQty != 0', 'fldKind = 1']
+
+
+def test_comparisons_not_on_current_value_are_ignored():
+    assert conditions('CurrentValue.$column[fldQty]>1 && $field[fldNo]=1') == []
+
+
+# ========== 字符串字面量 ==========
+def test_string_literal_with_paren_and_comma():
+    predicate = 'CurrentValue.$column[fldKind]="x),y" && CurrentValue.$column[fldQty]=1'
+    assert conditions(predicate) == ['fldKind = "x),y"', 'fldQty = 1']
+    assert conditions("CurrentValue.$column[fldKind]='a,(b'") == ["fldKind = 'a,(b'"]
+
+
+def test_table_refs_inside_strings_are_ignored():
+    formula = f'CONCAT("{ITEMS}", bitable::$table[tblOrder].$column[fldNo], "bitable::$table[tblOther]")'
+    assert find_table_refs(formula) == ['tblOrder']
+
+
+def test_table_refs_in_first_seen_order():
+    formula = f"bitable::$table[tblOrder].$column[fldNo] & {ITEMS}.$column[fldQty] & bitable::$table[tblOrder].$column[fldCust]"
+    assert find_table_refs(formula) == ['tblOrder', 'tblItem', 'tblOrder']
+    assert generate_关联关系图.find_cross_table_references(formula, 'tblItem') == ['tblOrder']
+
+
+# ========== 容错 ==========
+@pytest.mark.parametrize('formula', [
+    f'{ITEMS}.FILTER(CurrentValue.$column[fldKind]="abc',
+    f'{ITEMS}.FILTER((((CurrentValue.$column[fldKind]=1',
+    f'{ITEMS}.FILTER(CurrentValue.$column[fldKind]=',
+    f'{ITEMS}.FILTER(',
+    'SUM(1,,2))) + )(',
+    '"unterminated',
+    '$field[fldNo',
+    '(' * 5000,
+    '-' * 5000 + '1',
+])
+def test_malformed_input_does_not_raise(formula):
+    assert parse_formula(formula) is not None
+    assert isinstance(filter_conditions(formula, plain), list)
+    assert isinstance(find_table_refs(formula), list)
+
+
+def test_unterminated_filter_keeps_condition():
+    assert filter_conditions(f'{ITEMS}.FILTER(CurrentValue.$column[fldKind]=1', plain) == ['fldKind = 1']
+    assert filter_conditions(f'{ITEMS}.FILTER((CurrentValue.$column[fldKind]=1', plain) == ['fldKind = 1']
+
+
+def test_empty_formula():
+    assert parse_formula('') is None
+    assert filter_conditions('', plain) == []
+    assert find_table_refs(None) == []
+
+
+# ========== 与原正则实现对照 ==========
+# 原实现（改为语法树之前）的正则，按原样保留用于对照
+OLD_FILTER_RE = re.compile(r'\.FILTER\((.*?)\)', re.DOTALL)
+OLD_FIELD_EQ_RE = re.compile(r'CurrentValue\.\$(?:column|field)\[(.*?)\]\s*=\s*([^&\)]+)')
+OLD_FIELD_NEQ_RE = re.compile(r'CurrentValue\.\$(?:column|field)\[(.*?)\]\s*!=\s*([^&\)]+)')
+OLD_GRAPH_EQ_RE = re.compile(r'CurrentValue\.「([^」]+)」\s*=\s*([^&\)]+)')
+OLD_GRAPH_NEQ_RE = re.compile(r'CurrentValue\.「([^」]+)」\s*!=\s*([^&\)]+)')
+
+
+def old_field_table_filter(formula, current_table_id, table_map, field_map):
+    """原 generate_全量字段表.extract_filter_conditions_from_formula"""
+    translate = generate_全量字段表.translate_formula
+    conds = []
+    for filter_expr in OLD_FILTER_RE.findall(formula):
+        for regex, symbol in ((OLD_FIELD_EQ_RE, '='), (OLD_FIELD_NEQ_RE, '≠')):
+            for left_fid, right_expr in regex.findall(filter_expr):
+                left_fname = field_map.get((current_table_id, left_fid), left_fid)
+                if left_fname == left_fid:
+                    left_fname = field_map.find(left_fid) or left_fid
+                right = translate(right_expr.strip(), current_table_id, table_map, field_map)
+                conds.append(f"「{left_fname}」{symbol} {right}")
+    return " 且 ".join(conds)
+
+
+def old_graph_filter(formula, current_table_id, table_map, field_map):
+    """原 generate_关联关系图.extract_filter_conditions（作用于翻译后的公式）"""
+    translated = generate_关联关系图.translate_formula(formula, current_table_id, table_map, field_map)
+    conds = []
+    for filter_expr in OLD_FILTER_RE.findall(translated):
+        for regex, symbol in ((OLD_GRAPH_EQ_RE, '='), (OLD_GRAPH_NEQ_RE, '≠')):
+            for left_fname, right_expr in regex.findall(filter_expr):
+                conds.append(f"「{left_fname}」{symbol} {right_expr.strip()}")
+    return "筛选条件: " + " 且 ".join(conds) if conds else ""
+
+
+# 原正则能正确处理的写法：条件右值不含括号，一个 FILTER 内不同时出现 = 与 !=
+LEGACY_FORMULAS = [
+    f"{ITEMS}.FILTER(CurrentValue.$column[fldOrderNo]=bitable::$table[tblOrder].$column[fldNo]).$column[fldQty].SUM()",
+    f"{ITEMS}.FILTER(CurrentValue.$column[fldOrderNo]=$field[fldNo]&&CurrentValue.$column[fldKind]=\"退货\").$column[fldQty].SUM()",
+    f"{ITEMS}.FILTER(CurrentValue.$field[fldOrderNo]=$field[fldNo]).$column[fldQty].MAX()",
+    f"{ITEMS}.FILTER(CurrentValue.$column[fldUnknown]=$field[fldCust]).COUNTA()",
+    f"{ITEMS}.FILTER(CurrentValue.$column[fldKind]=1).COUNTA() + {ITEMS}.FILTER(CurrentValue.$column[fldQty]!=2).COUNTA()",
+    f"{ITEMS}.$column[fldQty].SUM()",
+    "$field[fldNo] & \"-\" & $field[fldCust]",
+]
+
+# 同一 FILTER 内 = 在前、!= 在后：原关联关系图（作用于翻译后的公式）能正确处理；
+# 原字段表的 \[(.*?)\] 会从第一个字段一直匹配到 != 前的字段，输出错误，不做对照
+MIXED_FORMULAS = [
+    f"{ITEMS}.FILTER(CurrentValue.$column[fldOrderNo]=$field[fldNo]&&CurrentValue.$column[fldKind]!=\"退货\").$column[fldQty].SUM()",
+    f"{ITEMS}.FILTER(CurrentValue.$column[fldKind] = \"A\" && CurrentValue.$column[fldQty] != 0).COUNTA()",
+]
+
+
+@pytest.mark.parametrize('formula', LEGACY_FORMULAS)
+def test_field_table_matches_old_translation(formula, names):
+    args = (formula, 'tblOrder', names.table_map, names.field_map)
+    assert generate_全量字段表.extract_filter_conditions_from_formula(*args) == old_field_table_filter(*args)
+
+
+@pytest.mark.parametrize('formula', LEGACY_FORMULAS + MIXED_FORMULAS)
+def test_relation_graph_matches_old_translation(formula, names):
+    args = (formula, 'tblOrder', names.table_map, names.field_map)
+    assert generate_关联关系图.extract_filter_conditions(*args) == old_graph_filter(*args)
+
+
+def test_legacy_formulas_produce_conditions(names):
+    """对照用例确实覆盖了有条件的情况，而不是两边都返回空"""
+    produced = [generate_全量字段表.extract_filter_conditions_from_formula(f, 'tblOrder', names.table_map, names.field_map)
+                for f in LEGACY_FORMULAS + MIXED_FORMULAS]
+    assert sum(1 for text in produced if text) == 7
+    assert produced[1] == '「所属订单」= 「订单号」 且 「类别」= "退货"'
+    assert produced[-2:] == ['「所属订单」= 「订单号」 且 「类别」≠ "退货"', '「类别」= "A" 且 「数量」≠ 0']
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""fragment_cache：命中 / 未命中 / 缓存文件被外部删除 / prune，以及增量生成与完整生成的输出对照"""
+
+import contextlib
+import io
+import os
+import re
+
+import completeness_sink
+import generate_全量字段表
+import generate_自动化地图
+from base_loader import BaseDocument
+from conftest import write_synthetic
+from fragment_cache import FragmentCache, splice
+
+ITEMS = [{'id': i, 'body': f"内容{i}"} for i in range(4)]
+
+
+class Renderer:
+    """记录每次 render_many 收到的下标；结果为 (片段, 记录)"""
+
+    def __init__(self, items, on_call=None):
+        self.items = items
+        self.calls = []
+        self.on_call = on_call
+
+    def __call__(self, indices):
+        self.calls.append(list(indices))
+        if self.on_call:
+            self.on_call(self)
+        return iter([(f"片段{self.items[i]['id']}\n", [{'type': '测试', 'id': str(i)}]) for i in indices])
+
+
+def run_splice(cache, items=ITEMS, renderer=None):
+    renderer = renderer or Renderer(items)
+    out = list(splice(items, cache, renderer, text_of=lambda r: r[0], records_of=lambda r: r[1]))
+    return [(text, records) for text, _, records in out], renderer
+
+
+def fragment_files(cache):
+    return sorted(name for name in os.listdir(cache.path) if name.endswith('.md'))
+
+
+def test_miss_then_hit(tmp_path):
+    cache = FragmentCache(str(tmp_path), "测试", {'a': 1})
+    first, renderer = run_splice(cache)
+    assert renderer.calls == [[0, 1, 2, 3]]
+    assert (cache.hits, cache.misses) == (0, 4)
+
+    cache = FragmentCache(str(tmp_path), "测试", {'a': 1})
+    second, renderer = run_splice(cache)
+    assert renderer.calls == [[]]
+    assert (cache.hits, cache.misses) == (4, 0)
+    # 命中时片段和完整性记录都取自缓存
+    assert second == first
+    assert second[2] == ("片段2\n", [{'type': '测试', 'id': '2'}])
+
+
+def test_context_change_invalidates_everything(tmp_path):
+    run_splice(FragmentCache(str(tmp_path), "测试", {'a': 1}))
+    cache = FragmentCache(str(tmp_path), "测试", {'a': 2})
+    _, renderer = run_splice(cache)
+    assert renderer.calls == [[0, 1, 2, 3]]
+
+
+def test_changed_item_rerendered_alone(tmp_path):
+    run_splice(FragmentCache(str(tmp_path), "测试"))
+    items = [dict(item) for item in ITEMS]
+    items[1]['body'] = "改动"
+    cache = FragmentCache(str(tmp_path), "测试")
+    out, renderer = run_splice(cache, items)
+    assert renderer.calls == [[1]]
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert [text for text, _ in out] == [f"片段{i}\n" for i in range(4)]
+
+
+def test_file_deleted_before_run_is_a_miss(tmp_path):
+    cache = FragmentCache(str(tmp_path), "测试")
+    run_splice(cache)
+    os.remove(os.path.join(cache.path, fragment_files(cache)[0]))
+
+    cache = FragmentCache(str(tmp_path), "测试")
+    out, renderer = run_splice(cache)
+    assert sum(len(call) for call in renderer.calls) == 1
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert [text for text, _ in out] == [f"片段{i}\n" for i in range(4)]
+
+
+def test_file_deleted_after_check_is_rerendered(tmp_path):
+    cache = FragmentCache(str(tmp_path), "测试")
+    first, _ = run_splice(cache)
+
+    # splice 先检查哪些项已缓存，再调用 render_many；在这之间删掉第 2 项的缓存文件
+    cache = FragmentCache(str(tmp_path), "测试")
+    victim = os.path.join(cache.path, cache.key(ITEMS[2]) + '.md')
+
+    def delete_once(renderer):
+        if len(renderer.calls) == 1:
+            os.remove(victim)
+
+    out, renderer = run_splice(cache, renderer=Renderer(ITEMS, delete_once))
+    assert renderer.calls == [[], [2]]
+    assert out == first
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert os.path.exists(victim)
+
+
+def test_prune_removes_unused_fragments(tmp_path):
+    run_splice(FragmentCache(str(tmp_path), "测试"))
+    cache = FragmentCache(str(tmp_path), "测试")
+    stray = os.path.join(cache.path, "残留.md.123.tmp")
+    open(stray, 'w').close()
+
+    run_splice(cache, ITEMS[:2])
+    # 未用到的 2 个片段及其记录文件，外加中断残留的临时文件
+    assert cache.prune() == 5
+    assert fragment_files(cache) == sorted(cache.key(item) + '.md' for item in ITEMS[:2])
+    assert sorted(os.listdir(cache.path)) == sorted(
+        cache.key(item) + ext for item in ITEMS[:2] for ext in ('.md', '.json'))
+    assert cache.prune() == 0
+
+
+def test_without_cache_renders_everything():
+    out, renderer = run_splice(None)
+    assert renderer.calls == [[0, 1, 2, 3]]
+    assert len(out) == 4
+
+
+# ========== 增量生成 ==========
+GENERATORS = (generate_全量字段表, generate_自动化地图)
+SUMMARY_RE = re.compile(r'缓存命中 (\d+) 个，重新渲染 (\d+) 个')
+
+
+def generate(base_path, out_dir, cache_dir=None):
+    """生成字段表和自动化地图，返回 ({文件名: 内容}, 完整性记录, [(命中, 重新渲染), ...])"""
+    os.makedirs(out_dir, exist_ok=True)
+    doc = BaseDocument.load(base_path)
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log), completeness_sink.session() as sink:
+        for module in GENERATORS:
+            assert module.run(doc, output_path=os.path.join(out_dir, module.OUTPUT_PATH), cache_dir=cache_dir)
+    documents = {}
+    for module in GENERATORS:
+        with open(os.path.join(out_dir, module.OUTPUT_PATH), encoding='utf-8') as f:
+            documents[module.OUTPUT_PATH] = [line for line in f if not line.startswith('> 生成时间')]
+    stats = [tuple(map(int, m)) for m in SUMMARY_RE.findall(log.getvalue())]
+    return documents, sink.records, stats
+
+
+def change_one_formula(tables):
+    tables[2]['fieldMap']['fldBroken']['property'] = {'formula': '$field[fldOther] & "改动"'}
+
+
+def test_incremental_generation_matches_full_run(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    base = write_synthetic(tmp_path / "a.base", broken=True, tables=6, fields=10, workflows=12)
+
+    first = generate(base, str(tmp_path / "1"), cache_dir)
+    second = generate(base, str(tmp_path / "2"), cache_dir)
+    assert first[2] == [(0, 6), (0, 12)]
+    assert second[2] == [(6, 0), (12, 0)]
+    assert second[:2] == first[:2] == generate(base, str(tmp_path / "full"))[:2]
+
+    # 只改动一张表：该表重新渲染，其余命中；结果与不使用缓存完整生成一致
+    changed = write_synthetic(tmp_path / "b.base", broken=True, edit=change_one_formula,
+                              tables=6, fields=10, workflows=12)
+    cached = generate(changed, str(tmp_path / "3"), cache_dir)
+    full = generate(changed, str(tmp_path / "full-changed"))
+    assert cached[2] == [(5, 1), (12, 0)]
+    assert cached[:2] == full[:2]
+    assert cached[0] != first[0]
+    assert any('[未知字段:fldOther]' in r['text'] for r in cached[1])
+
+    # 上一版本该表的片段已被清理
+    namespace = os.path.join(cache_dir, "全量字段表")
+    assert len([name for name in os.listdir(namespace) if name.endswith('.md')]) == 6
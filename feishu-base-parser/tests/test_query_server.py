@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""query_server：JSON-RPC 通知、批量请求、未知方法、参数校验与执行异常"""
+
+import io
+import json
+
+import pytest
+
+import query_server
+from query_server import (INVALID_PARAMS, INVALID_REQUEST, METHOD_NOT_FOUND, PARSE_ERROR, QUERY_ERROR,
+                          handle_line, serve_stdio)
+
+
+@pytest.fixture
+def index(base_path):
+    return query_server.load_index(base_path)
+
+
+def call(index, request):
+    response = handle_line(index, json.dumps(request, ensure_ascii=False))
+    return None if response is None else json.loads(response)
+
+
+def request(method, params=None, request_id=1):
+    req = {'jsonrpc': '2.0', 'method': method, 'id': request_id}
+    if params is not None:
+        req['params'] = params
+    return req
+
+
+def notification(method, params=None):
+    req = request(method, params)
+    del req['id']
+    return req
+
+
+def error_code(response):
+    return response['error']['code']
+
+
+# ========== 正常调用 ==========
+def test_named_and_positional_params(index):
+    named = call(index, request('find_field', {'name': '失效引用', 'limit': 2}))
+    positional = call(index, request('find_field', ['失效引用', False, 2], request_id='a'))
+    assert positional['id'] == 'a'
+    assert named['result']['total'] == positional['result']['total'] == 6
+    assert len(named['result']['fields']) == 2
+    assert 'elapsed_ms' in named['result']
+
+
+def test_params_optional_and_string_numbers_accepted(index):
+    assert call(index, request('stats'))['result']['nodes']['table'] == 6
+    assert len(call(index, request('find_field', {'name': '失效引用', 'limit': '3'}))['result']['fields']) == 3
+
+
+# ========== 通知 ==========
+def test_notification_has_no_response(index):
+    assert call(index, notification('stats')) is None
+    # 出错的通知同样不返回响应
+    assert call(index, notification('no_such_method')) is None
+    assert call(index, notification('find_field', {'bad': 1})) is None
+
+
+def test_null_id_is_a_request_not_a_notification(index):
+    response = call(index, request('stats', request_id=None))
+    assert response['id'] is None and 'result' in response
+
+
+def test_batch_of_only_notifications_returns_nothing(index):
+    assert call(index, [notification('stats'), notification('no_such_method')]) is None
+
+
+def test_batch_skips_notifications_and_keeps_order(index):
+    responses = call(index, [request('stats', request_id=1), notification('stats'),
+                             request('no_such_method', request_id=2), request('find_field', {}, request_id=3)])
+    assert [r['id'] for r in responses] == [1, 2, 3]
+    assert 'result' in responses[0]
+    assert [error_code(r) for r in responses[1:]] == [METHOD_NOT_FOUND, INVALID_PARAMS]
+
+
+def test_empty_batch_and_parse_error(index):
+    assert error_code(call(index, [])) == INVALID_REQUEST
+    assert error_code(json.loads(handle_line(index, '{"method": '))) == PARSE_ERROR
+    assert error_code(call(index, {'id': 1})) == INVALID_REQUEST
+
+
+def test_serve_stdio_writes_one_line_per_response(index):
+    lines = [json.dumps(notification('stats')), '', json.dumps(request('stats', request_id=7)),
+             json.dumps([notification('stats')])]
+    out = io.StringIO()
+    serve_stdio(index, io.StringIO("\n".join(lines) + "\n"), out)
+    written = out.getvalue().splitlines()
+    assert len(written) == 1 and json.loads(written[0])['id'] == 7
+
+
+# ========== 未知方法与参数校验 ==========
+@pytest.mark.parametrize('method', ['no_such_method', 'resolve', '_stats', '__init__'])
+def test_unknown_method(index, method):
+    response = call(index, request(method))
+    assert error_code(response) == METHOD_NOT_FOUND
+    assert response['id'] == 1
+
+
+@pytest.mark.parametrize('method, params', [
+    ('find_field', {}),                               # 缺少必填参数
+    ('find_field', {'name': 'x', 'bogus': 1}),        # 多余的参数
+    ('find_field', ['x', False, 1, 'extra']),         # 位置参数过多
+    ('find_field', {'name': 'x', 'limit': 'abc'}),    # 无法转为整数
+    ('find_field', {'name': 'x', 'limit': -1}),       # 负数
+    ('find_field', {'name': 'x', 'limit': True}),     # 布尔值不算整数
+    ('impact', {'node': '数据表0', 'depth': [1]}),
+    ('stats', ['x']),
+    ('stats', 'x'),                                   # params 既不是数组也不是对象
+])
+def test_bad_params(index, method, params):
+    response = call(index, request(method, params))
+    assert error_code(response) == INVALID_PARAMS
+    assert response['error']['message'].startswith('参数错误')
+
+
+# ========== 执行中的异常 ==========
+def test_query_error_is_not_invalid_params(index):
+    response = call(index, request('workflows_touching', {'field': '不存在的字段'}))
+    assert error_code(response) == QUERY_ERROR
+    assert '不存在的字段' in response['error']['message']
+
+
+@pytest.mark.parametrize('exc', [TypeError('内部 TypeError'), ValueError('内部 ValueError'), KeyError('x')])
+def test_exception_during_execution_is_logged_query_error(index, monkeypatch, capsys, exc):
+    def broken(node, depth=None):
+        raise exc
+    monkeypatch.setattr(index, 'impact', broken)
+    response = call(index, request('impact', {'node': '数据表0'}))
+    assert error_code(response) == QUERY_ERROR
+    assert type(exc).__name__ in response['error']['message']
+    assert f"查询 impact 出错: {type(exc).__name__}" in capsys.readouterr().err
+    # 服务继续可用
+    assert 'result' in call(index, request('stats'))